@@ -0,0 +1,70 @@
+# modules/appreciation.py
+"""Appréciations instantanées rédigées à partir de modèles de phrases.
+
+L'appréciation ne dépend que du score, du nombre de questions, du sujet et de la
+remédiation : une bande de score choisit les phrases, et le choix parmi les
+variantes est déterministe (même leçon, même texte), sans appel à l'IA.
+"""
+import hashlib
+
+# Bandes de score (part minimale de bonnes réponses), de la meilleure à la plus faible.
+BANDES = (
+    (0.9, "excellent"),
+    (0.7, "bien"),
+    (0.4, "moyen"),
+    (0.0, "faible"),
+)
+
+MODELES = {
+    "excellent": (
+        "Bravo, {score}/{total} sur « {sujet} » : c'est un sans-faute ou presque ! Tu maîtrises vraiment le sujet, continue comme ça.",
+        "Impressionnant ! Avec {score}/{total}, tu as montré que « {sujet} » n'a plus de secret pour toi. Ton travail paie !",
+        "Excellent travail : {score}/{total} ! Tu as parfaitement compris « {sujet} ». Bravo à toi !",
+    ),
+    "bien": (
+        "Très bien, {score}/{total} sur « {sujet} » ! Tu as compris l'essentiel, encore un petit effort et ce sera parfait.",
+        "Beau résultat : {score}/{total} ! Les bases de « {sujet} » sont bien là. Continue sur cette lancée.",
+        "Bon travail avec {score}/{total} ! Tu progresses bien sur « {sujet} », quelques détails à revoir et ce sera parfait.",
+    ),
+    "moyen": (
+        "{score}/{total} sur « {sujet} » : tu es sur la bonne voie ! Chaque effort compte, et tu progresses.",
+        "Pas mal, {score}/{total} ! « {sujet} » demande encore un peu de pratique, mais tu as déjà compris une bonne partie.",
+        "Avec {score}/{total}, tu as posé de bonnes bases sur « {sujet} ». Relis les points difficiles, tu vas y arriver !",
+    ),
+    "faible": (
+        "{score}/{total} sur « {sujet} » : ce n'est qu'une étape ! Se tromper fait partie de l'apprentissage, et tu as osé essayer.",
+        "« {sujet} » est un sujet difficile, et {score}/{total} n'est qu'un début. Avec de la persévérance, tu vas progresser, c'est certain.",
+        "Ne te décourage pas : {score}/{total}, c'est un point de départ. Les plus grands champions ont commencé par des erreurs !",
+    ),
+}
+
+# Ajouté quand le score a été obtenu après une remédiation.
+PERSEVERANCE = (
+    " Et tu as continué après la remédiation : cette persévérance est ta plus grande force.",
+    " Tu as repris les points difficiles au lieu d'abandonner, et c'est exactement comme ça qu'on apprend.",
+)
+
+
+def score_band(score, total_questions):
+    """Nom de la bande de score ('excellent', 'bien', 'moyen' ou 'faible')."""
+    ratio = score / total_questions if total_questions else 0.0
+    for minimum, bande in BANDES:
+        if ratio >= minimum:
+            return bande
+    return BANDES[-1][1]
+
+
+def _choice(options, *parts):
+    """Choisit toujours la même variante pour les mêmes paramètres."""
+    digest = hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).digest()
+    return options[digest[0] % len(options)]
+
+
+def template_appreciation(score, total_questions, sujet, a_ete_remedie=False):
+    """Rédige instantanément une appréciation de 2-3 phrases adaptée à la bande de score."""
+    bande = score_band(score, total_questions)
+    texte = _choice(MODELES[bande], bande, score, total_questions, sujet)
+    texte = texte.format(score=score, total=total_questions, sujet=sujet)
+    if a_ete_remedie:
+        texte += _choice(PERSEVERANCE, score, sujet)
+    return texte
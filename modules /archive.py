@@ -0,0 +1,296 @@
+# modules/archive.py
+"""Export, import et archivage de l'historique des leçons au format Parquet.
+
+Utilisation :
+    python -m modules.archive export data/export            # lecons + eleves
+    python -m modules.archive import data/export
+    python -m modules.archive archive --horizon-days 365     # déplace les vieilles leçons
+
+Les leçons sont écrites par partitions `eleve=<prénom>/mois=<AAAA-MM>/*.parquet`.
+Les leçons archivées quittent la table `lecons` mais restent comptées dans
+`student_stats`, `eleve_concept_mastery` et `scores_archives` (page Classe) ; le
+tableau de bord les relit au besoin (read_student_lessons).
+
+pyarrow n'est nécessaire que pour exporter, importer, archiver ou relire l'archive.
+"""
+import argparse
+import shutil
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import quote
+import pandas as pd
+from modules import database, sqlite_backend
+
+ARCHIVE_DIR = database.DB_FOLDER / "archive"
+# Âge (en jours) au-delà duquel une leçon quitte la table `lecons`.
+HORIZON_DAYS = 365
+# Lignes lues ou écrites par lot.
+BATCH_ROWS = 50_000
+
+LESSON_COLUMNS = (
+    "lesson_uuid", "eleve", "date", "date_ts", "classe", "matiere", "sujet",
+    "score_quiz_1", "score_quiz_2", "appreciation_ia", "points_a_revoir",
+)
+PARTITION_COLUMNS = ("eleve", "mois")
+
+# Espace de noms des identifiants attribués aux anciennes leçons sans lesson_uuid.
+_UUID_NAMESPACE = uuid.UUID("6f1d7c52-4f0b-4c8e-9a57-3f0e2a8b9c11")
+_STAGING_PREFIX = ".en-cours-"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow est nécessaire pour lire ou écrire les archives : pip install pyarrow") from e
+    return pa, ds, pq
+
+
+def _lesson_schema(pa):
+    text, integer = pa.string(), pa.int64()
+    return pa.schema([
+        ("lesson_uuid", text), ("eleve", text), ("date", text), ("date_ts", integer),
+        ("classe", text), ("matiere", text), ("sujet", text),
+        ("score_quiz_1", integer), ("score_quiz_2", integer),
+        ("appreciation_ia", text), ("points_a_revoir", text), ("mois", text),
+    ])
+
+
+def _partitioning(ds, pa):
+    # Schéma explicite : un prénom comme "2024" ne doit pas être lu comme un entier.
+    return ds.partitioning(pa.schema([("eleve", pa.string()), ("mois", pa.string())]), flavor="hive")
+
+
+def stable_lesson_uuid(prenom, date, matiere, sujet):
+    """Identifiant déterministe d'une ancienne leçon sans lesson_uuid (imports idempotents)."""
+    return str(uuid.uuid5(_UUID_NAMESPACE, f"{prenom}\0{date}\0{matiere}\0{sujet}"))
+
+
+# --- Export ---
+
+_EXPORT_QUERY = """
+    SELECT l.lesson_uuid, e.prenom, l.date, l.date_ts, l.classe, l.matiere, l.sujet,
+           l.score_quiz_1, l.score_quiz_2, l.appreciation_ia, l.points_a_revoir
+    FROM lecons l JOIN eleves e ON e.id = l.eleve_id
+    {where}
+    ORDER BY l.eleve_id, l.date_ts
+"""
+
+
+def _write_lessons(conn, dest, where="", params=()):
+    """Écrit les leçons sélectionnées dans `dest` par lots ; retourne le nombre de lignes."""
+    pa, ds, pq = _pyarrow()
+    schema = _lesson_schema(pa)
+    cursor = conn.execute(_EXPORT_QUERY.format(where=where), params)
+    total = 0
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            return total
+        columns = [list(c) for c in zip(*rows)]
+        for i, row in enumerate(rows):
+            if columns[0][i] is None:
+                columns[0][i] = stable_lesson_uuid(row[1], row[2], row[5], row[6])
+        columns.append([date[:7] for date in columns[2]])
+        table = pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(columns, schema)], schema=schema)
+        pq.write_to_dataset(table, str(dest), partition_cols=list(PARTITION_COLUMNS))
+        total += len(rows)
+
+
+def export_all(dest):
+    """Exporte `eleves` (eleves.parquet) et `lecons` (lecons/eleve=.../mois=...) dans `dest`."""
+    pa, ds, pq = _pyarrow()
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    with database.get_connection() as conn:
+        eleves = conn.execute("SELECT prenom, classe FROM eleves ORDER BY prenom").fetchall()
+        pq.write_table(pa.table({"prenom": [e[0] for e in eleves], "classe": [e[1] for e in eleves]}), str(dest / "eleves.parquet"))
+        lecons = _write_lessons(conn, dest / "lecons")
+    return {"eleves": len(eleves), "lecons": lecons}
+
+
+# --- Import ---
+
+_IMPORT_QUERY = """
+    INSERT INTO lecons (eleve_id, lesson_uuid, date, date_ts, classe, matiere, sujet, score_quiz_1, score_quiz_2, appreciation_ia, points_a_revoir)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (lesson_uuid) DO NOTHING
+"""
+
+
+def import_all(src):
+    """Importe un export dans la base, en une seule transaction ; les leçons déjà présentes sont ignorées."""
+    pa, ds, pq = _pyarrow()
+    src = Path(src)
+    lessons = ds.dataset(str(src / "lecons"), format="parquet", partitioning=_partitioning(ds, pa))
+    inserted = 0
+    touched = set()
+    with database.get_connection() as conn, conn:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM lecons").fetchone()[0]
+        if (src / "eleves.parquet").exists():
+            eleves = pq.read_table(str(src / "eleves.parquet")).to_pydict()
+            conn.executemany("INSERT OR IGNORE INTO eleves (prenom, classe) VALUES (?, ?)", zip(eleves["prenom"], eleves["classe"]))
+        ids = dict(conn.execute("SELECT prenom, id FROM eleves"))
+        for batch in lessons.to_batches(columns=list(LESSON_COLUMNS), batch_size=BATCH_ROWS):
+            data = batch.to_pydict()
+            for prenom, classe in zip(data["eleve"], data["classe"]):
+                if prenom not in ids:
+                    # Élève absent de eleves.parquet : créé avec la classe de sa leçon.
+                    ids[prenom] = conn.execute("INSERT INTO eleves (prenom, classe) VALUES (?, ?)", (prenom, classe)).lastrowid
+            rows = zip(
+                [ids[p] for p in data["eleve"]], data["lesson_uuid"], data["date"], data["date_ts"], data["classe"],
+                data["matiere"], data["sujet"], data["score_quiz_1"], data["score_quiz_2"],
+                data["appreciation_ia"], data["points_a_revoir"],
+            )
+            before = conn.total_changes
+            conn.executemany(_IMPORT_QUERY, rows)
+            if conn.total_changes > before:
+                inserted += conn.total_changes - before
+                touched.update(data["eleve"])
+        # Concepts à revoir des seules leçons insérées (id au-delà du dernier avant l'import).
+        sqlite_backend.backfill_concept_mastery(conn, min_lecon_id=last_id)
+        for prenom in touched:
+            _rebuild_student_stats(conn, ids[prenom], prenom)
+            database._increment_counter(conn, database.student_generation_key(prenom))
+        if touched:
+            database._increment_counter(conn, database.STUDENT_LIST_GENERATION)
+    return {"lecons": inserted, "eleves_modifies": len(touched)}
+
+
+def _rebuild_student_stats(conn, eleve_id, prenom):
+    """Recalcule student_stats d'un élève à partir de `lecons` et de ses leçons archivées."""
+    rows = conn.execute(
+        "SELECT lesson_uuid, matiere, score_quiz_1, date_ts FROM lecons WHERE eleve_id = ?", (eleve_id,)
+    ).fetchall()
+    hot_uuids = {row[0] for row in rows}
+    archived = read_student_lessons(prenom, columns=["lesson_uuid", "matiere", "score_quiz_1", "date_ts"])
+    for row in archived.itertuples(index=False):
+        if row.lesson_uuid not in hot_uuids:
+            score = None if pd.isna(row.score_quiz_1) else int(row.score_quiz_1)
+            rows.append((row.lesson_uuid, row.matiere, score, int(row.date_ts)))
+    stats = {}
+    for _, matiere, score, date_ts in sorted(rows, key=lambda r: r[3] or 0):
+        s = stats.setdefault(matiere, {"n": 0, "somme": 0, "meilleur": None, "dernier": None, "date_ts": None})
+        s["n"] += 1
+        s["somme"] += score or 0
+        if score is not None and (s["meilleur"] is None or score > s["meilleur"]):
+            s["meilleur"] = score
+        s["dernier"], s["date_ts"] = score, date_ts
+    conn.execute("DELETE FROM student_stats WHERE eleve_id = ?", (eleve_id,))
+    conn.executemany(
+        "INSERT INTO student_stats (eleve_id, matiere, nombre_lecons, somme_scores, meilleur_score, dernier_score, dernier_date_ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(eleve_id, m, s["n"], s["somme"], s["meilleur"], s["dernier"], s["date_ts"]) for m, s in stats.items()],
+    )
+
+
+# --- Archivage ---
+
+def _publish_staging(staging):
+    """Déplace les fichiers d'un dossier de préparation vers l'archive définitive."""
+    for path in staging.rglob("*.parquet"):
+        target = ARCHIVE_DIR / "lecons" / path.relative_to(staging)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        path.replace(target)
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+_ARCHIVED_SCORES_UPSERT = """
+    INSERT INTO scores_archives (classe, matiere, score, nombre)
+    SELECT classe, matiere, score_quiz_1, COUNT(*)
+    FROM lecons
+    WHERE date_ts < ? AND score_quiz_1 IS NOT NULL
+    GROUP BY classe, matiere, score_quiz_1
+    ON CONFLICT (classe, matiere, score) DO UPDATE SET nombre = nombre + excluded.nombre
+"""
+
+
+def archive_old_lessons(horizon_days=HORIZON_DAYS):
+    """Déplace vers ARCHIVE_DIR les leçons de plus de `horizon_days` jours.
+
+    Les fichiers sont écrits dans un dossier de préparation pendant que la transaction
+    tient le verrou d'écriture, puis publiés une fois la suppression validée. Un dossier
+    de préparation laissé par une interruption après la validation est publié au
+    prochain archivage.
+    """
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    for leftover in ARCHIVE_DIR.glob(_STAGING_PREFIX + "*"):
+        _publish_staging(leftover)
+    cutoff_ts = int(time.time()) - horizon_days * 86400
+    staging = ARCHIVE_DIR / f"{_STAGING_PREFIX}{uuid.uuid4().hex}"
+    with database.get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            moved = _write_lessons(conn, staging, "WHERE l.date_ts < ?", (cutoff_ts,))
+            conn.execute(_ARCHIVED_SCORES_UPSERT, (cutoff_ts,))
+            conn.execute("DELETE FROM lecons WHERE date_ts < ?", (cutoff_ts,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    _publish_staging(staging)
+    return {"lecons": moved, "avant_ts": cutoff_ts}
+
+
+# --- Lecture transparente pour le tableau de bord ---
+
+def read_student_lessons(prenom, columns=None):
+    """Leçons archivées d'un élève (DataFrame vide s'il n'y en a pas ou si pyarrow est absent)."""
+    lessons_dir = ARCHIVE_DIR / "lecons"
+    # Raccourci pour les élèves sans archive. pyarrow encode les valeurs de partition
+    # comme une URL ("Zoé" -> eleve=Zo%C3%A9) ; les archives plus anciennes gardent le
+    # prénom tel quel. Le filtre du dataset reste la seule sélection des lignes.
+    if not any((lessons_dir / f"eleve={name}").is_dir() for name in {quote(prenom, safe=""), prenom}):
+        return pd.DataFrame(columns=columns or list(LESSON_COLUMNS))
+    try:
+        pa, ds, pq = _pyarrow()
+    except RuntimeError:
+        return pd.DataFrame(columns=columns or list(LESSON_COLUMNS))
+    dataset = ds.dataset(str(lessons_dir), format="parquet", partitioning=_partitioning(ds, pa))
+    wanted = list(columns or LESSON_COLUMNS)
+    read_columns = wanted if "lesson_uuid" in wanted else wanted + ["lesson_uuid"]
+    df = dataset.to_table(filter=ds.field("eleve") == prenom, columns=read_columns).to_pandas()
+    # Une leçon réimportée puis archivée de nouveau figure deux fois dans l'archive.
+    return df.drop_duplicates("lesson_uuid")[wanted]
+
+
+# --- Ligne de commande ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.archive", description="Export, import et archivage de l'historique.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="Exporte eleves et lecons en Parquet.")
+    export_parser.add_argument("dest", type=Path)
+    import_parser = sub.add_parser("import", help="Importe un export Parquet dans la base.")
+    import_parser.add_argument("src", type=Path)
+    archive_parser = sub.add_parser("archive", help="Déplace les vieilles leçons vers data/archive.")
+    archive_parser.add_argument("--horizon-days", type=int, default=HORIZON_DAYS, help="Âge minimal des leçons archivées.")
+
+    args = parser.parse_args(argv)
+    database.init_db()
+    if not database.uses_sqlite():
+        print("L'archivage ne concerne que la base SQLite locale (DATABASE_URL désigne un autre moteur).")
+        return 1
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            result = export_all(args.dest)
+        elif args.command == "import":
+            result = import_all(args.src)
+        else:
+            result = archive_old_lessons(args.horizon_days)
+    except (RuntimeError, sqlite3.Error, OSError) as e:
+        print(f"Échec : {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    rate = result["lecons"] / elapsed if elapsed else 0.0
+    print(f"Terminé en {elapsed:.1f} s : {result} ({rate:,.0f} leçons/s)".replace(",", " "))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,57 @@
+# modules/cache_handler.py
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+# Nombre maximum d'entrées gardées en mémoire, tous élèves confondus.
+CACHE_MAX_ENTRIES = 256
+
+
+class VersionedCache:
+    """Cache LRU partagé entre les sessions dont chaque entrée est liée à une génération.
+
+    Une entrée n'est servie que si la génération demandée est celle avec laquelle
+    elle a été calculée : modifier les données d'un élève n'invalide que ses entrées.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get_or_load(self, namespace, key, generation, loader):
+        """Retourne la valeur en cache pour (namespace, key) ou la recalcule avec `loader()`."""
+        cle = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(cle)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(cle)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                # Les données ont changé depuis le calcul de cette entrée.
+                self._stats["invalidations"] += 1
+            self._stats["misses"] += 1
+
+        # Le chargement se fait hors du verrou pour ne pas bloquer les autres sessions.
+        value = loader()
+
+        with self._lock:
+            self._entries[cle] = (generation, value)
+            self._entries.move_to_end(cle)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return value
+
+    def stats(self):
+        """Copie des compteurs de hits / misses / invalidations / évictions."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+
+@st.cache_resource
+def get_cache():
+    """Instance unique du cache pour tout le processus."""
+    return VersionedCache()
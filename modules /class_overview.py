@@ -0,0 +1,184 @@
+# modules/class_overview.py
+"""Données de la page Classe : tout est agrégé par SQL, aucune liste n'est chargée en entier.
+
+- classes : GROUP BY classe sur eleves ;
+- élèves : pages de PAGE_SIZE prénoms, pagination par clé (prénoms qui suivent le dernier
+  de la page précédente, idx_eleves_classe_prenom) et recherche dans le prénom ;
+- scores : leçons par matière et par score au 1er quiz (idx_lecons_classe_matiere_score).
+
+Chaque résultat est gardé CACHE_TTL_SECONDS en cache, par classe (et par page) : les
+enseignants d'une même classe se partagent les requêtes, et une leçon terminée apparaît
+au plus tard après ce délai.
+
+Banc d'essai (base fictive, requêtes et rendu de la page) :
+    python -m modules.class_overview --eleves 10000 --lecons 1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import time
+import uuid
+from pathlib import Path
+import streamlit as st
+from modules import database
+from modules.constants import ALL_CLASSES, MATIERES
+
+CACHE_TTL_SECONDS = 60
+PAGE_SIZE = 50
+PAGE_FILE = Path(__file__).parent.parent / "pages" / "3_🏫_Classe.py"
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_classes():
+    """Classes et nombre d'élèves, dans l'ordre de ALL_CLASSES."""
+    classes = database.get_class_list()
+    if classes.empty:
+        return classes
+    order = {classe: i for i, classe in enumerate(ALL_CLASSES)}
+    return classes.sort_values("classe", key=lambda column: column.map(lambda c: order.get(c, len(order)))).reset_index(drop=True)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_distribution(classe):
+    """Nombre de leçons de la classe par matière et par score au 1er quiz."""
+    return database.get_class_score_distribution(classe)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_student_page(classe, after=None, search=None, page_size=PAGE_SIZE):
+    """Une page d'élèves de la classe.
+
+    Retourne (élèves : prenom, nombre_lecons, score_moyen, derniere_lecon ;
+    scores par matière de ces élèves ; prénom à partir duquel lire la page suivante, ou None).
+    """
+    # Un élève de plus que la page : s'il existe, il y a une page suivante.
+    rows = database.get_class_students(classe, after, search or None, page_size + 1)
+    if rows.empty:
+        return rows, rows, None
+    prenoms = rows["prenom"].drop_duplicates()
+    next_after = None
+    if len(prenoms) > page_size:
+        prenoms = prenoms.iloc[:page_size]
+        rows = rows[rows["prenom"].isin(prenoms)]
+        next_after = prenoms.iloc[-1]
+    # Les lignes arrivent dans l'ordre des prénoms de la base : on le garde (sort=False).
+    students = rows.groupby("prenom", sort=False).agg(
+        nombre_lecons=("nombre_lecons", "sum"), somme_scores=("somme_scores", "sum"),
+        derniere_lecon_ts=("dernier_date_ts", "max"),
+    ).reset_index()
+    students["score_moyen"] = students["somme_scores"] / students["nombre_lecons"].where(students["nombre_lecons"] > 0)
+    dates = students["derniere_lecon_ts"].dropna()
+    students["derniere_lecon"] = dates.map(lambda ts: time.strftime("%d/%m/%Y", time.localtime(ts)))
+    by_subject = rows.dropna(subset=["matiere"])
+    by_subject = by_subject.assign(score_moyen=by_subject["somme_scores"] / by_subject["nombre_lecons"])
+    return (
+        students[["prenom", "nombre_lecons", "score_moyen", "derniere_lecon"]],
+        by_subject[["prenom", "matiere", "nombre_lecons", "score_moyen"]],
+        next_after,
+    )
+
+
+# --- Banc d'essai ---
+
+def _fill(db_file, students, lessons, seed=0):
+    """Base fictive : `students` élèves répartis dans les classes et `lessons` leçons."""
+    from modules import sqlite_backend
+    rng = random.Random(seed)
+    pool = sqlite_backend.open_pool(db_file)
+    with pool.connection() as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO eleves (prenom, classe) VALUES (?, ?)",
+            ((f"Élève {n:05d}", ALL_CLASSES[n % len(ALL_CLASSES)]) for n in range(students)),
+        )
+        eleves = conn.execute("SELECT id, classe FROM eleves").fetchall()
+        now = int(time.time())
+
+        def rows():
+            for n in range(lessons):
+                eleve_id, classe = eleves[rng.randrange(len(eleves))]
+                date_ts = now - rng.randrange(365 * 86400)
+                yield (eleve_id, uuid.uuid4().hex, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(date_ts)), date_ts,
+                       classe, rng.choice(MATIERES), f"Sujet {n % 500}", min(10, max(0, round(rng.gauss(6.5, 2)))))
+        conn.executemany("""
+            INSERT INTO lecons (eleve_id, lesson_uuid, date, date_ts, classe, matiere, sujet, score_quiz_1)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows())
+        conn.execute("""
+            INSERT INTO student_stats (eleve_id, matiere, nombre_lecons, somme_scores, meilleur_score, dernier_score, dernier_date_ts)
+            SELECT eleve_id, matiere, COUNT(*), SUM(score_quiz_1), MAX(score_quiz_1), MAX(score_quiz_1), MAX(date_ts)
+            FROM lecons GROUP BY eleve_id, matiere
+        """)
+        conn.execute("ANALYZE")
+    pool.close()
+
+
+def _median_ms(function, repetitions):
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return round(statistics.median(durations) * 1000, 1)
+
+
+def run_bench(students, lessons, repetitions):
+    from streamlit.testing.v1 import AppTest
+    from modules import sqlite_backend, storage
+    folder = sqlite_backend.tenant_folder(storage.tenant_id())
+    start = time.perf_counter()
+    _fill(folder / "progress.db", students, lessons)
+    report = {"eleves": students, "lecons": lessons, "creation_base_s": round(time.perf_counter() - start, 1)}
+
+    # Requêtes seules, sans cache.
+    backend = database.get_backend()
+    classe = ALL_CLASSES[0]
+    first_page = backend.get_class_students(classe, None, None, PAGE_SIZE + 1)
+    last_name = backend.get_class_students(classe, None, None, 10**9)["prenom"].iloc[-1]
+    report["requetes_ms"] = {
+        "classes": _median_ms(backend.get_class_list, repetitions),
+        "premiere_page": _median_ms(lambda: backend.get_class_students(classe, None, None, PAGE_SIZE + 1), repetitions),
+        "page_suivante": _median_ms(
+            lambda: backend.get_class_students(classe, first_page["prenom"].iloc[-1], None, PAGE_SIZE + 1), repetitions
+        ),
+        "derniere_page": _median_ms(lambda: backend.get_class_students(classe, last_name, None, PAGE_SIZE + 1), repetitions),
+        "recherche": _median_ms(lambda: backend.get_class_students(classe, None, "123", PAGE_SIZE + 1), repetitions),
+        "distribution_scores": _median_ms(lambda: backend.get_class_score_distribution(classe), repetitions),
+    }
+
+    # Rendu complet de la page : le premier charge aussi streamlit et altair.
+    app = AppTest.from_file(str(PAGE_FILE), default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    report["page_premier_rendu_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    def cold_render():
+        st.cache_data.clear()
+        app.run()
+    report["page_cache_vide_ms"] = _median_ms(cold_render, repetitions)
+    report["page_cache_plein_ms"] = _median_ms(app.run, repetitions)
+    report["erreurs"] = [str(e.value) for e in app.exception]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.class_overview", description="Banc d'essai de la page Classe.")
+    parser.add_argument("--eleves", type=int, default=10_000)
+    parser.add_argument("--lecons", type=int, default=1_000_000)
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    # Établissement jetable : sa base SQLite est supprimée à la fin.
+    os.environ["TENANT_ID"] = f"banc-classe-{uuid.uuid4().hex[:8]}"
+    from modules import sqlite_backend, storage
+    try:
+        print(json.dumps(run_bench(args.eleves, args.lecons, args.repetitions), ensure_ascii=False, indent=2))
+    finally:
+        shutil.rmtree(sqlite_backend.tenant_folder(storage.tenant_id()), ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,7 @@
+# modules/constants.py
+
+# Classes proposées dans l'application, de la plus petite à la plus grande.
+ALL_CLASSES = ("CP", "CE1", "CE2", "CM1", "CM2", "6ème", "5ème", "4ème", "3ème", "Seconde")
+
+# Matières proposées dans "Leçon du Jour".
+MATIERES = ("Mathématiques", "Français", "Histoire", "Sciences", "Anglais", "Allemand", "Surprise !")
@@ -0,0 +1,130 @@
+# modules/dashboard_bench.py
+"""Banc d'essai du tableau de bord : durée de rendu selon la taille de l'historique d'un élève.
+
+Utilisation :
+    python -m modules.dashboard_bench
+    python -m modules.dashboard_bench --tailles 100 10000 1000000 --repetitions 5
+
+Chaque taille est l'historique d'un élève fictif d'un établissement jetable (supprimé à la
+fin). On mesure, pour cet élève :
+- historique_complet_ms : ancien chemin, tout l'historique chargé (get_student_data) ;
+- requetes_bornees_ms : les lectures du tableau de bord (résumé par matière, 5 réussites,
+  5 défis, maîtrise des concepts) ;
+- page_cache_vide_ms / page_cache_plein_ms : rendu complet de la page (streamlit.testing),
+  après invalidation de la génération de l'élève puis avec son cache rempli.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+PAGE_FILE = ROOT / "🏠_Tableau_de_Bord.py"
+SIZES = (100, 10_000, 1_000_000)
+MATIERES = ("Mathématiques", "Français", "Histoire", "Sciences")
+CONCEPTS_PER_STUDENT = 40
+
+
+def _fill_student(prenom, lessons, seed=0):
+    """Crée `prenom` avec `lessons` leçons, son résumé par matière et ses concepts."""
+    from modules import sqlite_backend, storage
+    rng = random.Random(seed)
+    now = int(time.time())
+    with sqlite_backend.get_pool(storage.tenant_id()).connection() as conn, conn:
+        conn.execute("INSERT INTO eleves (prenom, classe) VALUES (?, 'CM1')", (prenom,))
+        eleve_id = conn.execute("SELECT id FROM eleves WHERE prenom = ?", (prenom,)).fetchone()[0]
+
+        def rows():
+            for n in range(lessons):
+                date_ts = now - rng.randrange(5 * 365 * 86400)
+                yield (eleve_id, uuid.uuid4().hex, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(date_ts)), date_ts,
+                       "CM1", rng.choice(MATIERES), f"Sujet {n % 500}", rng.randint(0, 10))
+        conn.executemany("""
+            INSERT INTO lecons (eleve_id, lesson_uuid, date, date_ts, classe, matiere, sujet, score_quiz_1)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows())
+        conn.execute("""
+            INSERT INTO student_stats (eleve_id, matiere, nombre_lecons, somme_scores, meilleur_score, dernier_score, dernier_date_ts)
+            SELECT eleve_id, matiere, COUNT(*), SUM(score_quiz_1), MAX(score_quiz_1), MAX(score_quiz_1), MAX(date_ts)
+            FROM lecons WHERE eleve_id = ? GROUP BY matiere
+        """, (eleve_id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO concepts (matiere, libelle) VALUES (?, ?)",
+            ((matiere, f"Concept {n}") for matiere in MATIERES for n in range(CONCEPTS_PER_STUDENT // len(MATIERES))),
+        )
+        conn.executemany("""
+            INSERT INTO eleve_concept_mastery (eleve_id, concept_id, nb_reussites, nb_echecs, a_revoir, dernier_ts, dernier_echec_ts)
+            SELECT ?, id, ?, ?, ?, ?, ? FROM concepts WHERE id = ?
+        """, ((eleve_id, rng.randint(0, 5), 1, rng.randint(0, 1), now, now - rng.randrange(30 * 86400), concept_id)
+              for concept_id in range(1, CONCEPTS_PER_STUDENT + 1)))
+        conn.execute("ANALYZE")
+
+
+def _median_ms(function, repetitions):
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return round(statistics.median(durations) * 1000, 1)
+
+
+def run_bench(sizes, repetitions):
+    from streamlit.testing.v1 import AppTest
+    from modules import database
+    database.init_db()
+    backend = database.get_backend()
+    report = []
+    for size in sizes:
+        prenom = f"Banc {size}"
+        start = time.perf_counter()
+        _fill_student(prenom, size)
+        result = {"lecons": size, "creation_s": round(time.perf_counter() - start, 1)}
+
+        result["historique_complet_ms"] = _median_ms(lambda: backend.get_student_data(prenom), repetitions)
+
+        def bounded_reads():
+            backend.get_student_stats(prenom)
+            backend.get_top_successes(prenom, 5, 8)
+            backend.get_recent_challenges(prenom, 5)
+            backend.get_concept_mastery(prenom)
+        result["requetes_bornees_ms"] = _median_ms(bounded_reads, repetitions)
+
+        app = AppTest.from_file(str(PAGE_FILE), default_timeout=120)
+        app.session_state["select_eleve"] = prenom
+        app.run()
+
+        def cold_render():
+            # Nouvelle génération : le cache de l'élève est relu depuis la base.
+            database.increment_counter(database.student_generation_key(prenom))
+            app.run()
+        result["page_cache_vide_ms"] = _median_ms(cold_render, repetitions)
+        result["page_cache_plein_ms"] = _median_ms(app.run, repetitions)
+        result["erreurs"] = [str(e.value) for e in app.exception]
+        report.append(result)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.dashboard_bench", description="Banc d'essai du tableau de bord.")
+    parser.add_argument("--tailles", type=int, nargs="+", default=list(SIZES), help="Leçons dans l'historique de chaque élève.")
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    # Établissement jetable : sa base SQLite est supprimée à la fin.
+    os.environ["TENANT_ID"] = f"banc-tableau-{uuid.uuid4().hex[:8]}"
+    from modules import sqlite_backend, storage
+    try:
+        print(json.dumps(run_bench(args.tailles, args.repetitions), ensure_ascii=False, indent=2))
+    finally:
+        shutil.rmtree(sqlite_backend.tenant_folder(storage.tenant_id()), ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
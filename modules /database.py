@@ -1,154 +1,313 @@
 # modules/database.py (version avec ajout d'élève)
+import calendar
 import sqlite3
-import pandas as pd
-from pathlib import Path
+import time
 import streamlit as st
+from modules import metrics, sqlite_backend, storage, write_queue
+from modules.storage import StorageError
 
-# --- Configuration du chemin de la base de données ---
-DB_FOLDER = Path(__file__).parent.parent / "data"
-DB_FILE = DB_FOLDER / "progress.db"
+# --- Moteur de stockage (modules/storage.py) ---
+# La progression des élèves est stockée par le moteur choisi par DATABASE_URL
+# (SQLite par défaut, PostgreSQL sinon). La base SQLite locale de l'établissement
+# garde dans tous les cas le cache de leçons et l'archive : les modules qui y
+# accèdent directement passent par get_connection().
+DB_FOLDER = sqlite_backend.DB_FOLDER
+DB_FILE = sqlite_backend.DB_FILE
+get_connection = sqlite_backend.get_connection
+_increment_counter = sqlite_backend.increment_counter
+
+
+@st.cache_resource
+def get_backend():
+    """Moteur unique pour tout le processus (partagé par toutes les sessions)."""
+    return storage.create_backend()
+
+
+@st.cache_resource
+def get_write_queue():
+    """File d'écriture groupée du moteur (WRITE_DURABILITY = "groupe"), vidée à l'arrêt du processus."""
+    return write_queue.start(get_backend())
+
+
+def write_behind():
+    """Vrai si les leçons et les réponses passent par la file d'écriture (mode « groupe »)."""
+    return write_queue.durability() == write_queue.DURABILITY_GROUP
+
+
+def flush_writes():
+    """Attend l'enregistrement des écritures en file (tests, banc d'essai, archivage)."""
+    if write_behind():
+        get_write_queue().flush()
+
+
+def uses_sqlite():
+    """Vrai si la progression des élèves est dans la base SQLite locale."""
+    return get_backend().name == "sqlite"
+
+# --- Compteurs nommés et générations ---
+# Chaque écriture incrémente la génération des données qu'elle modifie ;
+# une entrée de cache n'est réutilisée que si sa génération est toujours à jour.
+# Les mêmes compteurs servent aussi de statistiques (hits du cache de leçons, ...).
+
+STUDENT_LIST_GENERATION = "generation:liste_eleves"
+
+def student_generation_key(prenom):
+    """Clé de la génération des données d'un élève."""
+    return f"generation:eleve:{prenom}"
+
+def increment_counter(cle, pas=1):
+    """Incrémente le compteur nommé `cle` dans sa propre transaction."""
+    try:
+        get_backend().increment_counter(cle, pas)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la mise à jour d'un compteur : {e}")
+
+def get_counter(cle):
+    """Retourne la valeur du compteur nommé `cle` (0 s'il n'existe pas encore)."""
+    try:
+        return get_backend().get_counter(cle)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la lecture d'un compteur : {e}")
+        return None
+
+def get_generation(cle):
+    """Retourne la génération courante associée à `cle` (0 si jamais modifiée)."""
+    return get_counter(cle)
+
+def _to_timestamp(date_str):
+    """Convertit une date 'AAAA-MM-JJ HH:MM:SS' en entier triable (même valeur que strftime('%s'))."""
+    return calendar.timegm(time.strptime(date_str, "%Y-%m-%d %H:%M:%S"))
+
+# --- Leçons archivées (modules/archive.py) ---
+
+def _read_archive(eleve_prenom):
+    # Import local : modules.archive importe ce module.
+    from modules import archive
+    return archive.read_student_lessons(eleve_prenom)
+
+def _complete_from_archive(df, eleve_prenom, limit, keep):
+    """Complète un résultat trop court (moins de `limit` lignes) avec les leçons archivées les plus récentes."""
+    import pandas as pd
+    if len(df) >= limit:
+        return df
+    archived = _read_archive(eleve_prenom)
+    if archived.empty:
+        return df
+    archived = keep(archived).sort_values('date_ts', ascending=False).head(limit - len(df))
+    return pd.concat([df, archived[df.columns]], ignore_index=True)
+
+def _empty_frame():
+    # pandas n'est importé que si une page lit un tableau (voir sqlite_backend._dataframe).
+    import pandas as pd
+    return pd.DataFrame()
 
 # --- Fonctions de la Base de Données ---
 
+@st.cache_resource
+def _initialize():
+    """Ouvre le moteur et la base locale ; une erreur n'est pas mise en cache (nouvel essai au rerun suivant)."""
+    get_backend()
+    # Base locale du cache de leçons, même si la progression est dans PostgreSQL.
+    sqlite_backend.get_pool(storage.tenant_id())
+    return True
+
 def init_db():
-    """Initialise la BDD et crée les tables si elles n'existent pas."""
-    try:
-        DB_FOLDER.mkdir(exist_ok=True)
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS eleves (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prenom TEXT NOT NULL UNIQUE,
-                classe TEXT 
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS lecons (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                eleve_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                classe TEXT NOT NULL,
-                matiere TEXT NOT NULL,
-                sujet TEXT NOT NULL,
-                score_quiz_1 INTEGER,
-                score_quiz_2 INTEGER,
-                appreciation_ia TEXT,
-                points_a_revoir TEXT,
-                FOREIGN KEY (eleve_id) REFERENCES eleves (id)
-            )
-        """)
-
-        # Pré-remplir la table avec les élèves par défaut s'ils n'existent pas.
-        # INSERT OR IGNORE ne fait rien si le prénom existe déjà.
-        eleves_par_defaut = [
-            ('Tessnim', 'CM1'),
-            ('Rayan', '4ème')
-        ]
-        cursor.executemany("INSERT OR IGNORE INTO eleves (prenom, classe) VALUES (?, ?)", eleves_par_defaut)
-
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
+    """Initialise la BDD et crée les tables si elles n'existent pas (une seule fois par processus)."""
+    try:
+        _initialize()
+    except (StorageError, sqlite3.Error) as e:
         st.error(f"Erreur de base de données lors de l'initialisation : {e}")
 
-# --- NOUVELLE FONCTION ---
+@metrics.instrumented(metrics.DB)
 def add_student(prenom, classe):
     """Ajoute un nouvel élève à la base de données."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO eleves (prenom, classe) VALUES (?, ?)", (prenom, classe))
-        conn.commit()
-        conn.close()
+        if not get_backend().add_student(prenom, classe, STUDENT_LIST_GENERATION):
+            # Le prénom est déjà utilisé dans cet établissement.
+            return False, f"Le prénom '{prenom}' existe déjà."
         return True, f"L'élève {prenom} a été ajouté."
-    except sqlite3.IntegrityError:
-        # Cette erreur se produit si le prénom est déjà dans la BDD (à cause de la contrainte UNIQUE)
-        conn.close()
-        return False, f"Le prénom '{prenom}' existe déjà."
-    except sqlite3.Error as e:
-        conn.close()
+    except StorageError as e:
         return False, f"Erreur de base de données : {e}"
 
-# --- Fonctions existantes (get_student_data, get_student_list, save_lesson_result) ---
+@metrics.instrumented(metrics.DB)
 def get_student_data(eleve_prenom):
-    # ... (fonction inchangée)
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        query = """
-            SELECT l.date, l.matiere, l.sujet, l.score_quiz_1, l.points_a_revoir
-            FROM lecons l
-            JOIN eleves e ON l.eleve_id = e.id
-            WHERE e.prenom = ?
-            ORDER BY l.date ASC
-        """
-        df = pd.read_sql_query(query, conn, params=(eleve_prenom,))
-        conn.close()
+    """Récupère l'historique des leçons d'un élève, de la plus ancienne à la plus récente."""
+    import pandas as pd
+    try:
+        df = get_backend().get_student_data(eleve_prenom)
+        archived = _read_archive(eleve_prenom)
+        if not archived.empty:
+            # Les leçons archivées sont toutes plus anciennes que celles de la table.
+            df = pd.concat([archived.sort_values('date_ts')[df.columns], df], ignore_index=True)
         if not df.empty:
             df['date'] = pd.to_datetime(df['date'])
         return df
-    except sqlite3.Error as e:
+    except StorageError as e:
         st.error(f"Erreur de base de données lors de la récupération des données : {e}")
-        return pd.DataFrame()
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
+def get_student_stats(eleve_prenom):
+    """Résumé par matière d'un élève : nombre de leçons, score moyen, meilleur et dernier score."""
+    try:
+        return get_backend().get_student_stats(eleve_prenom)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération du bilan : {e}")
+        return _empty_frame()
 
+@metrics.instrumented(metrics.DB)
+def get_top_successes(eleve_prenom, limit=5, seuil=8):
+    """Les `limit` leçons les plus récentes avec un score d'au moins `seuil`."""
+    try:
+        df = get_backend().get_top_successes(eleve_prenom, limit, seuil)
+        return _complete_from_archive(df, eleve_prenom, limit, lambda a: a[a['score_quiz_1'] >= seuil])
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des réussites : {e}")
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
+def get_recent_challenges(eleve_prenom, limit=5):
+    """Les `limit` concepts encore à revoir, du plus récemment raté au plus ancien.
+
+    Lus dans eleve_concept_mastery, qui couvre aussi les leçons archivées : pas de
+    complément depuis l'archive.
+    """
+    try:
+        return get_backend().get_recent_challenges(eleve_prenom, limit)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des défis : {e}")
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
+def get_concept_mastery(eleve_prenom):
+    """Réussites, échecs et état « à revoir » de chaque concept évalué chez l'élève."""
+    try:
+        return get_backend().get_concept_mastery(eleve_prenom)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des concepts : {e}")
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
 def get_student_list():
-    # ... (fonction inchangée)
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT prenom FROM eleves ORDER BY prenom")
-        eleves = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return eleves
-    except sqlite3.Error as e:
+    """Retourne la liste des prénoms des élèves, triée par ordre alphabétique."""
+    try:
+        return get_backend().get_student_list()
+    except StorageError as e:
         st.error(f"Erreur de base de données lors de la récupération des élèves : {e}")
         return []
 
+@metrics.instrumented(metrics.DB)
 def save_lesson_result(data):
-    # ... (fonction inchangée)
+    """Enregistre le résultat d'une leçon terminée.
+
+    Idempotent si `data['lesson_uuid']` est fourni : une même leçon n'est insérée qu'une fois.
+    En mode « groupe » (WRITE_DURABILITY), la leçon passe par la file d'écriture et est
+    validée dans la même transaction que les autres écritures en attente ; dans les deux
+    modes, True n'est retourné qu'une fois la transaction validée.
+    """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM eleves WHERE prenom = ?", (data['eleve'],))
-        result = cursor.fetchone()
-        if result is None:
+        data = dict(data, date_ts=_to_timestamp(data['date']))
+        if write_behind():
+            inserted = write_queue.wait(get_write_queue().submit_lesson(data, student_generation_key(data['eleve'])))
+        else:
+            inserted = get_backend().save_lesson_result(data, student_generation_key(data['eleve']))
+        if inserted is None:
             st.error(f"L'élève {data['eleve']} n'a pas été trouvé dans la base de données.")
             return False
-        eleve_id = result[0]
-        insert_query = """
-            INSERT INTO lecons (eleve_id, date, classe, matiere, sujet, score_quiz_1, score_quiz_2, appreciation_ia, points_a_revoir)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        lesson_data_tuple = (
-            eleve_id, data['date'], data['classe'], data['matiere'],
-            data['sujet'], data['score_quiz_1'], data.get('score_quiz_2'),
-            data['appreciation_ia'], data['points_a_revoir']
-        )
-        cursor.execute(insert_query, lesson_data_tuple)
-        conn.commit()
-        conn.close()
-        st.toast("Progrès sauvegardés ! ✅", icon="💾")
+        if inserted:
+            st.toast("Progrès sauvegardés ! ✅", icon="💾")
         return True
-    except sqlite3.Error as e:
+    except StorageError as e:
         st.error(f"Erreur de base de données lors de la sauvegarde : {e}")
         return False
-# Dans modules/database.py
-
-# AJOUTEZ CE BLOC À LA FIN DE modules/database.py
 
+@metrics.instrumented(metrics.DB)
 def get_student_class(prenom):
     """Récupère la classe d'un élève spécifique depuis la base de données."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        # On sélectionne la colonne 'classe' pour l'élève correspondant
-        cursor.execute("SELECT classe FROM eleves WHERE prenom = ?", (prenom,))
-        result = cursor.fetchone() # On récupère la première ligne de résultat
-        conn.close()
-        # Si un résultat a été trouvé, on retourne la première colonne (la classe), sinon None
-        return result[0] if result else None
-    except sqlite3.Error as e:
+        return get_backend().get_student_class(prenom)
+    except StorageError as e:
         st.error(f"Erreur de BDD lors de la récupération de la classe : {e}")
         return None
+
+@metrics.instrumented(metrics.DB)
+def get_student_id(prenom):
+    """Identifiant de l'élève dans le moteur de stockage (None s'il est inconnu)."""
+    try:
+        return get_backend().get_student_id(prenom)
+    except StorageError as e:
+        st.error(f"Erreur de BDD lors de la récupération de l'élève : {e}")
+        return None
+
+@metrics.instrumented(metrics.DB)
+def get_student_topics(prenom, matiere):
+    """Sujets déjà étudiés par l'élève dans la matière."""
+    try:
+        return get_backend().get_student_topics(prenom, matiere)
+    except StorageError as e:
+        st.error(f"Erreur de BDD lors de la récupération de l'historique : {e}")
+        return []
+
+@metrics.instrumented(metrics.DB)
+def save_answers(answers):
+    """Ajoute au journal les réponses d'un quiz, en une seule transaction.
+
+    Chaque réponse est un dict : eleve, lesson_uuid, quiz (1 ou 2), numero, classe, matiere,
+    question_cle, question, options, bonne_option, option_choisie (indices dans `options`),
+    correcte, concept, duree_quiz_ms et repondu_ts. Retourne le nombre de réponses ajoutées,
+    une fois la transaction validée (en mode « groupe » aussi).
+    """
+    try:
+        if write_behind():
+            return write_queue.wait(get_write_queue().submit_answers(answers))
+        return get_backend().save_answers(answers)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de l'enregistrement des réponses : {e}")
+        return 0
+
+@metrics.instrumented(metrics.DB)
+def get_answers(classe=None, matiere=None):
+    """Toutes les réponses du journal, éventuellement limitées à une classe et à une matière."""
+    try:
+        return get_backend().get_answers(classe, matiere)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des réponses : {e}")
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
+def get_questions(cles):
+    """Texte, options et bonne option des questions du journal."""
+    try:
+        return get_backend().get_questions(cles)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des questions : {e}")
+        return _empty_frame()
+
+# --- Page Classe ---
+
+@metrics.instrumented(metrics.DB)
+def get_class_list():
+    """Classes des élèves et nombre d'élèves de chacune."""
+    try:
+        return get_backend().get_class_list()
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des classes : {e}")
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
+def get_class_students(classe, after=None, search=None, limit=50):
+    """Résumés par matière des `limit` élèves de la classe dont le prénom suit `after`."""
+    try:
+        return get_backend().get_class_students(classe, after, search, limit)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des élèves de la classe : {e}")
+        return _empty_frame()
+
+@metrics.instrumented(metrics.DB)
+def get_class_score_distribution(classe):
+    """Nombre de leçons de la classe par matière et par score au 1er quiz."""
+    try:
+        return get_backend().get_class_score_distribution(classe)
+    except StorageError as e:
+        st.error(f"Erreur de base de données lors de la récupération des scores de la classe : {e}")
+        return _empty_frame()
@@ -1,13 +1,13 @@
 # modules/gemini_handler.py
 import streamlit as st
-import google.generativeai as genai
 import json
-import re
+from modules import appreciation, gemini_client, metrics, model_routing, response_parser
 
 # --- Configuration de l'API Gemini ---
 def configure_gemini():
+    """Configure l'API tout de suite (ligne de commande) ; sinon, c'est fait au premier appel."""
     try:
-        genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+        gemini_client.configure(st.secrets["GEMINI_API_KEY"])
     except Exception as e:
         st.error(f"Erreur de configuration de Gemini : {e}")
         st.error("Veuillez vous assurer que votre clé API est correctement configurée dans .streamlit/secrets.toml")
@@ -15,23 +15,76 @@ def configure_gemini():
 
 # --- Fonctions de Génération ---
 
-def _extract_json_from_response(text):
+class InvalidResponseError(ValueError):
+    """La réponse de l'IA ne contient pas le JSON attendu."""
+
+    def __init__(self, message, raw_text):
+        super().__init__(message)
+        self.raw_text = raw_text
+
+# Nombre de demandes de correction des seuls champs invalides avant d'abandonner.
+MAX_FIELD_REPAIRS = 1
+
+# Opérations mesurées qui ne portent pas le nom de leur tâche dans model_routing.
+_ROUTING_TASKS = {"lecon_stream": "lecon", "remediation_lot": "remediation"}
+
+# Limite de l'API pour la taille d'une réponse (une remédiation groupée en contient plusieurs).
+MAX_OUTPUT_TOKENS = 8192
+
+def _call_model(model, prompt, operation, reessais=0, config=None, coalesce=True):
+    """Appelle le modèle via le client partagé (limiteur, réessais, disjoncteur, mesures).
+
+    Sauf `config` explicite, la tâche de model_routing correspondant à `operation` fixe la
+    taille maximale de la réponse. Avec coalesce=False, l'appel n'est pas fusionné avec un
+    appel identique en cours.
     """
-    Fonction utilitaire pour extraire un bloc JSON d'un texte potentiellement mal formaté.
+    if config is None:
+        config = model_routing.generation_config_for(_ROUTING_TASKS.get(operation, operation))
+    return gemini_client.generate(model, prompt, operation, reessais=reessais, generation_config=config, coalesce=coalesce)
+
+def _complete_invalid_fields(model, prompt, payload, schema, quoi, raw_text, operation):
+    """Valide la réponse et ne fait régénérer que les champs invalides, pas toute la réponse."""
+    if not isinstance(payload, dict):
+        payload = {}
+    problems = response_parser.validate(payload, schema)
+    for attempt in range(1, MAX_FIELD_REPAIRS + 1):
+        if not problems:
+            break
+        valid_fields = {k: v for k, v in payload.items() if k in schema and k not in problems}
+        details = "; ".join(f"{field} ({problem})" for field, problem in problems.items())
+        repair_prompt = f"""{prompt}
+
+    ATTENTION : ta réponse précédente était invalide pour ces champs : {details}.
+    Voici les champs déjà corrects, à ne pas modifier : {json.dumps(valid_fields, ensure_ascii=False)}
+    Réponds UNIQUEMENT avec un objet JSON contenant les champs {", ".join(problems)} corrigés.
     """
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        return match.group(0)
-    return None
+        response = _call_model(model, repair_prompt, operation, reessais=attempt)
+        try:
+            partial = response_parser.parse_json_response(response.text)
+        except response_parser.ResponseParseError:
+            continue
+        if isinstance(partial, dict):
+            payload.update({field: partial[field] for field in problems if field in partial})
+        problems = response_parser.validate(payload, schema)
+    if problems:
+        details = "; ".join(f"{field} : {problem}" for field, problem in problems.items())
+        raise InvalidResponseError(f"Réponse de l'IA invalide pour la {quoi} ({details}).", raw_text)
+    return payload
 
+def _parse_validated(model, prompt, raw_text, schema, quoi, operation):
+    """Extrait, répare et valide le JSON d'une réponse complète."""
+    try:
+        payload = response_parser.parse_json_response(raw_text)
+    except response_parser.ResponseParseError as e:
+        raise InvalidResponseError(f"{e} (génération de la {quoi})", raw_text) from e
+    return _complete_invalid_fields(model, prompt, payload, schema, quoi, raw_text, operation)
 
-# Dans modules/gemini_handler.py
 
-def generate_lesson_and_quiz(classe, matiere):
-    """Génère une leçon et un quiz (version simplifiée sans suggestion d'image)."""
-    model = genai.GenerativeModel('gemini-1.5-flash')
+# Dans modules/gemini_handler.py
 
-    prompt = f"""
+def build_lesson_prompt(classe, matiere):
+    """Construit le prompt de génération d'une leçon (utilisé aussi comme clé du cache de leçons)."""
+    return f"""
     Agis comme un professeur particulier expert, pédagogue et amusant pour un élève en classe de {classe}.
     Ta mission est de créer une mini-leçon et un quiz.
 
@@ -58,38 +111,73 @@ def generate_lesson_and_quiz(classe, matiere):
       ]
     }}
     """
-    # Le reste de la fonction avec l'extraction JSON reste identique.
-    raw_text = ""
+
+def request_lesson_and_quiz(classe, matiere, model=None, coalesce=True):
+    """Comme generate_lesson_and_quiz, mais lève les erreurs au lieu de les afficher.
+
+    `model` permet de fournir un autre modèle (par exemple un faux modèle hors-ligne).
+    coalesce=False demande une leçon distincte même si la même demande est déjà en cours.
+    """
+    model = gemini_client.resolve_model(model or model_routing.model_for("lecon"))
+    prompt = build_lesson_prompt(classe, matiere)
+    response = _call_model(model, prompt, "lecon", coalesce=coalesce)
+    return _parse_validated(model, prompt, response.text, response_parser.LESSON_SCHEMA, "leçon", "lecon")
+
+def stream_lesson_and_quiz(classe, matiere, model=None):
+    """Génère une leçon en streaming.
+
+    Produit des couples (champ, valeur) au fil de la réponse : 'sujet' et 'lecon_markdown'
+    (texte partiel, de plus en plus long), 'quiz_10_questions' une fois le tableau fermé,
+    puis ('resultat', leçon complète). Lève InvalidResponseError si le JSON final reste invalide
+    après réparation.
+    """
+    model = gemini_client.resolve_model(model or model_routing.model_for("lecon"))
+    parser = response_parser.StreamingJsonParser(
+        text_fields=('sujet', 'lecon_markdown'), array_fields=('quiz_10_questions',)
+    )
+    prompt = build_lesson_prompt(classe, matiere)
+    raw_parts = []
+    # La durée mesurée va jusqu'au dernier morceau ; les tokens sont dans ce dernier morceau.
+    with metrics.timed(metrics.LLM, "lecon_stream", modele=metrics.model_name(model), reessais=0) as mesure:
+        for chunk in gemini_client.stream(model, prompt, generation_config=model_routing.generation_config_for("lecon")):
+            raw_parts.append(chunk.text)
+            mesure.update(metrics.usage_fields(chunk))
+            for field in sorted(parser.feed(chunk.text)):
+                yield field, parser.fields[field]
+    raw_text = ''.join(raw_parts)
     try:
-        response = model.generate_content(prompt)
-        raw_text = response.text
-        json_str = _extract_json_from_response(raw_text)
-        if json_str:
-            return json.loads(json_str)
-        else:
-            st.error("Aucun bloc JSON valide n'a été trouvé dans la réponse de l'IA pour la leçon.")
-            st.code(raw_text)
-            return None
-    except Exception as e:
-        st.error(f"Erreur API lors de la génération de la leçon : {e}")
-        return None
+        lesson = parser.result()
+    except json.JSONDecodeError:
+        # Réponse mal formée : on passe par l'analyse tolérante (réparation).
+        lesson = _parse_validated(model, prompt, raw_text, response_parser.LESSON_SCHEMA, "leçon", "lecon_stream")
+    else:
+        lesson = _complete_invalid_fields(model, prompt, lesson, response_parser.LESSON_SCHEMA, "leçon", raw_text, "lecon_stream")
+    yield 'resultat', lesson
 
-    except json.JSONDecodeError as e:
-        st.error(f"Erreur de décodage JSON lors de la génération de la leçon: {e}")
+def generate_lesson_and_quiz(classe, matiere):
+    """Génère une leçon et un quiz (version simplifiée sans suggestion d'image)."""
+    try:
+        return request_lesson_and_quiz(classe, matiere)
+    except gemini_client.GeminiUnavailableError as e:
+        st.warning(f"L'IA est très sollicitée en ce moment, réessaie dans quelques instants. ({e})")
+        return None
+    except InvalidResponseError as e:
+        st.error(str(e))
         st.info("La réponse de l'IA n'était pas un JSON valide. Voici la réponse brute reçue :")
-        st.code(raw_text)
+        st.code(e.raw_text)
         return None
     except Exception as e:
-        st.error(f"Une erreur inattendue est survenue avec l'API Gemini : {e}")
+        st.error(f"Erreur API lors de la génération de la leçon : {e}")
         return None
 
-# Les fonctions generate_remediation_and_quiz et generate_appreciation restent inchangées
-def generate_remediation_and_quiz(classe, failed_concepts):
-    """Génère une explication ciblée et un mini-quiz de 5 questions."""
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
-    
-    concepts_str = ", ".join(failed_concepts)
-    prompt = f"""
+def build_remediation_prompt(classe, failed_concepts):
+    """Construit le prompt de remédiation pour une liste de concepts ratés.
+
+    Les concepts sont dédoublonnés, triés et limités (model_routing.budget_concepts) : le même
+    ensemble donne le même prompt, que gemini_client peut fusionner avec une demande identique.
+    """
+    concepts_str = ", ".join(model_routing.budget_concepts(failed_concepts))
+    return f"""
     Agis comme un coach scolaire patient et encourageant pour un élève en {classe}.
     L'élève vient de rater des questions sur les concepts suivants : **{concepts_str}**.
 
@@ -110,23 +198,92 @@ def generate_remediation_and_quiz(classe, failed_concepts):
       ]
     }}
     """
-    raw_text = ""
+
+def request_remediation_and_quiz(classe, failed_concepts, model=None):
+    """Comme generate_remediation_and_quiz, mais lève les erreurs au lieu de les afficher."""
+    model = gemini_client.resolve_model(model or model_routing.model_for("remediation"))
+    prompt = build_remediation_prompt(classe, failed_concepts)
+    response = _call_model(model, prompt, "remediation")
+    return _parse_validated(model, prompt, response.text, response_parser.REMEDIATION_SCHEMA, "remédiation", "remediation")
+
+def build_batch_remediation_prompt(classe, concept_sets):
+    """Prompt unique couvrant plusieurs remédiations (une par ensemble de concepts ratés)."""
+    items = "\n".join(
+        f"    - id {i} : {', '.join(model_routing.budget_concepts(concepts))}"
+        for i, concepts in enumerate(concept_sets, start=1)
+    )
+    return f"""
+    Agis comme un coach scolaire patient et encourageant pour des élèves en {classe}.
+    Chaque élève ci-dessous vient de rater des questions sur les concepts indiqués :
+{items}
+
+    TA MISSION, pour CHAQUE id :
+    1.  Rédige une explication TRÈS SIMPLE, claire et concise pour l'aider à comprendre SPÉCIFIQUEMENT ses concepts. Utilise une autre analogie ou un autre exemple que la leçon initiale. Si c'est une langue, tu peux utiliser du français pour l'explication.
+    2.  Crée un nouveau mini-quiz de 5 questions QCM très ciblées, uniquement sur ses concepts, pour vérifier qu'il a compris.
+
+    FORMAT DE SORTIE :
+    Réponds OBLIGATOIREMENT en utilisant un format JSON valide, sans aucun texte avant ou après.
+    {{
+      "remediations": [
+        {{
+          "id": 1,
+          "remediation_markdown": "Le contenu de l'explication ciblée en Markdown.",
+          "quiz_5_questions": [
+            {{
+              "question": "Texte de la question 1",
+              "options": ["Option A", "Option B", "Option C"],
+              "correct_answer": "La bonne réponse exacte"
+            }}
+          ]
+        }}
+      ]
+    }}
+    """
+
+def request_batch_remediation(classe, concept_sets, model=None):
+    """Génère en un seul appel une remédiation par ensemble de concepts.
+
+    Retourne une liste alignée sur `concept_sets` : la remédiation validée, ou None pour
+    un élément absent ou invalide (à redemander individuellement).
+    """
+    model = gemini_client.resolve_model(model or model_routing.model_for("remediation"))
+    prompt = build_batch_remediation_prompt(classe, concept_sets)
+    per_item = model_routing.generation_config_for("remediation")["max_output_tokens"]
+    config = {"max_output_tokens": min(MAX_OUTPUT_TOKENS, per_item * len(concept_sets))}
+    response = _call_model(model, prompt, "remediation_lot", config=config)
     try:
-        response = model.generate_content(prompt)
-        raw_text = response.text
-        json_str = _extract_json_from_response(raw_text)
-        
-        if json_str:
-            return json.loads(json_str)
-        else:
-            st.error("Aucun bloc JSON valide n'a été trouvé dans la réponse de l'IA pour la remédiation.")
-            st.code(raw_text)
-            return None
-
-    except json.JSONDecodeError as e:
-        st.error(f"Erreur de décodage JSON lors de la génération de la remédiation: {e}")
+        payload = response_parser.parse_json_response(response.text)
+    except response_parser.ResponseParseError:
+        return [None] * len(concept_sets)
+    items = payload.get('remediations') if isinstance(payload, dict) else None
+    results = [None] * len(concept_sets)
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get('id')) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(results) and not response_parser.validate(item, response_parser.REMEDIATION_SCHEMA):
+            results[index] = {field: item[field] for field in response_parser.REMEDIATION_SCHEMA}
+    return results
+
+def generate_remediation_and_quiz(classe, failed_concepts, request=None):
+    """Génère une explication ciblée et un mini-quiz de 5 questions.
+
+    `request` remplace l'appel direct, par ex. remediation_batcher.request qui regroupe
+    les demandes simultanées de plusieurs élèves.
+    """
+    request = request or request_remediation_and_quiz
+    try:
+        return request(classe, failed_concepts)
+    except gemini_client.GeminiUnavailableError as e:
+        st.warning(f"L'IA est très sollicitée en ce moment, réessaie dans quelques instants. ({e})")
+        return None
+    except InvalidResponseError as e:
+        st.error(str(e))
         st.info("La réponse de l'IA n'était pas un JSON valide. Voici la réponse brute reçue :")
-        st.code(raw_text)
+        st.code(e.raw_text)
         return None
     except Exception as e:
         st.error(f"Une erreur inattendue est survenue avec l'API Gemini : {e}")
@@ -134,14 +291,32 @@ def generate_remediation_and_quiz(classe, failed_concepts):
 
 
 def generate_appreciation(score, total_questions, sujet, a_ete_remedie=False):
-    """Génère une appréciation finale personnalisée."""
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
-    
+    """Génère une appréciation finale personnalisée.
+
+    Selon model_routing, l'appréciation est rédigée instantanément à partir de modèles
+    de phrases, reformulée par l'IA à partir de ce texte, ou entièrement rédigée par l'IA.
+    En cas d'erreur de l'IA, le texte du modèle de phrases est retourné.
+    """
+    texte_modele = appreciation.template_appreciation(score, total_questions, sujet, a_ete_remedie)
+    tier = model_routing.tier_for("appreciation")
+    if tier == "modele":
+        return texte_modele
+    model = gemini_client.resolve_model(model_routing.model_for("appreciation"))
+
     contexte = f"L'élève a eu {score}/{total_questions} sur le quiz concernant '{sujet}'."
     if a_ete_remedie:
         contexte += " Ce résultat a été obtenu après une session de remédiation, ce qui montre de la persévérance."
 
-    prompt = f"""
+    if tier == "modele+ia":
+        prompt = f"""
+    Agis comme un commentateur bienveillant et motivant.
+    Contexte : {contexte}
+    Reformule cette appréciation pour la rendre plus chaleureuse et personnelle, en 2-3 phrases au maximum :
+    "{texte_modele}"
+    Ne retourne que le texte de l'appréciation, rien d'autre.
+    """
+    else:
+        prompt = f"""
     Agis comme un commentateur bienveillant et motivant.
     Rédige une appréciation courte (2-3 phrases) pour un élève en te basant sur le contexte suivant : {contexte}.
     - Si le score est bon, sois très positif et félicite.
@@ -150,8 +325,8 @@ def generate_appreciation(score, total_questions, sujet, a_ete_remedie=False):
     Ne retourne que le texte de l'appréciation, rien d'autre.
     """
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        st.error(f"Erreur API lors de la génération de l'appréciation : {e}")
-        return "N'oublie pas de toujours faire de ton mieux !"
+        response = _call_model(model, prompt, "appreciation")
+        return response.text.strip() or texte_modele
+    except Exception:
+        # L'appréciation du modèle de phrases est toujours disponible : pas de message d'erreur.
+        return texte_modele
@@ -0,0 +1,324 @@
+# modules/gemini_client.py
+"""Couche d'accès partagée à l'API Gemini.
+
+- une seule instance de modèle par nom, pour tout le processus ;
+- un seau à jetons commun à toutes les sessions (débit maximal vers l'API) ;
+- réessais avec backoff exponentiel et gigue sur les 429 et les erreurs 5xx ;
+- un délai maximal par appel, réessais compris ;
+- les requêtes identiques en cours sont fusionnées (un seul appel, résultat partagé) ;
+- un disjoncteur : après plusieurs échecs d'affilée, les appels échouent tout de suite
+  (GeminiUnavailableError) et l'appelant se rabat sur le cache ou la banque de leçons.
+
+Pour les tests, set_model_factory() remplace les modèles réels par un faux modèle
+(par exemple lesson_bank.FakeModel).
+"""
+import random
+import threading
+import time
+from concurrent.futures import Future
+import streamlit as st
+from modules import metrics
+
+# Débit maximal vers l'API, toutes sessions confondues (appels par seconde et rafale).
+RATE_PER_SECOND = 2.0
+BURST = 4
+
+# Réessais sur les erreurs temporaires et délai maximal d'un appel (réessais compris).
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+CALL_TIMEOUT_SECONDS = 60.0
+
+# Disjoncteur : ouvert après N échecs d'affilée, nouvel essai après le délai de repos.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+_RETRYABLE_ERRORS = (
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "BadGateway", "GatewayTimeout", "DeadlineExceeded", "TimeoutError",
+)
+
+
+class GeminiUnavailableError(RuntimeError):
+    """L'API n'a pas pu répondre (limite de débit, erreur serveur persistante, délai dépassé)."""
+
+
+class CircuitOpenError(GeminiUnavailableError):
+    """Le disjoncteur est ouvert : l'appel n'est même pas tenté."""
+
+
+def is_retryable(error):
+    """Vrai pour les erreurs temporaires de l'API : HTTP 429, 5xx, délai dépassé."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and (code == 429 or 500 <= code < 600):
+        return True
+    return type(error).__name__ in _RETRYABLE_ERRORS or "429" in str(error)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SECONDS, maximum=BACKOFF_MAX_SECONDS):
+    """Délai avant le réessai n° `attempt` (à partir de 0) : exponentiel, avec gigue."""
+    delay = min(maximum, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` jetons par seconde, au plus `capacity` en réserve."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Prend un jeton ; retourne False si aucun n'est disponible avant `timeout` secondes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Disjoncteur 'fermé' / 'ouvert' / 'semi-ouvert'.
+
+    Ouvert après `threshold` échecs consécutifs ; au bout de `reset_seconds`, un seul
+    appel d'essai passe (semi-ouvert) : son succès referme le disjoncteur, son échec le rouvre.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "ferme"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "ouvert":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self.state = "semi-ouvert"
+                self._trial_running = False
+            if self.state == "semi-ouvert":
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "ferme"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "semi-ouvert" or self._failures >= self.threshold:
+                self.state = "ouvert"
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+@st.cache_resource
+def configure(api_key):
+    """Importe et configure google.generativeai, une seule fois par processus."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai
+
+
+def _default_model_factory(name):
+    # La bibliothèque (lente à importer) n'est chargée qu'à la création du premier vrai modèle.
+    return configure(st.secrets["GEMINI_API_KEY"]).GenerativeModel(name)
+
+
+class GeminiClient:
+    """Client partagé : modèles en cache, limiteur, réessais, fusion des requêtes, disjoncteur."""
+
+    def __init__(self, model_factory=_default_model_factory):
+        self.model_factory = model_factory
+        self.bucket = TokenBucket(RATE_PER_SECOND, BURST)
+        self.breaker = CircuitBreaker()
+        self._models = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = {"appels": 0, "reessais": 0, "fusionnes": 0, "refuses": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def model(self, model):
+        """Retourne l'instance partagée pour un nom de modèle (un objet modèle est retourné tel quel)."""
+        if not isinstance(model, str):
+            return model
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = self.model_factory(model)
+            return self._models[model]
+
+    def set_model_factory(self, factory):
+        with self._lock:
+            self.model_factory = factory
+            self._models.clear()
+
+    def _start_attempt(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self.bucket.acquire(timeout=remaining):
+            raise GeminiUnavailableError("Délai dépassé en attendant l'API Gemini.")
+        return deadline - time.monotonic()
+
+    def _retry_or_raise(self, error, attempt, deadline):
+        """Attend avant un nouvel essai, ou relève l'erreur si elle est définitive ou le délai épuisé."""
+        if not is_retryable(error):
+            raise error
+        delay = backoff_delay(attempt)
+        if attempt + 1 >= MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+            raise GeminiUnavailableError(f"L'API Gemini ne répond pas : {error}") from error
+        self._count("reessais")
+        time.sleep(delay)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._count("refuses")
+            raise CircuitOpenError("L'API Gemini est momentanément indisponible.")
+
+    def _with_retries(self, attempt_call, deadline, mesure=None):
+        """Essais de `attempt_call(délai restant)` jusqu'au succès ; le disjoncteur note l'issue de l'appel.
+
+        Tout l'appel est dans le try, attente d'un jeton comprise : un appel d'essai (semi-ouvert)
+        se termine toujours par un succès ou un échec, sinon le disjoncteur resterait bloqué.
+        """
+        try:
+            for attempt in range(MAX_ATTEMPTS):
+                if mesure is not None:
+                    mesure["tentatives"] = attempt + 1
+                remaining = self._start_attempt(deadline)
+                self._count("appels")
+                try:
+                    result = attempt_call(remaining)
+                except Exception as e:
+                    self._retry_or_raise(e, attempt, deadline)
+                    continue
+                break
+        except GeminiUnavailableError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # L'API a répondu (requête invalide...) ou l'appel a été interrompu : ce n'est pas une panne.
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _call(self, model, prompt, operation, reessais, timeout, generation_config):
+        self._admit()
+        deadline = time.monotonic() + timeout
+        with metrics.timed(metrics.LLM, operation, modele=metrics.model_name(model), reessais=reessais) as mesure:
+            response = self._with_retries(
+                lambda remaining: model.generate_content(
+                    prompt, generation_config=generation_config, request_options={"timeout": remaining}
+                ),
+                deadline, mesure,
+            )
+            mesure.update(metrics.usage_fields(response))
+            return response
+
+    def generate(self, model, prompt, operation, reessais=0, timeout=CALL_TIMEOUT_SECONDS, generation_config=None,
+                 coalesce=True):
+        """Appel complet (non streamé). Les appels identiques simultanés partagent la même réponse.
+
+        coalesce=False : chaque appel est un tirage indépendant (banque de leçons, qui demande
+        plusieurs leçons différentes au même prompt).
+        """
+        model = self.model(model)
+        if not coalesce:
+            return self._call(model, prompt, operation, reessais, timeout, generation_config)
+        key = (id(model), prompt)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.counters["fusionnes"] += 1
+        if not leader:
+            return future.result(timeout=timeout)
+        try:
+            response = self._call(model, prompt, operation, reessais, timeout, generation_config)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stream(self, model, prompt, timeout=CALL_TIMEOUT_SECONDS, generation_config=None):
+        """Appel en streaming ; seuls les échecs avant le premier morceau sont réessayés."""
+        model = self.model(model)
+        self._admit()
+        deadline = time.monotonic() + timeout
+
+        def first_chunk(remaining):
+            chunks = iter(model.generate_content(
+                prompt, stream=True, generation_config=generation_config, request_options={"timeout": remaining}
+            ))
+            return chunks, next(chunks, None)
+
+        chunks, first = self._with_retries(first_chunk, deadline)
+        if first is None:
+            return
+        yield first
+        try:
+            yield from chunks
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            raise
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, disjoncteur=self.breaker.state, en_cours=len(self._inflight))
+
+
+@st.cache_resource
+def get_client():
+    """Client unique pour tout le processus (partagé par toutes les sessions)."""
+    return GeminiClient()
+
+
+def set_model_factory(factory):
+    """Remplace la fabrique de modèles, par ex. `lambda name: lesson_bank.FakeModel()` pour les tests."""
+    get_client().set_model_factory(factory)
+
+
+def resolve_model(model):
+    return get_client().model(model)
+
+
+def generate(model, prompt, operation, reessais=0, timeout=CALL_TIMEOUT_SECONDS, generation_config=None, coalesce=True):
+    return get_client().generate(model, prompt, operation, reessais=reessais, timeout=timeout,
+                                 generation_config=generation_config, coalesce=coalesce)
+
+
+def stream(model, prompt, timeout=CALL_TIMEOUT_SECONDS, generation_config=None):
+    return get_client().stream(model, prompt, timeout=timeout, generation_config=generation_config)
+
+
+def client_stats():
+    return get_client().stats()
@@ -0,0 +1,236 @@
+# modules/item_analysis.py
+"""Analyse des questions à partir du journal des réponses (table reponses).
+
+Pour chaque question (item), par classe et par matière :
+- difficulte : part de bonnes réponses (indice p ; 0,9 = question facile) ;
+- discrimination : corrélation point-bisériale entre la réussite de la question et le
+  score obtenu aux autres questions du même quiz (une question qui discrimine bien est
+  surtout réussie par les élèves qui réussissent le reste ; proche de 0 ou négative :
+  question ambiguë ou mal corrigée) ;
+- distracteurs : part des réponses qui choisissent chaque option.
+
+Tous les calculs sont vectorisés (pandas.factorize + numpy.bincount) : aucune boucle
+Python par réponse, quelques centaines de millisecondes pour plusieurs millions de réponses.
+
+Utilisation :
+    python -m modules.item_analysis rapport --classe CM1 --matiere Mathématiques
+    python -m modules.item_analysis banc --reponses 2000000
+"""
+import argparse
+import json
+import statistics
+import time
+import numpy as np
+import pandas as pd
+
+ITEM_COLUMNS = ["classe", "matiere", "question_cle"]
+# En dessous, la discrimination d'une question n'est pas calculée (trop peu de tentatives).
+MIN_REPONSES_DISCRIMINATION = 20
+
+
+def _combine(codes, levels, columns):
+    """Code unique de chaque ligne pour la combinaison des `codes` de chaque colonne.
+
+    Retourne ce code (0..k-1) et les k combinaisons rencontrées (une ligne par code).
+    """
+    combined = np.zeros(len(codes[0]), dtype=np.int64)
+    for column_codes, uniques in zip(codes, levels):
+        combined = combined * len(uniques) + column_codes
+    size = int(np.prod([len(uniques) for uniques in levels], dtype=np.float64))
+    if size <= 4 * len(combined):
+        # Peu de combinaisons possibles : renumérotation par tableau, sans table de hachage.
+        present = np.zeros(size, dtype=bool)
+        present[combined] = True
+        result = (np.cumsum(present) - 1)[combined]
+        combinations = np.flatnonzero(present)
+    else:
+        result, combinations = pd.factorize(combined)
+    keys = {}
+    for column, uniques in zip(reversed(columns), reversed(levels)):
+        combinations, position = np.divmod(combinations, len(uniques))
+        keys[column] = np.asarray(uniques)[position]
+    return result, pd.DataFrame({column: keys[column] for column in columns})
+
+
+def _item_codes(answers):
+    """Tentative et item (classe, matiere, question_cle) de chaque réponse, codés par des entiers.
+
+    Classe et matière ne changent pas au cours d'une tentative : ces textes ne sont
+    factorisés qu'une fois par tentative, pas une fois par réponse.
+    """
+    attempt, attempts = pd.factorize(answers["tentative"])
+    first = np.empty(len(attempts), dtype=np.int64)
+    first[attempt] = np.arange(len(answers))
+    codes, levels = [], []
+    for column in ("classe", "matiere"):
+        attempt_codes, uniques = pd.factorize(answers[column].iloc[first])
+        codes.append(attempt_codes[attempt])
+        levels.append(uniques)
+    question_codes, uniques = pd.factorize(answers["question_cle"])
+    codes.append(question_codes)
+    levels.append(uniques)
+    item, keys = _combine(codes, levels, ITEM_COLUMNS)
+    return attempt, item, keys
+
+
+def item_statistics(answers):
+    """Difficulté et discrimination de chaque question, par classe et par matière.
+
+    `answers` : colonnes classe, matiere, tentative, question_cle, correcte
+    (database.get_answers). Retourne une ligne par item, la plus difficile en premier.
+    """
+    columns = ITEM_COLUMNS + ["reponses", "difficulte", "discrimination"]
+    if answers.empty:
+        return pd.DataFrame(columns=columns)
+    correct = answers["correcte"].to_numpy(dtype=np.float64)
+    attempt, item, keys = _item_codes(answers)
+    # Score de la tentative (un quiz d'une leçon) moins la question elle-même.
+    rest = np.bincount(attempt, weights=correct)[attempt] - correct
+    n_items = len(keys)
+    n = np.bincount(item, minlength=n_items).astype(np.float64)
+    sum_x = np.bincount(item, weights=correct, minlength=n_items)
+    sum_y = np.bincount(item, weights=rest, minlength=n_items)
+    sum_xy = np.bincount(item, weights=correct * rest, minlength=n_items)
+    sum_yy = np.bincount(item, weights=rest * rest, minlength=n_items)
+    # Pearson sur des sommes : x est binaire, donc somme(x²) = somme(x).
+    covariance = n * sum_xy - sum_x * sum_y
+    variance = (n * sum_x - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        discrimination = covariance / np.sqrt(variance)
+    discrimination[(variance <= 0) | (n < MIN_REPONSES_DISCRIMINATION)] = np.nan
+
+    keys["reponses"] = n.astype(np.int64)
+    keys["difficulte"] = sum_x / n
+    keys["discrimination"] = discrimination
+    return keys[columns].sort_values(["difficulte", "reponses"], ascending=[True, False], ignore_index=True)
+
+
+def distractor_frequencies(answers):
+    """Part des réponses qui choisissent chaque option de chaque question.
+
+    Retourne une ligne par (item, option choisie au moins une fois) : reponses, part,
+    et est_correcte (option choisie dans les bonnes réponses).
+    """
+    columns = ITEM_COLUMNS + ["option", "reponses", "part", "est_correcte"]
+    if answers.empty:
+        return pd.DataFrame(columns=columns)
+    _, item, keys = _item_codes(answers)
+    option = answers["option_choisie"].to_numpy(dtype=np.int64)
+    correct = answers["correcte"].to_numpy(dtype=np.float64)
+    n_options = int(option.max()) + 1
+    cell = item * n_options + option
+    size = len(keys) * n_options
+    counts = np.bincount(cell, minlength=size)
+    correct_counts = np.bincount(cell, weights=correct, minlength=size)
+    totals = np.bincount(item, minlength=len(keys))
+
+    chosen = np.flatnonzero(counts)
+    item_of_cell = chosen // n_options
+    result = keys.iloc[item_of_cell].reset_index(drop=True)
+    result["option"] = chosen % n_options
+    result["reponses"] = counts[chosen]
+    result["part"] = counts[chosen] / totals[item_of_cell]
+    result["est_correcte"] = correct_counts[chosen] > 0
+    return result[columns]
+
+
+def analyse(classe=None, matiere=None):
+    """Statistiques des questions du journal, avec leur texte et leurs distracteurs les plus choisis."""
+    from modules import database
+    answers = database.get_answers(classe, matiere)
+    stats = item_statistics(answers)
+    if stats.empty:
+        return stats, distractor_frequencies(answers)
+    questions = database.get_questions(stats["question_cle"].unique().tolist())
+    if not questions.empty:
+        questions = questions.rename(columns={"cle": "question_cle", "texte": "question"})
+        stats = stats.merge(questions[["question_cle", "question", "options"]], on="question_cle", how="left")
+    return stats, distractor_frequencies(answers)
+
+
+# --- Banc d'essai ---
+
+def synthetic_answers(n_answers, n_items_per_cell=60, questions_per_quiz=10, seed=0):
+    """Journal fictif : élèves de niveaux variés, questions de difficultés variées (modèle de Rasch).
+
+    Quelques questions sont volontairement ambiguës (discrimination négative) pour
+    vérifier qu'elles remontent dans l'analyse.
+    """
+    from modules.constants import ALL_CLASSES, MATIERES
+    rng = np.random.default_rng(seed)
+    cells = [(classe, matiere) for classe in ALL_CLASSES for matiere in MATIERES]
+    n_attempts = n_answers // questions_per_quiz
+    cell_of_attempt = rng.integers(len(cells), size=n_attempts)
+    ability = rng.normal(size=n_attempts)
+    # Chaque tentative pose `questions_per_quiz` questions de sa classe et de sa matière.
+    local_item = rng.integers(n_items_per_cell, size=(n_attempts, questions_per_quiz))
+    item = (cell_of_attempt[:, None] * n_items_per_cell + local_item).ravel()
+    attempt = np.repeat(np.arange(n_attempts), questions_per_quiz)
+    n_items = len(cells) * n_items_per_cell
+    difficulty = rng.normal(size=n_items)
+    slope = np.where(rng.random(n_items) < 0.05, -0.8, 1.0)
+    p = 1 / (1 + np.exp(-slope[item] * (ability[attempt] - difficulty[item])))
+    correct = rng.random(len(item)) < p
+    # Bonne réponse : option 0 ; les erreurs se répartissent inégalement sur les 3 distracteurs.
+    option = np.where(correct, 0, rng.choice([1, 2, 3], size=len(item), p=[0.6, 0.3, 0.1]))
+    cell = cell_of_attempt[attempt]
+    # Mêmes types que database.get_answers : textes et clés entières sur 60 bits.
+    attempt_keys = rng.integers(2**60, size=n_attempts)
+    question_keys = rng.integers(2**60, size=n_items)
+    return pd.DataFrame({
+        "classe": np.array([classe for classe, _ in cells], dtype=object)[cell],
+        "matiere": np.array([matiere for _, matiere in cells], dtype=object)[cell],
+        "tentative": attempt_keys[attempt],
+        "question_cle": question_keys[item],
+        "option_choisie": option,
+        "correcte": correct.astype(np.int64),
+    })
+
+
+def run_bench(n_answers, repetitions):
+    answers = synthetic_answers(n_answers)
+    timings = {"item_statistics": [], "distractor_frequencies": []}
+    for _ in range(repetitions):
+        for name, function in (("item_statistics", item_statistics), ("distractor_frequencies", distractor_frequencies)):
+            start = time.perf_counter()
+            result = function(answers)
+            timings[name].append(time.perf_counter() - start)
+    stats = item_statistics(answers)
+    return {
+        "reponses": len(answers),
+        "items": len(stats),
+        "repetitions": repetitions,
+        **{f"{name}_mediane_ms": round(statistics.median(values) * 1000, 1) for name, values in timings.items()},
+        "discrimination_negative": int((stats["discrimination"] < 0).sum()),
+        "lignes_distracteurs": len(result),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.item_analysis", description="Analyse des questions des quiz.")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    report = commands.add_parser("rapport", help="Questions les plus difficiles et les moins discriminantes.")
+    report.add_argument("--classe", default=None)
+    report.add_argument("--matiere", default=None)
+    report.add_argument("--lignes", type=int, default=20)
+    bench = commands.add_parser("banc", help="Chronomètre l'analyse sur un journal fictif.")
+    bench.add_argument("--reponses", type=int, default=2_000_000)
+    bench.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.commande == "banc":
+        print(json.dumps(run_bench(args.reponses, args.repetitions), ensure_ascii=False, indent=2))
+        return 0
+    stats, _ = analyse(args.classe, args.matiere)
+    if stats.empty:
+        print("Aucune réponse enregistrée.")
+        return 0
+    with pd.option_context("display.max_colwidth", 60, "display.width", 200):
+        print(stats.head(args.lignes).to_string(index=False))
+        print()
+        print(stats.dropna(subset=["discrimination"]).sort_values("discrimination").head(args.lignes).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
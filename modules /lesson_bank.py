@@ -0,0 +1,258 @@
+# modules/lesson_bank.py
+"""Banque de leçons pré-générées pour chaque case classe × matière.
+
+Utilisation :
+    python -m modules.lesson_bank build --per-cell 5 --concurrency 4
+    python -m modules.lesson_bank build --fake          # hors-ligne, sans appel à l'API
+    python -m modules.lesson_bank status
+
+La banque est le cache de leçons de `lesson_store` : une construction
+interrompue reprend simplement là où elle s'était arrêtée, car seules les
+leçons manquantes de chaque case sont générées.
+"""
+import argparse
+import itertools
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+from modules import database, gemini_client, gemini_handler, lesson_store, response_parser
+from modules.constants import ALL_CLASSES, MATIERES
+
+# Nombre de leçons visées par case, et appels simultanés lors d'une construction.
+TARGET_PER_CELL = 5
+DEFAULT_CONCURRENCY = 4
+
+# Réessais en cas de réponse invalide ou d'API indisponible. gemini_client réessaie
+# déjà chaque appel ; ce backoff, plus long, laisse au disjoncteur le temps de se refermer.
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+QUIZ_SIZE = 10
+
+# Cases en cours de remplissage en arrière-plan (évite deux remplissages simultanés).
+_refilling = set()
+_refilling_lock = threading.Lock()
+
+
+# --- Validation ---
+
+def validate_lesson(lesson):
+    """Retourne la liste des problèmes trouvés dans une leçon générée (vide si elle est valide)."""
+    problems = [f"{field} : {problem}" for field, problem in response_parser.validate(lesson, response_parser.LESSON_SCHEMA).items()]
+    if not problems and len(lesson['quiz_10_questions']) != QUIZ_SIZE:
+        problems.append(f"le quiz doit contenir {QUIZ_SIZE} questions")
+    return problems
+
+
+# --- Génération avec réessais ---
+
+def generate_valid_lesson(classe, matiere, model=None, log=print):
+    """Génère une leçon valide pour (classe, matière), avec backoff exponentiel si l'API est indisponible.
+
+    Retourne None si aucune leçon valide n'a pu être obtenue après MAX_ATTEMPTS essais.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            # Sans fusion : des demandes simultanées pour la même case donnent des leçons distinctes.
+            lesson = gemini_handler.request_lesson_and_quiz(classe, matiere, model=model, coalesce=False)
+        except gemini_handler.InvalidResponseError as e:
+            log(f"[{classe} / {matiere}] réponse invalide : {e}")
+            continue
+        except Exception as e:
+            if not isinstance(e, gemini_client.GeminiUnavailableError) and not gemini_client.is_retryable(e):
+                log(f"[{classe} / {matiere}] erreur API : {e}")
+                return None
+            delay = gemini_client.backoff_delay(attempt, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS)
+            log(f"[{classe} / {matiere}] API indisponible ({e}), nouvel essai dans {delay:.1f} s")
+            time.sleep(delay)
+            continue
+        problems = validate_lesson(lesson)
+        if not problems:
+            return lesson
+        log(f"[{classe} / {matiere}] quiz rejeté : {'; '.join(problems)}")
+    return None
+
+
+# --- Banque ---
+
+def bank_counts():
+    """Nombre de leçons encore valides (non expirées) par case (classe, matière)."""
+    min_ts = int(time.time()) - lesson_store.TTL_DAYS * 86400
+    with database.get_connection() as conn:
+        rows = conn.execute("""
+            SELECT classe, matiere, COUNT(*) FROM lesson_cache
+            WHERE cree_ts >= ?
+            GROUP BY classe, matiere
+        """, (min_ts,)).fetchall()
+    return {(classe, matiere): n for classe, matiere, n in rows}
+
+
+def _fill_one(classe, matiere, model, log):
+    """Génère une leçon pour la case ; True seulement si elle a été ajoutée à la banque."""
+    lesson = generate_valid_lesson(classe, matiere, model=model, log=log)
+    if lesson is None:
+        return False
+    if not lesson_store.add_lesson(classe, matiere, lesson, gemini_handler.build_lesson_prompt(classe, matiere)):
+        log(f"[{classe} / {matiere}] sujet déjà en banque : {lesson['sujet']}")
+        return False
+    return True
+
+
+def build(classes=ALL_CLASSES, matieres=MATIERES, per_cell=TARGET_PER_CELL,
+          concurrency=DEFAULT_CONCURRENCY, model=None, log=print):
+    """Complète la banque jusqu'à `per_cell` leçons par case, avec au plus `concurrency` appels simultanés."""
+    counts = bank_counts()
+    tasks = []
+    for classe, matiere in itertools.product(classes, matieres):
+        missing = per_cell - counts.get((classe, matiere), 0)
+        tasks.extend([(classe, matiere)] * max(0, missing))
+    log(f"{len(tasks)} leçon(s) à générer pour {len(classes) * len(matieres)} case(s).")
+
+    ok = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_fill_one, classe, matiere, model, log) for classe, matiere in tasks]
+        for future in as_completed(futures):
+            if future.result():
+                ok += 1
+            else:
+                failed += 1
+            log(f"Progression : {ok + failed}/{len(tasks)} ({failed} échec(s))")
+    return {"generated": ok, "failed": failed}
+
+
+def refill_cell(classe, matiere, prenom=None, per_cell=TARGET_PER_CELL, model=None):
+    """Ajoute au besoin une leçon à la case (classe, matière) ; pensé pour tourner en arrière-plan.
+
+    Avec `prenom`, la case est complétée tant que l'élève y a moins de `per_cell` leçons
+    qu'il n'a jamais eues : une case pleine de leçons déjà servies se renouvelle quand même.
+    """
+    cell = (classe, matiere)
+    with _refilling_lock:
+        if cell in _refilling:
+            return False
+        _refilling.add(cell)
+    try:
+        available = lesson_store.count_unseen(prenom, classe, matiere) if prenom else bank_counts().get(cell, 0)
+        if available >= per_cell:
+            return False
+        return _fill_one(classe, matiere, model, log=lambda message: None)
+    except sqlite3.Error:
+        return False
+    finally:
+        with _refilling_lock:
+            _refilling.discard(cell)
+
+
+# --- Faux modèle pour travailler hors-ligne ---
+
+class FakeModel:
+    """Modèle hors-ligne qui imite `genai.GenerativeModel` et renvoie des réponses valides.
+
+    La réponse suit le prompt : leçon, remédiation (seule ou groupée) ou appréciation.
+    `rate_limit_every` simule une erreur 429 tous les N appels ; `latency` ajoute un délai.
+    Avec stream=True, la réponse est une liste de morceaux.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_every=0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise RuntimeError("429 Resource has been exhausted (fake)")
+        text = _fake_response_text(prompt)
+        if kwargs.get("stream"):
+            # Réponse découpée en morceaux, comme generate_content(..., stream=True).
+            return [SimpleNamespace(text=text[i:i + 200]) for i in range(0, len(text), 200)]
+        return SimpleNamespace(text=text)
+
+
+def _fake_quiz(size, sujet, with_concept=True):
+    quiz = []
+    for i in range(1, size + 1):
+        question = {
+            "question": f"Question {i} sur {sujet} ?",
+            "options": ["Réponse A", "Réponse B", "Réponse C", "Réponse D"],
+            "correct_answer": "Réponse A",
+        }
+        if with_concept:
+            question["concept"] = f"Concept {i}"
+        quiz.append(question)
+    return quiz
+
+
+def _fake_remediation():
+    return {
+        "remediation_markdown": "## On reprend\n\nExplication générée hors-ligne.",
+        "quiz_5_questions": _fake_quiz(5, "la remédiation", with_concept=False),
+    }
+
+
+def _fake_response_text(prompt):
+    """Réponse du faux modèle, selon le format demandé par le prompt."""
+    if '"remediations"' in prompt:
+        count = len(re.findall(r"^\s*- id \d+ :", prompt, re.MULTILINE))
+        payload = {"remediations": [dict(_fake_remediation(), id=i) for i in range(1, count + 1)]}
+    elif '"remediation_markdown"' in prompt:
+        payload = _fake_remediation()
+    elif '"quiz_10_questions"' in prompt:
+        sujet = f"Sujet de démonstration {uuid.uuid4().hex[:8]}"
+        # Longueur proche d'une vraie leçon (environ 3 Ko), pour les mesures de mémoire.
+        paragraphe = "Leçon générée hors-ligne : un paragraphe d'explication avec un exemple concret. " * 6
+        payload = {
+            "sujet": sujet, "lecon_markdown": f"## {sujet}\n\n" + "\n\n".join([paragraphe] * 6),
+            "quiz_10_questions": _fake_quiz(QUIZ_SIZE, sujet),
+        }
+    else:
+        # Appréciation : du texte simple.
+        return "Beau travail ! Tu progresses, continue comme ça."
+    return "```json\n" + json.dumps(payload, ensure_ascii=False) + "\n```"
+
+
+# --- Ligne de commande ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.lesson_bank", description="Banque de leçons pré-générées.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Complète la banque pour chaque classe × matière.")
+    build_parser.add_argument("--per-cell", type=int, default=TARGET_PER_CELL, help="Leçons visées par case.")
+    build_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Appels simultanés au maximum.")
+    build_parser.add_argument("--classes", nargs="+", default=list(ALL_CLASSES), choices=ALL_CLASSES)
+    build_parser.add_argument("--matieres", nargs="+", default=list(MATIERES), choices=MATIERES)
+    build_parser.add_argument("--fake", action="store_true", help="Utilise un faux modèle hors-ligne.")
+
+    sub.add_parser("status", help="Affiche le nombre de leçons par case.")
+
+    args = parser.parse_args(argv)
+    database.init_db()
+
+    if args.command == "status":
+        counts = bank_counts()
+        for classe, matiere in itertools.product(ALL_CLASSES, MATIERES):
+            print(f"{classe:8} {matiere:15} {counts.get((classe, matiere), 0)}")
+        return 0
+
+    model = FakeModel() if args.fake else None
+    if not args.fake:
+        gemini_handler.configure_gemini()
+    result = build(args.classes, args.matieres, args.per_cell, args.concurrency, model=model)
+    print(f"Terminé : {result['generated']} leçon(s) ajoutée(s), {result['failed']} échec(s).")
+    return 0 if result["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
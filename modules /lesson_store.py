@@ -0,0 +1,223 @@
+# modules/lesson_store.py
+import hashlib
+import json
+import random
+import sqlite3
+import time
+import streamlit as st
+from modules import database, gemini_handler, metrics
+
+# --- Politique de réutilisation ---
+# "toujours" : on sert une leçon du cache dès qu'il y en a une que l'élève n'a pas vue.
+# "melange"  : on sert le cache avec une probabilité REUSE_PROBABILITY, sinon on
+#              génère une nouvelle leçon (ce qui enrichit le cache).
+# "jamais"   : on génère toujours (le cache est seulement alimenté).
+REUSE_POLICY = "toujours"
+REUSE_PROBABILITY = 0.7
+
+# Durée de vie d'une leçon en cache, et nombre maximum de leçons gardées (éviction LRU).
+TTL_DAYS = 30
+MAX_ENTRIES = 5000
+
+HITS_COUNTER = "lesson_cache:hits"
+MISSES_COUNTER = "lesson_cache:misses"
+TTFC_TOTAL_MS_COUNTER = "streaming:ttfc_total_ms"
+TTFC_COUNT_COUNTER = "streaming:ttfc_count"
+
+
+def lesson_key(prompt, classe, matiere, sujet):
+    """Empreinte d'une leçon : le prompt qui l'a produite, la classe, la matière et le sujet."""
+    h = hashlib.sha256()
+    for part in (prompt, classe, matiere, sujet):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _should_reuse():
+    if REUSE_POLICY == "jamais":
+        return False
+    if REUSE_POLICY == "melange":
+        return random.random() < REUSE_PROBABILITY
+    return True
+
+
+# Leçons non expirées de (classe, matière) que l'élève n'a encore jamais eues : une leçon
+# est exclue si elle lui a déjà été servie, ou si son sujet figure déjà dans son historique
+# (même généré par un autre prompt).
+_UNSEEN_WHERE = """
+    WHERE c.classe = ? AND c.matiere = ? AND c.cree_ts >= ?
+      AND NOT EXISTS (
+          SELECT 1 FROM lecons_servies s
+          WHERE s.eleve_id = ? AND s.cle = c.cle
+      )
+      AND c.sujet NOT IN (SELECT value FROM json_each(?))
+"""
+
+
+def _unseen_params(prenom, classe, matiere):
+    # L'élève et son historique viennent du moteur de stockage, qui n'est pas
+    # forcément la base locale du cache (PostgreSQL).
+    min_ts = int(time.time()) - TTL_DAYS * 86400
+    sujets = json.dumps(database.get_student_topics(prenom, matiere), ensure_ascii=False)
+    return (classe, matiere, min_ts, database.get_student_id(prenom), sujets)
+
+
+@metrics.instrumented(metrics.DB)
+def find_lesson(prenom, classe, matiere):
+    """Cherche une leçon en cache pour (classe, matière) que l'élève n'a encore jamais eue."""
+    query = f"SELECT c.cle, c.contenu FROM lesson_cache c {_UNSEEN_WHERE} ORDER BY c.dernier_usage_ts ASC LIMIT 1"
+    params = _unseen_params(prenom, classe, matiere)
+    try:
+        with database.get_connection() as conn:
+            row = conn.execute(query, params).fetchone()
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de la lecture du cache de leçons : {e}")
+        return None
+    if row is None:
+        return None
+    lesson = json.loads(row[1])
+    lesson['cle_cache'] = row[0]
+    return lesson
+
+
+@metrics.instrumented(metrics.DB)
+def count_unseen(prenom, classe, matiere):
+    """Nombre de leçons en cache pour (classe, matière) que l'élève n'a encore jamais eues.
+
+    Lève sqlite3.Error : pensé pour les tâches d'arrière-plan (lesson_bank.refill_cell).
+    """
+    params = _unseen_params(prenom, classe, matiere)
+    with database.get_connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM lesson_cache c {_UNSEEN_WHERE}", params).fetchone()[0]
+
+
+@metrics.instrumented(metrics.DB)
+def store_lesson(classe, matiere, lesson, prompt):
+    """Ajoute une leçon générée au cache, puis applique le TTL et la limite de taille ; retourne sa clé."""
+    return _store(classe, matiere, lesson, prompt)[0]
+
+
+@metrics.instrumented(metrics.DB)
+def add_lesson(classe, matiere, lesson, prompt):
+    """Comme store_lesson, mais retourne True seulement si la leçon a vraiment été ajoutée.
+
+    False si une leçon de même clé (même prompt, même sujet) était déjà en cache, ou en cas d'erreur.
+    """
+    return _store(classe, matiere, lesson, prompt)[1]
+
+
+def _store(classe, matiere, lesson, prompt):
+    cle = lesson_key(prompt, classe, matiere, lesson['sujet'])
+    now = int(time.time())
+    contenu = {k: v for k, v in lesson.items() if k != 'cle_cache'}
+    inserted = False
+    try:
+        with database.get_connection() as conn, conn:
+            inserted = conn.execute("""
+                INSERT OR IGNORE INTO lesson_cache (cle, classe, matiere, sujet, contenu, cree_ts, dernier_usage_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (cle, classe, matiere, lesson['sujet'], json.dumps(contenu, ensure_ascii=False), now, now)).rowcount == 1
+            conn.execute("DELETE FROM lesson_cache WHERE cree_ts < ?", (now - TTL_DAYS * 86400,))
+            conn.execute("""
+                DELETE FROM lesson_cache WHERE cle IN (
+                    SELECT cle FROM lesson_cache ORDER BY dernier_usage_ts DESC LIMIT -1 OFFSET ?
+                )
+            """, (MAX_ENTRIES,))
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de l'écriture du cache de leçons : {e}")
+        inserted = False
+    return cle, inserted
+
+
+@metrics.instrumented(metrics.DB)
+def mark_served(prenom, cle):
+    """Note que la leçon `cle` a été montrée à l'élève (elle ne lui sera plus proposée)."""
+    if not cle:
+        return
+    eleve_id = database.get_student_id(prenom)
+    now = int(time.time())
+    try:
+        with database.get_connection() as conn, conn:
+            if eleve_id is not None:
+                conn.execute("""
+                    INSERT OR IGNORE INTO lecons_servies (eleve_id, cle, servi_ts) VALUES (?, ?, ?)
+                """, (eleve_id, cle, now))
+            conn.execute("""
+                UPDATE lesson_cache SET nb_utilisations = nb_utilisations + 1, dernier_usage_ts = ?
+                WHERE cle = ?
+            """, (now, cle))
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de la mise à jour du cache de leçons : {e}")
+
+
+@metrics.instrumented(metrics.DB)
+def fallback_lesson(prenom, classe, matiere):
+    """Leçon de secours quand l'API est indisponible : une leçon jamais vue si possible,
+    sinon la leçon de la case (classe, matière) servie le moins récemment."""
+    lesson = find_lesson(prenom, classe, matiere)
+    if lesson is not None:
+        return lesson
+    try:
+        with database.get_connection() as conn:
+            row = conn.execute("""
+                SELECT cle, contenu FROM lesson_cache
+                WHERE classe = ? AND matiere = ?
+                ORDER BY dernier_usage_ts ASC
+                LIMIT 1
+            """, (classe, matiere)).fetchone()
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de la lecture du cache de leçons : {e}")
+        return None
+    if row is None:
+        return None
+    lesson = json.loads(row[1])
+    lesson['cle_cache'] = row[0]
+    return lesson
+
+
+def get_cached_lesson(prenom, classe, matiere):
+    """Sert une leçon du cache si la politique le permet (None sinon) et compte le hit ou le miss."""
+    if _should_reuse():
+        lesson = find_lesson(prenom, classe, matiere)
+        if lesson is not None:
+            database.increment_counter(HITS_COUNTER)
+            return lesson
+    database.increment_counter(MISSES_COUNTER)
+    return None
+
+
+def get_or_generate_lesson(prenom, classe, matiere):
+    """Sert une leçon du cache si la politique le permet, sinon la génère et la met en cache.
+
+    La leçon retournée contient 'cle_cache' : il faut appeler mark_served une fois
+    qu'elle est réellement montrée à l'élève.
+    """
+    lesson = get_cached_lesson(prenom, classe, matiere)
+    if lesson is not None:
+        return lesson
+
+    lesson = gemini_handler.generate_lesson_and_quiz(classe, matiere)
+    if lesson and 'sujet' in lesson:
+        lesson['cle_cache'] = store_lesson(classe, matiere, lesson, gemini_handler.build_lesson_prompt(classe, matiere))
+    return lesson
+
+
+def record_time_to_first_content(seconds):
+    """Enregistre le délai avant l'affichage du premier morceau d'une leçon générée en streaming."""
+    metrics.record(metrics.STAGE, "premier_contenu", seconds)
+    database.increment_counter(TTFC_TOTAL_MS_COUNTER, int(seconds * 1000))
+    database.increment_counter(TTFC_COUNT_COUNTER)
+
+
+def cache_stats():
+    """Hits, misses et taux de réussite du cache de leçons, et délai moyen avant premier contenu."""
+    hits = database.get_counter(HITS_COUNTER) or 0
+    misses = database.get_counter(MISSES_COUNTER) or 0
+    total = hits + misses
+    ttfc_count = database.get_counter(TTFC_COUNT_COUNTER) or 0
+    ttfc_total_ms = database.get_counter(TTFC_TOTAL_MS_COUNTER) or 0
+    return {
+        "hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0,
+        "avg_ttfc_s": ttfc_total_ms / ttfc_count / 1000 if ttfc_count else None,
+    }
@@ -0,0 +1,311 @@
+# modules/load_test.py
+"""Test de charge : des élèves virtuels suivent tout le parcours de la page Leçon du Jour.
+
+Utilisation :
+    python -m modules.load_test --eleves 200 --concurrence 50 --latence 1.5
+    python -m modules.load_test --eleves 50 --sortie rapport.json
+    python -m modules.load_test --eleves 100 --debit-api 10   # quota d'API plus élevé
+
+Chaque élève virtuel est une session streamlit.testing (AppTest) qui passe par
+config, leçon, quiz 1, évaluation, remédiation, quiz 2 et résumé, puis recharge
+son tableau de bord. Gemini est remplacé par lesson_bank.FakeModel, avec une
+latence réglable ; tout le reste (caches de leçons et de remédiations, regroupement
+des remédiations, limiteur de débit, base de données) est le vrai code, dans un seul processus.
+
+Le rapport JSON contient le débit, la latence de chaque rerun par étape, la
+mémoire par session (et pour 1 000 sessions), le magasin de contenus partagé et la
+contention SQLite ; il peut être comparé d'une version à l'autre. Les données sont écrites dans l'établissement TENANT_ID « test-charge »
+(data/etablissements/test-charge/), vidé à la fin.
+"""
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+LESSON_PAGE = ROOT / "pages" / "1_🎓_Leçon_du_Jour.py"
+DASHBOARD_PAGE = ROOT / "🏠_Tableau_de_Bord.py"
+
+LOAD_TEST_TENANT = "test-charge"
+# Délai maximal d'un rerun avant de considérer la session comme bloquée.
+RERUN_TIMEOUT_SECONDS = 300
+
+
+def _share_runtime():
+    """Permet plusieurs AppTest simultanés dans le même processus.
+
+    À chaque run, AppTest modifie puis restaure un état global de Streamlit (faux Runtime,
+    secrets, option global.appTest, mode multipage), ce qui casse les runs des autres
+    sessions encore en cours. Cet état est donc posé une fois pour toutes et partagé,
+    comme sur le serveur.
+    """
+    import contextlib
+    from unittest.mock import MagicMock
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    # Runtime._instance est remis à None à la fin de chaque run.
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.dataframe_source_mgr = DataframeSourceManager()
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance if cls._instance is not None else shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    # Secrets et option de test communs, au lieu d'être posés puis restaurés à chaque run.
+    secrets = Secrets()
+    secrets._secrets = {"GEMINI_API_KEY": "test-de-charge"}
+    st.secrets = secrets
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+
+    # Chaque page est exécutée comme script principal ; AppTest remet ce mode à None
+    # à chaque run : il ne le modifie plus que sur une sous-classe.
+    PagesManager.uses_pages_directory = False
+    app_test.PagesManager = type("PagesManager", (PagesManager,), {})
+
+    # Compilées d'avance : compiler deux scripts en parallèle n'est pas sûr en Python 3.11.
+    script_cache = ScriptCache()
+    for page in (LESSON_PAGE, DASHBOARD_PAGE):
+        script_cache.get_bytecode(str(page))
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def _rss_bytes():
+    """Mémoire résidente actuelle du processus."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _session_state_bytes(at):
+    """Taille sérialisée de l'état de session (les valeurs non sérialisables sont ignorées)."""
+    total = 0
+    for key in at.session_state:
+        try:
+            total += len(pickle.dumps(at.session_state[key]))
+        except Exception:
+            pass
+    return total
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+    return {"n": len(ordered), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+class VirtualStudent:
+    """Un élève qui suit le parcours complet ; chaque rerun est chronométré par étape."""
+
+    def __init__(self, prenom, fail_quiz_1, dashboard_reloads, timings, lock):
+        self.prenom = prenom
+        self.fail_quiz_1 = fail_quiz_1
+        self.dashboard_reloads = dashboard_reloads
+        self.timings = timings
+        self.lock = lock
+        self.apps = []
+        self.lesson_seconds = None
+
+    def _run(self, at, label, action=None):
+        start = time.perf_counter()
+        (action or at).run(timeout=RERUN_TIMEOUT_SECONDS)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.timings.setdefault(label, []).append(elapsed)
+        if at.exception:
+            raise RuntimeError(f"{label} : {at.exception[0].value}")
+
+    @staticmethod
+    def _button(at, prefix):
+        """Clique sur le bouton dont le libellé commence par `prefix` (le run reste à lancer)."""
+        for button in at.button:
+            if button.label.startswith(prefix):
+                return button.click()
+        stage = at.session_state["lesson_stage"] if "lesson_stage" in at.session_state else None
+        errors = [e.value for e in at.error]
+        raise RuntimeError(f"bouton « {prefix} » absent (étape {stage}, erreurs {errors})")
+
+    def _answer_quiz(self, at, quiz_key, wrong):
+        """Répond au quiz : les `wrong` premières questions sont ratées."""
+        from modules import object_store
+
+        for i, question in enumerate(object_store.get(at.session_state[f"{quiz_key}_id"])):
+            correct = question.correct_answer
+            radio = at.radio(key=f"{quiz_key}_form_{i}")
+            radio.set_value(correct if i >= wrong else next(o for o in radio.options if o != correct))
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(str(LESSON_PAGE), default_timeout=RERUN_TIMEOUT_SECONDS)
+        # Même chemin que depuis le tableau de bord : l'élève est déjà sélectionné.
+        at.session_state["select_eleve"] = self.prenom
+        self.apps.append(at)
+
+        start = time.perf_counter()
+        self._run(at, "config")
+        self._run(at, "lecon", self._button(at, "🚀"))
+        self._run(at, "lecture", self._button(at, "J'ai tout lu"))
+        self._answer_quiz(at, "quiz_1", wrong=5 if self.fail_quiz_1 else 0)
+        self._run(at, "quiz_1", self._button(at, "J'ai fini"))
+        self._run(at, "evaluation_1", self._button(at, "Continuer"))
+        state = at.session_state
+        if state["lesson_stage"] == "remediation":
+            if "remediation_content_id" not in state:
+                raise RuntimeError("remédiation : aucune remédiation générée")
+            self._run(at, "remediation", self._button(at, "OK, j'ai compris"))
+            self._answer_quiz(at, "quiz_2", wrong=1)
+            self._run(at, "quiz_2", self._button(at, "J'ai fini"))
+            self._run(at, "evaluation_2", self._button(at, "Continuer"))
+        if state["lesson_stage"] != "summary":
+            raise RuntimeError(f"étape inattendue : {state['lesson_stage']}")
+        if "saved_lesson_uuid" not in state or state["saved_lesson_uuid"] != state["lesson_uuid"]:
+            raise RuntimeError("résumé : la leçon n'a pas été enregistrée")
+        # Parcours complet, de la configuration au résumé (temps de l'élève virtuel compris).
+        self.lesson_seconds = time.perf_counter() - start
+
+        dashboard = AppTest.from_file(str(DASHBOARD_PAGE), default_timeout=RERUN_TIMEOUT_SECONDS)
+        dashboard.session_state["select_eleve"] = self.prenom
+        self.apps.append(dashboard)
+        for _ in range(self.dashboard_reloads):
+            self._run(dashboard, "tableau_de_bord")
+
+
+def run_load_test(students, concurrency, latency, fail_ratio, dashboard_reloads, api_rate=None, model_latencies=None):
+    """Lance `students` élèves virtuels, `concurrency` à la fois ; retourne le rapport.
+
+    `model_latencies` donne la latence simulée de certains modèles ({nom: s}), `latency` celle des autres.
+    """
+    # Imports après la configuration de l'établissement (voir main).
+    from modules import (constants, database, gemini_client, lesson_bank, metrics, object_store,
+                         remediation_batcher, remediation_store, sqlite_backend)
+
+    _share_runtime()
+    if api_rate:
+        # Avant la création du client : son seau de jetons lit ces valeurs.
+        gemini_client.RATE_PER_SECOND = api_rate
+        gemini_client.BURST = max(gemini_client.BURST, int(api_rate * 2))
+    gemini_client.set_model_factory(lambda name: lesson_bank.FakeModel(latency=(model_latencies or {}).get(name, latency)))
+    database.init_db()
+    prenoms = [f"Charge-{n:04d}" for n in range(students)]
+    for n, prenom in enumerate(prenoms):
+        database.add_student(prenom, constants.ALL_CLASSES[n % len(constants.ALL_CLASSES)])
+
+    timings, errors = {}, []
+    lock = threading.Lock()
+    virtual_students = [
+        VirtualStudent(prenom, (n % 10) < fail_ratio * 10, dashboard_reloads, timings, lock)
+        for n, prenom in enumerate(prenoms)
+    ]
+
+    def run_one(student):
+        try:
+            student.run()
+            return True
+        except Exception as e:
+            with lock:
+                errors.append(f"{student.prenom} : {e}" if isinstance(e, RuntimeError) else traceback.format_exc(limit=3))
+            return False
+
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="eleve-virtuel") as executor:
+        completed = sum(executor.map(run_one, virtual_students))
+    # Les dernières leçons peuvent encore être dans la file d'écriture.
+    database.flush_writes()
+    elapsed = time.perf_counter() - start
+    # Toutes les sessions sont encore en mémoire : l'écart estime leur coût.
+    rss_after = _rss_bytes()
+    state_sizes = [_session_state_bytes(s.apps[0]) for s in virtual_students if s.apps]
+
+    reruns = sum(len(values) for values in timings.values())
+    db = metrics.load_metrics()
+    db = db[db["type"] == metrics.DB]
+    report = {
+        "parametres": {
+            "eleves": students, "concurrence": concurrency, "latence_api_s": latency,
+            "part_remediation": fail_ratio, "rechargements_tableau_de_bord": dashboard_reloads,
+            "debit_api_par_s": api_rate or gemini_client.RATE_PER_SECOND,
+            "moteur": database.get_backend().name,
+        },
+        "duree_s": round(elapsed, 2),
+        "lecons_terminees": completed,
+        "echecs": len(errors),
+        "erreurs": errors[:10],
+        "debit": {
+            "lecons_par_minute": round(completed / elapsed * 60, 1) if elapsed else 0.0,
+            "reruns_par_seconde": round(reruns / elapsed, 1) if elapsed else 0.0,
+        },
+        "reruns": {label: _percentiles(values) for label, values in timings.items()},
+        "parcours": _percentiles([s.lesson_seconds for s in virtual_students if s.lesson_seconds is not None] or [0.0]),
+        "memoire": {
+            "rss_debut_mo": round(rss_before / 2**20, 1),
+            "rss_fin_mo": round(rss_after / 2**20, 1),
+            "par_session_ko": round((rss_after - rss_before) / max(1, len(virtual_students)) / 1024, 1),
+            "pour_1000_sessions_mo": round((rss_after - rss_before) / max(1, len(virtual_students)) * 1000 / 2**20, 1),
+            "etat_session_moyen_ko": round(sum(state_sizes) / max(1, len(state_sizes)) / 1024, 1),
+        },
+        "sqlite": dict(
+            sqlite_backend.pool_stats(),
+            requetes=metrics.latency_summary(db, ["nom"])[["nom", "appels", "p50_ms", "p95_ms", "p99_ms", "erreurs"]]
+            .round(1).to_dict(orient="records"),
+        ),
+        "api": gemini_client.client_stats(),
+        "remediation": remediation_batcher.batch_stats(),
+        "cache_remediation": remediation_store.cache_stats(),
+        "objets": object_store.store_stats(),
+    }
+    if database.write_behind():
+        report["ecritures"] = database.get_write_queue().stats()
+    database.get_backend().delete_tenant_data()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.load_test", description="Test de charge du parcours de leçon.")
+    parser.add_argument("--eleves", type=int, default=100, help="Nombre d'élèves virtuels.")
+    parser.add_argument("--concurrence", type=int, default=25, help="Élèves virtuels simultanés.")
+    parser.add_argument("--latence", type=float, default=1.0, help="Latence simulée de chaque appel à Gemini (s).")
+    parser.add_argument("--part-remediation", type=float, default=0.7, help="Part des élèves qui ratent le 1er quiz.")
+    parser.add_argument("--rechargements", type=int, default=2, help="Rechargements du tableau de bord par élève.")
+    parser.add_argument("--debit-api", type=float, default=None,
+                        help="Appels à Gemini autorisés par seconde (quota du compte par défaut).")
+    parser.add_argument("--sortie", type=Path, default=None, help="Fichier du rapport JSON (sinon : sortie standard).")
+    args = parser.parse_args(argv)
+
+    # Un établissement dédié, et des mesures dans un fichier à part.
+    os.environ["TENANT_ID"] = LOAD_TEST_TENANT
+    from modules import metrics
+    metrics.METRICS_FILE = Path(tempfile.mkdtemp(prefix="test-charge-")) / "metrics.jsonl"
+
+    report = run_load_test(args.eleves, args.concurrence, args.latence, args.part_remediation, args.rechargements, args.debit_api)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.sortie:
+        args.sortie.write_text(text, encoding="utf-8")
+        print(f"Rapport écrit dans {args.sortie} : {report['lecons_terminees']} leçon(s) en {report['duree_s']} s, {report['echecs']} échec(s).")
+    else:
+        print(text)
+    return 0 if not report["echecs"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
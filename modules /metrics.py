@@ -0,0 +1,142 @@
+# modules/metrics.py
+"""Mesures de latence et de consommation de tokens du parcours de leçon.
+
+Chaque mesure est une ligne JSON ajoutée à data/metrics.jsonl :
+    {"ts": ..., "type": "etape" | "llm" | "bdd", "nom": ..., "duree_ms": ...,
+     "modele": ..., "tokens_prompt": ..., "tokens_reponse": ..., "reessais": ..., "erreur": ...,
+     "politique": ...}
+
+Un fichier plutôt qu'une table SQLite : l'écriture d'une mesure ne doit ni
+prendre une connexion du pool ni fausser les durées des requêtes qu'elle mesure.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# METRICS_FILE (variable d'environnement) : autre fichier, par ex. pour un banc d'essai.
+METRICS_FILE = Path(os.environ.get("METRICS_FILE") or Path(__file__).parent.parent / "data" / "metrics.jsonl")
+# Au-delà de cette taille, le fichier est renommé en metrics.jsonl.1 (une seule archive).
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+# Types de mesure.
+STAGE = "etape"
+LLM = "llm"
+DB = "bdd"
+
+# Exceptions de contrôle de Streamlit (st.rerun, st.stop) : ce ne sont pas des erreurs.
+_CONTROL_EXCEPTIONS = ("RerunException", "StopException")
+
+_write_lock = threading.Lock()
+
+
+def record(kind, name, duration_s, **fields):
+    """Ajoute une mesure au fichier ; les champs à None ne sont pas écrits."""
+    event = {"ts": round(time.time(), 3), "type": kind, "nom": name, "duree_ms": round(duration_s * 1000, 1)}
+    event.update({k: v for k, v in fields.items() if v is not None})
+    line = json.dumps(event, ensure_ascii=False) + "\n"
+    try:
+        with _write_lock:
+            METRICS_FILE.parent.mkdir(exist_ok=True)
+            if METRICS_FILE.exists() and METRICS_FILE.stat().st_size > MAX_FILE_BYTES:
+                METRICS_FILE.replace(METRICS_FILE.with_name(METRICS_FILE.name + ".1"))
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError:
+        # Les mesures ne doivent jamais faire échouer une leçon.
+        pass
+
+
+@contextmanager
+def timed(kind, name, **fields):
+    """Mesure la durée du bloc `with`.
+
+    Le dictionnaire produit peut être complété dans le bloc (modèle, tokens, réessais...).
+    Une exception est enregistrée dans le champ 'erreur', puis relancée.
+    """
+    start = time.perf_counter()
+    fields = dict(fields)
+    try:
+        yield fields
+    except BaseException as e:
+        if type(e).__name__ not in _CONTROL_EXCEPTIONS:
+            fields["erreur"] = type(e).__name__
+        raise
+    finally:
+        record(kind, name, time.perf_counter() - start, **fields)
+
+
+def instrumented(kind, name=None):
+    """Décorateur : mesure chaque appel de la fonction (nom par défaut : celui de la fonction)."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def model_name(model):
+    """Nom lisible d'un modèle Gemini ('models/gemini-1.5-flash' -> 'gemini-1.5-flash')."""
+    name = getattr(model, "model_name", None) or type(model).__name__
+    return name.split("/")[-1]
+
+
+def usage_fields(response):
+    """Tokens du prompt et de la réponse d'après `usage_metadata` (vide s'il est absent)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    return {
+        "tokens_prompt": getattr(usage, "prompt_token_count", None),
+        "tokens_reponse": getattr(usage, "candidates_token_count", None),
+    }
+
+
+# --- Lecture et agrégats ---
+
+def load_metrics(since_ts=None):
+    """Charge les mesures (éventuellement depuis `since_ts`) dans un DataFrame."""
+    import pandas as pd
+    records = []
+    for path in (METRICS_FILE.with_name(METRICS_FILE.name + ".1"), METRICS_FILE):
+        if not path.exists():
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # ligne tronquée (arrêt pendant une écriture)
+                if since_ts is None or event.get("ts", 0) >= since_ts:
+                    records.append(event)
+    columns = ["ts", "type", "nom", "duree_ms", "modele", "tokens_prompt", "tokens_reponse", "reessais", "erreur", "politique"]
+    df = pd.DataFrame(records)
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+    for column in ("duree_ms", "tokens_prompt", "tokens_reponse", "reessais"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
+
+
+def latency_summary(df, by):
+    """Nombre d'appels, p50/p95/p99 de la durée et tokens moyens, groupés par les colonnes `by`."""
+    import pandas as pd
+    if df.empty:
+        return pd.DataFrame(columns=by + ["appels", "p50_ms", "p95_ms", "p99_ms", "tokens_prompt_moy", "tokens_reponse_moy", "erreurs"])
+    df = df.assign(modele=df["modele"].fillna("—"), a_echoue=df["erreur"].notna())
+    grouped = df.groupby(by)
+    summary = grouped["duree_ms"].quantile([0.5, 0.95, 0.99]).unstack()
+    summary.columns = ["p50_ms", "p95_ms", "p99_ms"]
+    summary.insert(0, "appels", grouped.size())
+    summary["tokens_prompt_moy"] = grouped["tokens_prompt"].mean()
+    summary["tokens_reponse_moy"] = grouped["tokens_reponse"].mean()
+    summary["erreurs"] = grouped["a_echoue"].sum()
+    return summary.reset_index().sort_values("p95_ms", ascending=False)
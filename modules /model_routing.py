@@ -0,0 +1,154 @@
+# modules/model_routing.py
+"""Choix du modèle pour chaque tâche (leçon, remédiation, appréciation).
+
+Une politique associe chaque tâche à un niveau ; un niveau fixe le modèle, la
+taille maximale de la réponse et les objectifs de latence et de coût. Le niveau
+"modele" n'appelle pas l'IA : l'appréciation est rédigée à partir de modèles de
+phrases (voir modules/appreciation.py), et "modele+ia" la fait reformuler par l'IA.
+
+La politique est un réglage du déploiement (ROUTING_POLICY dans les secrets ou
+l'environnement, "equilibre" par défaut) : aucune page ne peut la changer.
+
+Comparaison des politiques (test de charge complet pour chacune, modèles simulés) :
+    python -m modules.model_routing comparer --eleves 40 --concurrence 10 --latence 1.0 --debit-api 20
+"""
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+from modules import storage
+
+# Niveaux : modèle, tokens de réponse au maximum, latence visée (s), coût relatif par appel.
+TIERS = {
+    "rapide": {"model": "gemini-1.5-flash", "max_output_tokens": 4096, "latence_cible_s": 4, "cout_relatif": 1},
+    "qualite": {"model": "gemini-1.5-pro-latest", "max_output_tokens": 4096, "latence_cible_s": 12, "cout_relatif": 15},
+    "modele+ia": {"model": "gemini-1.5-flash", "max_output_tokens": 200, "latence_cible_s": 2, "cout_relatif": 1},
+    "modele": {"model": None, "max_output_tokens": 0, "latence_cible_s": 0, "cout_relatif": 0},
+}
+
+POLICIES = {
+    # Tout sur le modèle le plus rapide, appréciation instantanée.
+    "economique": {"lecon": "rapide", "remediation": "rapide", "appreciation": "modele"},
+    # La remédiation, qui doit réexpliquer autrement, garde le modèle le plus soigné.
+    "equilibre": {"lecon": "rapide", "remediation": "qualite", "appreciation": "modele+ia"},
+    # Comportement d'origine : modèle "pro" pour la remédiation et l'appréciation.
+    "qualite": {"lecon": "rapide", "remediation": "qualite", "appreciation": "qualite"},
+}
+DEFAULT_POLICY = "equilibre"
+
+# Politique imposée par set_policy (bancs d'essai) ; None : celle du réglage ROUTING_POLICY.
+_forced_policy = None
+
+# Budget du prompt de remédiation : nombre de concepts et longueur de chacun.
+MAX_REMEDIATION_CONCEPTS = 5
+MAX_CONCEPT_CHARS = 80
+
+
+def _check(name):
+    if name not in POLICIES:
+        raise ValueError(f"Politique inconnue : {name} (choix : {', '.join(POLICIES)})")
+    return name
+
+
+def active_policy():
+    """Politique active : celle imposée par set_policy, sinon ROUTING_POLICY, sinon "equilibre"."""
+    return _check(_forced_policy or storage.setting("ROUTING_POLICY") or DEFAULT_POLICY)
+
+
+def set_policy(name):
+    """Impose une politique à tout le processus (bancs d'essai) ; None revient au réglage."""
+    global _forced_policy
+    _forced_policy = None if name is None else _check(name)
+
+
+def tier_for(task):
+    """Nom du niveau utilisé pour `task` par la politique active."""
+    return POLICIES[active_policy()][task]
+
+
+def model_for(task):
+    """Nom du modèle pour `task` (None si la tâche n'appelle pas l'IA)."""
+    return TIERS[tier_for(task)]["model"]
+
+
+def generation_config_for(task):
+    """Paramètres de génération du niveau de `task` (taille maximale de la réponse)."""
+    return {"max_output_tokens": TIERS[tier_for(task)]["max_output_tokens"]}
+
+
+def budget_concepts(concepts):
+    """Limite la liste des concepts envoyés dans le prompt (dédoublonnés, tronqués, triés)."""
+    uniques = sorted({str(c).strip()[:MAX_CONCEPT_CHARS] for c in concepts if str(c).strip()})
+    return uniques[:MAX_REMEDIATION_CONCEPTS]
+
+
+# --- Comparaison des politiques ---
+
+def model_latencies(base_latency):
+    """Latence simulée de chaque modèle, proportionnelle à la latence visée de ses niveaux."""
+    reference = TIERS["rapide"]["latence_cible_s"]
+    latencies = {}
+    for tier in TIERS.values():
+        if tier["model"]:
+            latency = base_latency * tier["latence_cible_s"] / reference
+            latencies[tier["model"]] = round(max(latencies.get(tier["model"], 0.0), latency), 3)
+    return latencies
+
+
+def relative_cost_per_lesson(policy, fail_ratio):
+    """Coût relatif d'une leçon : la leçon, la remédiation des élèves qui la suivent, l'appréciation."""
+    tiers = POLICIES[policy]
+    return (TIERS[tiers["lecon"]]["cout_relatif"] + fail_ratio * TIERS[tiers["remediation"]]["cout_relatif"]
+            + TIERS[tiers["appreciation"]]["cout_relatif"])
+
+
+def compare_policies(students, concurrency, base_latency, fail_ratio, api_rate=None):
+    """Test de charge pour chaque politique : durée de bout en bout d'une leçon et coût relatif."""
+    from modules import load_test
+    latencies = model_latencies(base_latency)
+    report = {"parametres": {"eleves": students, "concurrence": concurrency, "latences_modeles_s": latencies,
+                             "part_remediation": fail_ratio, "debit_api_par_s": api_rate}}
+    try:
+        for policy in POLICIES:
+            set_policy(policy)
+            result = load_test.run_load_test(students, concurrency, base_latency, fail_ratio, dashboard_reloads=0,
+                                             api_rate=api_rate, model_latencies=latencies)
+            report[policy] = {
+                "niveaux": POLICIES[policy],
+                "lecons_terminees": result["lecons_terminees"],
+                "echecs": result["echecs"],
+                "parcours": result["parcours"],
+                "lecons_par_minute": result["debit"]["lecons_par_minute"],
+                "etapes_p95_ms": {label: timing["p95_ms"] for label, timing in result["reruns"].items()},
+                "cout_relatif_par_lecon": round(relative_cost_per_lesson(policy, fail_ratio), 2),
+            }
+    finally:
+        set_policy(None)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.model_routing", description="Politiques de routage des modèles.")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    compare = commands.add_parser("comparer", help="Durée d'une leçon et coût relatif pour chaque politique.")
+    compare.add_argument("--eleves", type=int, default=40)
+    compare.add_argument("--concurrence", type=int, default=10)
+    compare.add_argument("--latence", type=float, default=1.0, help="Latence simulée du modèle rapide (s).")
+    compare.add_argument("--part-remediation", type=float, default=0.7)
+    compare.add_argument("--debit-api", type=float, default=None,
+                         help="Appels à Gemini autorisés par seconde (quota du compte par défaut).")
+    args = parser.parse_args(argv)
+
+    # Comme le test de charge : son établissement, et des mesures dans un fichier à part.
+    from modules import load_test
+    os.environ["TENANT_ID"] = load_test.LOAD_TEST_TENANT
+    from modules import metrics
+    metrics.METRICS_FILE = Path(tempfile.mkdtemp(prefix="routage-")) / "metrics.jsonl"
+    report = compare_policies(args.eleves, args.concurrence, args.latence, args.part_remediation, args.debit_api)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if not any(report[policy]["echecs"] for policy in POLICIES) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
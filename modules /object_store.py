@@ -0,0 +1,201 @@
+# modules/object_store.py
+"""Magasin partagé des contenus d'une leçon (texte, quiz, remédiation).
+
+st.session_state ne garde que l'identifiant de chaque contenu et, pour chaque quiz,
+l'ordre dans lequel cette session affiche les options. Les contenus vivent ici, une
+seule fois pour tout le processus : deux sessions qui reçoivent la même leçon du
+cache partagent le même objet.
+
+La mémoire occupée est bornée (MAX_MEMORY_BYTES) : les contenus les moins récemment
+lus sont déversés dans data/objets/ et rechargés à la demande. Les fichiers déversés
+plus vieux que SPILL_TTL_HOURS (sessions abandonnées) sont supprimés.
+"""
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import streamlit as st
+
+# Taille maximale des contenus gardés en mémoire, toutes sessions confondues.
+MAX_MEMORY_BYTES = 64 * 2**20
+SPILL_FOLDER = Path(__file__).parent.parent / "data" / "objets"
+# Au-delà, une session qui n'a pas relu son contenu est considérée comme abandonnée.
+SPILL_TTL_HOURS = 24
+# Nettoyage du dossier tous les N déversements (et au démarrage).
+PURGE_EVERY_SPILLS = 500
+
+
+class Question:
+    """Question de quiz compacte et immuable ; l'ordre des options est propre à chaque session."""
+
+    __slots__ = ("question", "options", "correct_answer", "concept")
+
+    def __init__(self, question, options, correct_answer, concept=None):
+        self.question = question
+        self.options = options
+        self.correct_answer = correct_answer
+        self.concept = concept
+
+    @classmethod
+    def from_dict(cls, q):
+        # Les réponses sont comparées sous forme de texte, comme dans le formulaire.
+        options = q.get('options')
+        options = tuple(str(opt) for opt in options) if isinstance(options, list) else ()
+        return cls(str(q['question']), options, str(q['correct_answer']), q.get('concept'))
+
+    def ordered_options(self, order):
+        """Options dans l'ordre `order` (permutation des indices) tiré pour la session."""
+        return [self.options[i] for i in order]
+
+
+def compact_quiz(quiz_data):
+    """Quiz de la réponse de l'IA (liste de dict) converti en tuple de Question."""
+    return tuple(Question.from_dict(q) for q in quiz_data or ())
+
+
+def shuffled_order(quiz):
+    """Permutation aléatoire des options de chaque question, gardée dans la session."""
+    return tuple(tuple(random.sample(range(len(q.options)), len(q.options))) for q in quiz)
+
+
+class ObjectStore:
+    """Cache LRU borné en octets, adressé par contenu, avec déversement sur disque."""
+
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES, folder=SPILL_FOLDER):
+        self.max_bytes = max_bytes
+        self.folder = Path(folder)
+        self._entries = OrderedDict()   # identifiant -> (objet, taille en octets)
+        self._spilling = {}             # identifiant -> objet retiré de la mémoire, fichier en cours d'écriture
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"ajouts": 0, "partages": 0, "lectures": 0, "lectures_disque": 0, "deversements": 0, "perdus": 0}
+
+    def put(self, obj):
+        """Range `obj` (sérialisable par pickle) et retourne son identifiant."""
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        object_id = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if object_id in self._entries:
+                # Même contenu déjà servi à une autre session : un seul exemplaire.
+                self._entries.move_to_end(object_id)
+                self._stats["partages"] += 1
+                return object_id
+            self._stats["ajouts"] += 1
+            victims, purge_due = self._insert(object_id, obj, len(data))
+        self._spill(victims, purge_due)
+        return object_id
+
+    def get(self, object_id):
+        """Contenu de l'identifiant, rechargé depuis le disque si besoin ; None s'il a disparu."""
+        if object_id is None:
+            return None
+        with self._lock:
+            self._stats["lectures"] += 1
+            entry = self._entries.get(object_id)
+            if entry is not None:
+                self._entries.move_to_end(object_id)
+                return entry[0]
+            if object_id in self._spilling:
+                return self._spilling[object_id]
+        path = self._path(object_id)
+        try:
+            data = path.read_bytes()
+            # Le fichier reste en place ; sa date repousse son expiration.
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats["perdus"] += 1
+            return None
+        obj = pickle.loads(data)
+        victims, purge_due = [], False
+        with self._lock:
+            self._stats["lectures_disque"] += 1
+            if object_id not in self._entries:
+                victims, purge_due = self._insert(object_id, obj, len(data))
+        self._spill(victims, purge_due)
+        return obj
+
+    def _insert(self, object_id, obj, size):
+        """Ajoute l'entrée et retire les plus anciennes au-delà de max_bytes (verrou tenu).
+
+        Retourne les entrées à déverser et s'il faut nettoyer le dossier : les fichiers sont
+        écrits par _spill, une fois le verrou rendu.
+        """
+        self._entries[object_id] = (obj, size)
+        self._bytes += size
+        victims = []
+        purge_due = False
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_id, (old_obj, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            # Toujours lisible (get) jusqu'à ce que son fichier soit en place.
+            self._spilling[old_id] = old_obj
+            victims.append((old_id, old_obj))
+            self._stats["deversements"] += 1
+            purge_due = purge_due or self._stats["deversements"] % PURGE_EVERY_SPILLS == 0
+        return victims, purge_due
+
+    def _spill(self, victims, purge_due=False):
+        """Écrit les entrées retirées de la mémoire sur le disque (sans le verrou)."""
+        for object_id, obj in victims:
+            path = self._path(object_id)
+            try:
+                if not path.exists():
+                    self.folder.mkdir(parents=True, exist_ok=True)
+                    # Écriture atomique : une lecture simultanée ne voit jamais un fichier partiel.
+                    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+                    tmp.write_bytes(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+                    os.replace(tmp, path)
+            finally:
+                with self._lock:
+                    if self._spilling.get(object_id) is obj:
+                        del self._spilling[object_id]
+        if purge_due:
+            self.purge()
+
+    def _path(self, object_id):
+        return self.folder / f"{object_id}.pkl"
+
+    def purge(self, max_age_hours=SPILL_TTL_HOURS):
+        """Supprime les contenus déversés qui n'ont pas été relus depuis `max_age_hours`."""
+        if not self.folder.exists():
+            return 0
+        limit = time.time() - max_age_hours * 3600
+        removed = 0
+        for path in self.folder.glob("*.pkl"):
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self):
+        """Compteurs, nombre de contenus et mémoire occupée."""
+        with self._lock:
+            return dict(self._stats, entrees=len(self._entries), octets=self._bytes)
+
+
+@st.cache_resource
+def get_store():
+    """Instance unique du magasin pour tout le processus."""
+    store = ObjectStore()
+    store.purge()
+    return store
+
+
+def put(obj):
+    return get_store().put(obj)
+
+
+def get(object_id):
+    return get_store().get(object_id)
+
+
+def store_stats():
+    return get_store().stats()
@@ -0,0 +1,527 @@
+# modules/postgres_backend.py
+"""Stockage PostgreSQL partagé par plusieurs établissements.
+
+Chaque table porte un tenant_id et toutes les clés (prénom, lesson_uuid, compteurs,
+résumés) sont uniques par établissement : deux écoles peuvent avoir chacune un
+élève « Rayan ». Chaque requête filtre sur le tenant_id du moteur.
+
+Dépendances (seulement si DATABASE_URL désigne PostgreSQL) :
+    pip install "psycopg[binary]" psycopg_pool
+"""
+import json
+from contextlib import contextmanager
+from modules.storage import (StorageBackend, StorageError, StudentIdCache, attempt_key, concept_outcomes,
+                             like_pattern)
+
+# Connexions gardées ouvertes et maximum par processus, attente maximale d'une connexion libre.
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8
+POOL_TIMEOUT_SECONDS = 10.0
+
+# Verrou consultatif pris pendant les migrations (plusieurs réplicas peuvent démarrer ensemble).
+_MIGRATION_LOCK_ID = 7_361_042
+
+
+def _psycopg():
+    try:
+        import psycopg
+        import psycopg_pool
+    except ImportError as e:
+        raise StorageError("PostgreSQL nécessite psycopg et psycopg_pool : pip install \"psycopg[binary]\" psycopg_pool") from e
+    return psycopg, psycopg_pool
+
+
+# --- Migrations du schéma ---
+# Même principe que pour SQLite : on n'ajoute que de nouvelles migrations à la fin
+# de la liste ; la version courante est dans la table schema_version.
+
+def _migration_schema_initial(conn):
+    """v1 : élèves, leçons, résumés par matière et compteurs, par établissement."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS eleves (
+            id BIGSERIAL PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            prenom TEXT NOT NULL,
+            classe TEXT,
+            UNIQUE (tenant_id, prenom)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lecons (
+            id BIGSERIAL PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            eleve_id BIGINT NOT NULL REFERENCES eleves (id) ON DELETE CASCADE,
+            lesson_uuid TEXT,
+            date TEXT NOT NULL,
+            date_ts BIGINT NOT NULL,
+            classe TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            sujet TEXT NOT NULL,
+            score_quiz_1 INTEGER,
+            score_quiz_2 INTEGER,
+            appreciation_ia TEXT,
+            points_a_revoir TEXT,
+            UNIQUE (tenant_id, lesson_uuid)
+        )
+    """)
+    # Historique d'un élève dans l'ordre chronologique, sans tri supplémentaire.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lecons_eleve_date ON lecons (tenant_id, eleve_id, date_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lecons_eleve_matiere ON lecons (tenant_id, eleve_id, matiere)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS student_stats (
+            tenant_id TEXT NOT NULL,
+            eleve_id BIGINT NOT NULL REFERENCES eleves (id) ON DELETE CASCADE,
+            matiere TEXT NOT NULL,
+            nombre_lecons INTEGER NOT NULL,
+            somme_scores INTEGER NOT NULL,
+            meilleur_score INTEGER,
+            dernier_score INTEGER,
+            dernier_date_ts BIGINT,
+            PRIMARY KEY (tenant_id, eleve_id, matiere)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compteurs (
+            tenant_id TEXT NOT NULL,
+            cle TEXT NOT NULL,
+            valeur BIGINT NOT NULL,
+            PRIMARY KEY (tenant_id, cle)
+        )
+    """)
+
+def _migration_concepts(conn):
+    """v2 : concepts par matière et maîtrise de chaque concept par élève, repris de points_a_revoir."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS concepts (
+            id BIGSERIAL PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            libelle TEXT NOT NULL,
+            UNIQUE (tenant_id, matiere, libelle)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS eleve_concept_mastery (
+            tenant_id TEXT NOT NULL,
+            eleve_id BIGINT NOT NULL REFERENCES eleves (id) ON DELETE CASCADE,
+            concept_id BIGINT NOT NULL REFERENCES concepts (id) ON DELETE CASCADE,
+            nb_reussites INTEGER NOT NULL,
+            nb_echecs INTEGER NOT NULL,
+            a_revoir BOOLEAN NOT NULL,
+            dernier_ts BIGINT NOT NULL,
+            dernier_echec_ts BIGINT,
+            PRIMARY KEY (tenant_id, eleve_id, concept_id)
+        )
+    """)
+    # « Prochains défis » : concepts encore à revoir d'un élève, du plus récent au plus ancien.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mastery_a_revoir
+        ON eleve_concept_mastery (tenant_id, eleve_id, dernier_echec_ts) WHERE a_revoir
+    """)
+    # Reprise des anciennes chaînes « concept 1, concept 2 » : chaque concept compte comme raté.
+    points = """
+        SELECT l.tenant_id, l.eleve_id, l.matiere, btrim(p.libelle) AS libelle, l.date_ts
+        FROM lecons l, regexp_split_to_table(l.points_a_revoir, ',') AS p (libelle)
+        WHERE l.points_a_revoir IS NOT NULL AND btrim(p.libelle) != ''
+    """
+    conn.execute(f"""
+        INSERT INTO concepts (tenant_id, matiere, libelle)
+        SELECT DISTINCT tenant_id, matiere, libelle FROM ({points}) AS points
+        ON CONFLICT (tenant_id, matiere, libelle) DO NOTHING
+    """)
+    conn.execute(f"""
+        INSERT INTO eleve_concept_mastery (tenant_id, eleve_id, concept_id, nb_reussites, nb_echecs, a_revoir, dernier_ts, dernier_echec_ts)
+        SELECT p.tenant_id, p.eleve_id, c.id, 0, COUNT(*), TRUE, MAX(p.date_ts), MAX(p.date_ts)
+        FROM ({points}) AS p
+        JOIN concepts c ON c.tenant_id = p.tenant_id AND c.matiere = p.matiere AND c.libelle = p.libelle
+        GROUP BY p.tenant_id, p.eleve_id, c.id
+        ON CONFLICT (tenant_id, eleve_id, concept_id) DO NOTHING
+    """)
+
+def _migration_reponses(conn):
+    """v3 : journal des réponses à chaque question (ajout seul) et questions posées."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            tenant_id TEXT NOT NULL,
+            cle BIGINT NOT NULL,
+            texte TEXT NOT NULL,
+            options JSONB NOT NULL,
+            bonne_option SMALLINT,
+            PRIMARY KEY (tenant_id, cle)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reponses (
+            id BIGSERIAL PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            eleve_id BIGINT NOT NULL REFERENCES eleves (id) ON DELETE CASCADE,
+            lesson_uuid TEXT NOT NULL,
+            quiz SMALLINT NOT NULL,
+            numero SMALLINT NOT NULL,
+            tentative BIGINT NOT NULL,
+            classe TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            question_cle BIGINT NOT NULL,
+            concept TEXT,
+            option_choisie SMALLINT NOT NULL,
+            correcte BOOLEAN NOT NULL,
+            duree_quiz_ms INTEGER,
+            repondu_ts BIGINT NOT NULL,
+            UNIQUE (tenant_id, lesson_uuid, quiz, numero)
+        )
+    """)
+    # Analyse des questions : lecture de toutes les réponses d'une classe et d'une matière.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reponses_classe_matiere ON reponses (tenant_id, classe, matiere)")
+
+def _migration_index_classes(conn):
+    """v4 : index de la page Classe (élèves d'une classe par prénom, scores d'une classe)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_eleves_classe_prenom ON eleves (tenant_id, classe, prenom)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lecons_classe_matiere_score ON lecons (tenant_id, classe, matiere, score_quiz_1)"
+    )
+
+MIGRATIONS = [
+    _migration_schema_initial,
+    _migration_concepts,
+    _migration_reponses,
+    _migration_index_classes,
+]
+
+def _migrate(conn):
+    """Applique les migrations manquantes dans une seule transaction."""
+    conn.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK_ID,))
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM schema_version").fetchone()
+    version = row[0] if row else 0
+    for numero in range(version + 1, len(MIGRATIONS) + 1):
+        MIGRATIONS[numero - 1](conn)
+    if row is None:
+        conn.execute("INSERT INTO schema_version (version) VALUES (%s)", (len(MIGRATIONS),))
+    elif version < len(MIGRATIONS):
+        conn.execute("UPDATE schema_version SET version = %s", (len(MIGRATIONS),))
+
+
+def _increment_counter(conn, tenant, cle, pas=1):
+    conn.execute("""
+        INSERT INTO compteurs (tenant_id, cle, valeur) VALUES (%s, %s, %s)
+        ON CONFLICT (tenant_id, cle) DO UPDATE SET valeur = compteurs.valeur + excluded.valeur
+    """, (tenant, cle, pas))
+
+
+def _update_concept_mastery(conn, tenant, eleve_id, matiere, date_ts, outcomes):
+    """Ajoute en lot les résultats (concept, réussi, à revoir) d'une leçon."""
+    with conn.cursor() as cursor:
+        cursor.executemany("""
+            INSERT INTO concepts (tenant_id, matiere, libelle) VALUES (%s, %s, %s)
+            ON CONFLICT (tenant_id, matiere, libelle) DO NOTHING
+        """, [(tenant, matiere, concept) for concept, _, _ in outcomes])
+        cursor.executemany("""
+            INSERT INTO eleve_concept_mastery (tenant_id, eleve_id, concept_id, nb_reussites, nb_echecs,
+                                               a_revoir, dernier_ts, dernier_echec_ts)
+            SELECT %s, %s, id, %s, %s, %s, %s, %s FROM concepts
+            WHERE tenant_id = %s AND matiere = %s AND libelle = %s
+            ON CONFLICT (tenant_id, eleve_id, concept_id) DO UPDATE SET
+                nb_reussites = eleve_concept_mastery.nb_reussites + excluded.nb_reussites,
+                nb_echecs = eleve_concept_mastery.nb_echecs + excluded.nb_echecs,
+                a_revoir = CASE WHEN excluded.dernier_ts >= eleve_concept_mastery.dernier_ts
+                                THEN excluded.a_revoir ELSE eleve_concept_mastery.a_revoir END,
+                dernier_ts = GREATEST(eleve_concept_mastery.dernier_ts, excluded.dernier_ts),
+                dernier_echec_ts = GREATEST(eleve_concept_mastery.dernier_echec_ts, excluded.dernier_echec_ts)
+        """, [
+            (tenant, eleve_id, int(reussi), int(not reussi), a_revoir, date_ts, None if reussi else date_ts,
+             tenant, matiere, concept)
+            for concept, reussi, a_revoir in outcomes
+        ])
+
+
+# --- Écritures d'une leçon terminée ---
+# Exécutées dans la transaction de l'appelant : une leçon seule (save_lesson_result)
+# ou tout un lot de la file d'écriture (save_batch).
+
+def _save_lesson(conn, tenant, eleve_id, data, generation_key):
+    """Insère la leçon ; le résumé par matière, la maîtrise des concepts et la génération suivent."""
+    inserted = conn.execute("""
+        INSERT INTO lecons (tenant_id, eleve_id, lesson_uuid, date, date_ts, classe, matiere, sujet,
+                            score_quiz_1, score_quiz_2, appreciation_ia, points_a_revoir)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (tenant_id, lesson_uuid) DO NOTHING
+    """, (
+        tenant, eleve_id, data.get('lesson_uuid'), data['date'], data['date_ts'], data['classe'],
+        data['matiere'], data['sujet'], data['score_quiz_1'], data.get('score_quiz_2'),
+        data['appreciation_ia'], data['points_a_revoir'],
+    )).rowcount
+    if inserted:
+        score = data['score_quiz_1']
+        conn.execute("""
+            INSERT INTO student_stats (tenant_id, eleve_id, matiere, nombre_lecons, somme_scores,
+                                       meilleur_score, dernier_score, dernier_date_ts)
+            VALUES (%s, %s, %s, 1, %s, %s, %s, %s)
+            ON CONFLICT (tenant_id, eleve_id, matiere) DO UPDATE SET
+                nombre_lecons = student_stats.nombre_lecons + 1,
+                somme_scores = student_stats.somme_scores + excluded.somme_scores,
+                meilleur_score = GREATEST(student_stats.meilleur_score, excluded.meilleur_score),
+                dernier_score = CASE WHEN excluded.dernier_date_ts >= COALESCE(student_stats.dernier_date_ts, 0)
+                                     THEN excluded.dernier_score ELSE student_stats.dernier_score END,
+                dernier_date_ts = GREATEST(student_stats.dernier_date_ts, excluded.dernier_date_ts)
+        """, (tenant, eleve_id, data['matiere'], score, score, score, data['date_ts']))
+        outcomes = concept_outcomes(data)
+        if outcomes:
+            _update_concept_mastery(conn, tenant, eleve_id, data['matiere'], data['date_ts'], outcomes)
+        _increment_counter(conn, tenant, generation_key)
+    return bool(inserted)
+
+
+def _save_answers(conn, tenant, eleve_ids, answers):
+    """Ajoute les réponses des élèves connus (`eleve_ids`) ; retourne le nombre inséré."""
+    answers = [answer for answer in answers if answer['eleve'] in eleve_ids]
+    with conn.cursor() as cursor:
+        cursor.executemany("""
+            INSERT INTO questions (tenant_id, cle, texte, options, bonne_option) VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (tenant_id, cle) DO NOTHING
+        """, list({
+            (tenant, a['question_cle'], a['question'], json.dumps(list(a['options']), ensure_ascii=False), a['bonne_option'])
+            for a in answers
+        }))
+        cursor.executemany("""
+            INSERT INTO reponses (tenant_id, eleve_id, lesson_uuid, quiz, numero, tentative, classe, matiere,
+                                  question_cle, concept, option_choisie, correcte, duree_quiz_ms, repondu_ts)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (tenant_id, lesson_uuid, quiz, numero) DO NOTHING
+        """, [
+            (tenant, eleve_ids[a['eleve']], a['lesson_uuid'], a['quiz'], a['numero'],
+             attempt_key(a['lesson_uuid'], a['quiz']), a['classe'], a['matiere'], a['question_cle'],
+             a.get('concept'), a['option_choisie'], bool(a['correcte']), a.get('duree_quiz_ms'), a['repondu_ts'])
+            for a in answers
+        ])
+        # psycopg additionne les lignes insérées par chaque exécution du lot.
+        return cursor.rowcount
+
+
+def _dataframe(cursor):
+    import pandas as pd
+    return pd.DataFrame(cursor.fetchall(), columns=[column.name for column in cursor.description])
+
+
+# --- Moteur ---
+
+class PostgresBackend(StorageBackend):
+    """Implémentation de StorageBackend sur un pool psycopg, limitée à un établissement."""
+
+    name = "postgresql"
+
+    def __init__(self, url, tenant, min_connections=POOL_MIN_CONNECTIONS, max_connections=POOL_MAX_CONNECTIONS):
+        self.tenant = tenant
+        self.student_ids = StudentIdCache()
+        self._psycopg, psycopg_pool = _psycopg()
+        try:
+            self.pool = psycopg_pool.ConnectionPool(
+                url, min_size=min_connections, max_size=max_connections,
+                timeout=POOL_TIMEOUT_SECONDS, open=True,
+            )
+            with self._connection() as conn:
+                _migrate(conn)
+        except self._psycopg.Error as e:
+            raise StorageError(str(e)) from e
+
+    @contextmanager
+    def _connection(self):
+        """Connexion du pool ; la transaction est validée à la sortie du bloc (annulée sur erreur)."""
+        try:
+            with self.pool.connection() as conn:
+                yield conn
+        except self._psycopg.Error as e:
+            raise StorageError(str(e)) from e
+
+    def add_student(self, prenom, classe, generation_key):
+        with self._connection() as conn:
+            inserted = conn.execute("""
+                INSERT INTO eleves (tenant_id, prenom, classe) VALUES (%s, %s, %s)
+                ON CONFLICT (tenant_id, prenom) DO NOTHING
+            """, (self.tenant, prenom, classe)).rowcount
+            if inserted:
+                _increment_counter(conn, self.tenant, generation_key)
+        return bool(inserted)
+
+    def get_student_list(self):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT prenom FROM eleves WHERE tenant_id = %s ORDER BY prenom", (self.tenant,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_student_class(self, prenom):
+        with self._connection() as conn:
+            result = conn.execute(
+                "SELECT classe FROM eleves WHERE tenant_id = %s AND prenom = %s", (self.tenant, prenom)
+            ).fetchone()
+        return result[0] if result else None
+
+    def get_student_id(self, prenom):
+        with self._connection() as conn:
+            result = conn.execute(
+                "SELECT id FROM eleves WHERE tenant_id = %s AND prenom = %s", (self.tenant, prenom)
+            ).fetchone()
+        return result[0] if result else None
+
+    def get_student_topics(self, prenom, matiere):
+        with self._connection() as conn:
+            rows = conn.execute("""
+                SELECT DISTINCT l.sujet FROM lecons l JOIN eleves e ON e.id = l.eleve_id
+                WHERE l.tenant_id = %s AND e.tenant_id = %s AND e.prenom = %s AND l.matiere = %s
+            """, (self.tenant, self.tenant, prenom, matiere)).fetchall()
+        return [row[0] for row in rows]
+
+    def _student_ids(self, conn, prenoms):
+        def lookup(missing):
+            rows = conn.execute(
+                "SELECT prenom, id FROM eleves WHERE tenant_id = %s AND prenom = ANY(%s)", (self.tenant, missing)
+            ).fetchall()
+            return dict(rows)
+        return self.student_ids.get(list(set(prenoms)), lookup)
+
+    def save_lesson_result(self, data, generation_key):
+        with self._connection() as conn:
+            eleve_id = self._student_ids(conn, [data['eleve']]).get(data['eleve'])
+            if eleve_id is None:
+                return None
+            return _save_lesson(conn, self.tenant, eleve_id, data, generation_key)
+
+    def _query_student(self, query, prenom, *params):
+        with self._connection() as conn:
+            return _dataframe(conn.execute(query, (self.tenant, self.tenant, prenom) + params))
+
+    def get_student_data(self, prenom):
+        return self._query_student("""
+            SELECT l.date, l.matiere, l.sujet, l.score_quiz_1, l.points_a_revoir
+            FROM lecons l JOIN eleves e ON e.id = l.eleve_id
+            WHERE l.tenant_id = %s AND e.tenant_id = %s AND e.prenom = %s
+            ORDER BY l.date_ts ASC
+        """, prenom)
+
+    def get_student_stats(self, prenom):
+        return self._query_student("""
+            SELECT s.matiere, s.nombre_lecons, s.somme_scores,
+                   s.somme_scores::float / s.nombre_lecons AS score_moyen,
+                   s.meilleur_score, s.dernier_score
+            FROM student_stats s JOIN eleves e ON e.id = s.eleve_id
+            WHERE s.tenant_id = %s AND e.tenant_id = %s AND e.prenom = %s
+            ORDER BY s.matiere
+        """, prenom)
+
+    def get_top_successes(self, prenom, limit, seuil):
+        return self._query_student("""
+            SELECT l.date, l.matiere, l.sujet, l.score_quiz_1
+            FROM lecons l JOIN eleves e ON e.id = l.eleve_id
+            WHERE l.tenant_id = %s AND e.tenant_id = %s AND e.prenom = %s AND l.score_quiz_1 >= %s
+            ORDER BY l.date_ts DESC
+            LIMIT %s
+        """, prenom, seuil, limit)
+
+    def get_recent_challenges(self, prenom, limit):
+        # Parcourt l'index partiel idx_mastery_a_revoir : seuls les concepts à revoir sont lus.
+        return self._query_student("""
+            SELECT c.matiere, c.libelle AS concept, m.nb_echecs, m.dernier_echec_ts
+            FROM eleve_concept_mastery m
+            JOIN eleves e ON e.id = m.eleve_id
+            JOIN concepts c ON c.id = m.concept_id
+            WHERE m.tenant_id = %s AND e.tenant_id = %s AND e.prenom = %s AND m.a_revoir
+            ORDER BY m.dernier_echec_ts DESC
+            LIMIT %s
+        """, prenom, limit)
+
+    def get_concept_mastery(self, prenom):
+        return self._query_student("""
+            SELECT c.matiere, c.libelle AS concept, m.nb_reussites, m.nb_echecs, m.a_revoir::int AS a_revoir, m.dernier_ts
+            FROM eleve_concept_mastery m
+            JOIN eleves e ON e.id = m.eleve_id
+            JOIN concepts c ON c.id = m.concept_id
+            WHERE m.tenant_id = %s AND e.tenant_id = %s AND e.prenom = %s
+            ORDER BY c.matiere, c.libelle
+        """, prenom)
+
+    def get_class_list(self):
+        with self._connection() as conn:
+            return _dataframe(conn.execute("""
+                SELECT classe, COUNT(*) AS nombre_eleves FROM eleves
+                WHERE tenant_id = %s AND classe IS NOT NULL GROUP BY classe
+            """, (self.tenant,)))
+
+    def get_class_students(self, classe, after, search, limit):
+        filters, params = ["tenant_id = %s", "classe = %s"], [self.tenant, classe]
+        if after is not None:
+            filters.append("prenom > %s")
+            params.append(after)
+        if search:
+            filters.append("prenom ILIKE %s")
+            params.append(like_pattern(search))
+        with self._connection() as conn:
+            return _dataframe(conn.execute(f"""
+                SELECT e.prenom, s.matiere, s.nombre_lecons, s.somme_scores, s.dernier_date_ts
+                FROM (SELECT id, prenom FROM eleves WHERE {' AND '.join(filters)} ORDER BY prenom LIMIT %s) e
+                LEFT JOIN student_stats s ON s.tenant_id = %s AND s.eleve_id = e.id
+                ORDER BY e.prenom, s.matiere
+            """, (*params, limit, self.tenant)))
+
+    def get_class_score_distribution(self, classe):
+        # Pas d'archivage hors SQLite (modules/archive.py) : `lecons` contient tout l'historique.
+        with self._connection() as conn:
+            return _dataframe(conn.execute("""
+                SELECT matiere, score_quiz_1 AS score, COUNT(*) AS nombre
+                FROM lecons
+                WHERE tenant_id = %s AND classe = %s AND score_quiz_1 IS NOT NULL
+                GROUP BY matiere, score_quiz_1
+            """, (self.tenant, classe)))
+
+    def save_answers(self, answers):
+        if not answers:
+            return 0
+        with self._connection() as conn:
+            eleve_ids = self._student_ids(conn, [answer['eleve'] for answer in answers])
+            return _save_answers(conn, self.tenant, eleve_ids, answers)
+
+    def save_batch(self, lessons, answer_lists):
+        prenoms = [data['eleve'] for data, _ in lessons] + [a['eleve'] for answers in answer_lists for a in answers]
+        with self._connection() as conn:
+            eleve_ids = self._student_ids(conn, prenoms)
+            results = [
+                _save_lesson(conn, self.tenant, eleve_ids[data['eleve']], data, generation_key)
+                if data['eleve'] in eleve_ids else None
+                for data, generation_key in lessons
+            ]
+            inserted = [_save_answers(conn, self.tenant, eleve_ids, answers) if answers else 0 for answers in answer_lists]
+        return results, inserted
+
+    def get_answers(self, classe=None, matiere=None):
+        filters = [(column, value) for column, value in (("classe", classe), ("matiere", matiere)) if value is not None]
+        where = "".join(f" AND {column} = %s" for column, _ in filters)
+        with self._connection() as conn:
+            return _dataframe(conn.execute(
+                f"""SELECT classe, matiere, tentative, question_cle, option_choisie, correcte::int AS correcte
+                    FROM reponses WHERE tenant_id = %s{where}""",
+                (self.tenant, *(value for _, value in filters)),
+            ))
+
+    def get_questions(self, cles):
+        with self._connection() as conn:
+            return _dataframe(conn.execute(
+                "SELECT cle, texte, options::text AS options, bonne_option FROM questions WHERE tenant_id = %s AND cle = ANY(%s)",
+                (self.tenant, list(cles)),
+            ))
+
+    def increment_counter(self, cle, pas=1):
+        with self._connection() as conn:
+            _increment_counter(conn, self.tenant, cle, pas)
+
+    def get_counter(self, cle):
+        with self._connection() as conn:
+            result = conn.execute(
+                "SELECT valeur FROM compteurs WHERE tenant_id = %s AND cle = %s", (self.tenant, cle)
+            ).fetchone()
+        return result[0] if result else 0
+
+    def delete_tenant_data(self):
+        self.student_ids.clear()
+        with self._connection() as conn:
+            for table in ("reponses", "questions", "eleve_concept_mastery", "concepts", "student_stats", "lecons", "eleves", "compteurs"):
+                conn.execute(f"DELETE FROM {table} WHERE tenant_id = %s", (self.tenant,))
+
+    def close(self):
+        self.pool.close()
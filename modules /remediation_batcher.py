@@ -0,0 +1,156 @@
+# modules/remediation_batcher.py
+"""Regroupement des demandes de remédiation de plusieurs élèves en un seul appel.
+
+En classe, beaucoup d'élèves ratent les mêmes concepts de la même leçon presque en
+même temps. Les demandes qui arrivent pendant BATCH_WINDOW_SECONDS pour une même
+classe sont regroupées :
+- les demandes portant sur le même ensemble de concepts partagent un seul élément ;
+- les ensembles différents sont envoyés ensemble dans un prompt à plusieurs éléments ;
+- chaque résultat est renvoyé à toutes les sessions qui l'attendent.
+
+Un élément absent ou invalide de la réponse groupée est redemandé seul.
+"""
+import threading
+import time
+from concurrent.futures import Future
+import streamlit as st
+from modules import gemini_handler, metrics, model_routing
+
+# Fenêtre de regroupement, et nombre maximal d'ensembles de concepts par appel.
+BATCH_WINDOW_SECONDS = 0.5
+MAX_ITEMS_PER_BATCH = 4
+# Attente maximale d'une session (fenêtre + génération).
+REQUEST_TIMEOUT_SECONDS = 120.0
+
+
+def concept_key(failed_concepts):
+    """Clé d'un ensemble de concepts, identique quel que soit l'ordre (mêmes concepts que le prompt)."""
+    return tuple(model_routing.budget_concepts(failed_concepts))
+
+
+class RemediationBatcher:
+    """File d'attente par classe, vidée à la fin de chaque fenêtre de regroupement."""
+
+    def __init__(self, window=BATCH_WINDOW_SECONDS, max_items=MAX_ITEMS_PER_BATCH):
+        self.window = window
+        self.max_items = max_items
+        self._pending = {}      # classe -> {clé des concepts: _Item}
+        self._lock = threading.Lock()
+        self.counters = {"demandes": 0, "appels": 0, "elements": 0, "attente_totale_ms": 0.0}
+
+    def submit(self, classe, failed_concepts):
+        """Ajoute une demande ; retourne un objet dont result() attend la remédiation."""
+        key = concept_key(failed_concepts)
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.counters["demandes"] += 1
+            batch = self._pending.get(classe)
+            if batch is None:
+                batch = self._pending[classe] = {}
+                timer = threading.Timer(self.window, self._flush, args=(classe,))
+                timer.daemon = True
+                timer.start()
+            item = batch.get(key)
+            if item is None:
+                item = batch[key] = _Item(list(key))
+        return _Waiter(item, submitted_at, self)
+
+    def _flush(self, classe):
+        with self._lock:
+            batch = self._pending.pop(classe, {})
+        items = list(batch.values())
+        for start in range(0, len(items), self.max_items):
+            self._run(classe, items[start:start + self.max_items])
+
+    def _run(self, classe, items):
+        started = time.perf_counter()
+        for item in items:
+            item.started_at = started
+        if len(items) == 1:
+            self._resolve(items[0], classe)
+            self._count(appels=1, elements=1)
+            return
+        try:
+            results = gemini_handler.request_batch_remediation(classe, [item.concepts for item in items])
+        except Exception as e:
+            for item in items:
+                item.future.set_exception(e)
+            self._count(appels=1, elements=len(items))
+            return
+        retries = 0
+        for item, result in zip(items, results):
+            if result is not None:
+                item.future.set_result(result)
+            else:
+                retries += 1
+                self._resolve(item, classe)
+        self._count(appels=1 + retries, elements=len(items))
+
+    @staticmethod
+    def _resolve(item, classe):
+        """Demande la remédiation d'un seul élément (prompt individuel)."""
+        try:
+            item.future.set_result(gemini_handler.request_remediation_and_quiz(classe, item.concepts))
+        except Exception as e:
+            item.future.set_exception(e)
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def stats(self):
+        """Demandes reçues, appels à l'API, appels évités et attente moyenne ajoutée par la file."""
+        with self._lock:
+            counters = dict(self.counters)
+        demandes = counters["demandes"]
+        return {
+            "demandes": demandes,
+            "appels": counters["appels"],
+            "appels_evites": max(0, demandes - counters["appels"]),
+            "reduction": 1 - counters["appels"] / demandes if demandes else 0.0,
+            "attente_moyenne_ms": counters["attente_totale_ms"] / demandes if demandes else 0.0,
+        }
+
+
+class _Item:
+    """Un ensemble de concepts d'un lot, et le résultat attendu par les sessions concernées."""
+
+    def __init__(self, concepts):
+        self.concepts = concepts
+        self.future = Future()
+        self.started_at = None
+
+
+class _Waiter:
+    """Attente d'une session : mesure le temps passé dans la file avant l'appel groupé."""
+
+    def __init__(self, item, submitted_at, batcher):
+        self.item = item
+        self.submitted_at = submitted_at
+        self.batcher = batcher
+
+    def result(self, timeout=REQUEST_TIMEOUT_SECONDS):
+        # Résultat partagé tel quel : la page ne le modifie pas (ordre des options gardé par session).
+        try:
+            return self.item.future.result(timeout=timeout)
+        finally:
+            if self.item.started_at is not None:
+                queued = max(0.0, self.item.started_at - self.submitted_at)
+                self.batcher._count(attente_totale_ms=queued * 1000)
+                metrics.record(metrics.LLM, "remediation_attente", queued)
+
+
+@st.cache_resource
+def get_batcher():
+    """File unique pour tout le processus (partagée par toutes les sessions)."""
+    return RemediationBatcher()
+
+
+def request(classe, failed_concepts):
+    """Comme gemini_handler.request_remediation_and_quiz, mais regroupée avec les demandes simultanées."""
+    return get_batcher().submit(classe, failed_concepts).result()
+
+
+def batch_stats():
+    return get_batcher().stats()
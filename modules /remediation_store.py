@@ -0,0 +1,336 @@
+# modules/remediation_store.py
+"""Cache persistant des remédiations, par classe et par ensemble de concepts ratés.
+
+La remédiation ne dépend que de la classe et des concepts ratés : beaucoup d'élèves
+demandent la même. Chaque remédiation générée est gardée dans la base locale
+(table remediation_cache) sous une clé canonique :
+- concepts normalisés (minuscules, sans accents, espaces simplifiés), dédoublonnés
+  et triés : « Les Fractions » et « les fractions » donnent la même entrée ;
+- une demande {A, B} sans entrée exacte est servie en composant des entrées dont
+  les concepts font tous partie de la demande ({A} et {B}, ou {A, B} et {B}...),
+  choisies par recouvrement glouton, en MAX_COMPOSED_ENTRIES entrées au plus ;
+- au-delà de MAX_ENTRIES entrées, la moins récemment servie est supprimée (LRU) ;
+- une entrée plus vieille que REFRESH_AFTER_DAYS est servie, puis régénérée en
+  arrière-plan (task_runner) pour les élèves suivants.
+
+Sans entrée pour tous les concepts, la remédiation est générée (regroupée avec les
+demandes simultanées par remediation_batcher) puis ajoutée au cache.
+
+Utilisation :
+    python -m modules.remediation_store etat
+    python -m modules.remediation_store banc --demandes 400 --latence 0.2
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+import unicodedata
+import uuid
+import streamlit as st
+from modules import database, gemini_handler, metrics, model_routing, remediation_batcher, task_runner
+
+# Entrées gardées au maximum (éviction LRU), et âge à partir duquel une entrée servie est régénérée.
+MAX_ENTRIES = 2000
+REFRESH_AFTER_DAYS = 14
+# Entrées au maximum dans une remédiation composée, et questions du quiz composé.
+MAX_COMPOSED_ENTRIES = 3
+QUIZ_SIZE = 5
+
+HITS_COUNTER = "remediation_cache:hits"
+COMPOSED_COUNTER = "remediation_cache:composees"
+MISSES_COUNTER = "remediation_cache:misses"
+SAVED_MS_COUNTER = "remediation_cache:economie_ms"
+EVICTIONS_COUNTER = "remediation_cache:evictions"
+
+# Entrées en cours de régénération en arrière-plan (évite deux régénérations simultanées).
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+# --- Clé canonique ---
+
+def fold_concept(concept):
+    """Forme normalisée d'un concept : minuscules, sans accents, espaces simplifiés."""
+    text = unicodedata.normalize("NFKD", str(concept).casefold())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def canonical_concepts(failed_concepts):
+    """Concepts normalisés, dédoublonnés et triés, parmi ceux qu'envoie le prompt (budget_concepts)."""
+    return sorted({fold_concept(c) for c in model_routing.budget_concepts(failed_concepts)} - {""})
+
+
+def remediation_key(classe, concepts):
+    """Empreinte d'une entrée : le prompt construit avec les concepts normalisés (modifier le prompt invalide le cache)."""
+    return hashlib.sha256(gemini_handler.build_remediation_prompt(classe, concepts).encode("utf-8")).hexdigest()
+
+
+# --- Composition ---
+
+def cover(concepts, entries, max_parts=MAX_COMPOSED_ENTRIES):
+    """Entrées qui couvrent tous les `concepts` (recouvrement glouton), ou None.
+
+    À chaque étape, l'entrée qui couvre le plus de concepts encore manquants ; à égalité,
+    celle qui en a le moins en tout. Une entrée exacte est donc toujours choisie seule.
+    """
+    remaining = set(concepts)
+    chosen = []
+    while remaining:
+        if len(chosen) == max_parts:
+            return None
+        best = max(entries, key=lambda e: (len(remaining.intersection(e["concepts"])), -len(e["concepts"])), default=None)
+        if best is None or not remaining.intersection(best["concepts"]):
+            return None
+        chosen.append(best)
+        remaining.difference_update(best["concepts"])
+    return chosen
+
+
+def merge_remediations(remediations, quiz_size=QUIZ_SIZE):
+    """Une remédiation à partir de plusieurs : explications à la suite, questions prises tour à tour."""
+    if len(remediations) == 1:
+        return remediations[0]
+    quizzes = [r["quiz_5_questions"] for r in remediations]
+    questions = [quiz[i] for i in range(max(map(len, quizzes))) for quiz in quizzes if i < len(quiz)]
+    return {
+        "remediation_markdown": "\n\n---\n\n".join(r["remediation_markdown"] for r in remediations),
+        "quiz_5_questions": questions[:quiz_size],
+    }
+
+
+# --- Cache ---
+
+@metrics.instrumented(metrics.DB)
+def find_entries(classe, concepts):
+    """Entrées de la classe dont tous les concepts font partie de `concepts` (normalisés)."""
+    query = """
+        SELECT c.cle, c.concepts, c.libelles, c.contenu, c.duree_generation_ms, c.cree_ts
+        FROM remediation_concepts rc
+        JOIN remediation_cache c ON c.cle = rc.cle
+        WHERE rc.classe = ? AND rc.concept IN (SELECT value FROM json_each(?))
+        GROUP BY c.cle
+        HAVING COUNT(*) = c.nb_concepts
+    """
+    try:
+        with database.get_connection() as conn:
+            rows = conn.execute(query, (classe, json.dumps(concepts, ensure_ascii=False))).fetchall()
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de la lecture du cache de remédiations : {e}")
+        return []
+    return [
+        {"cle": cle, "concepts": json.loads(concepts_json), "libelles": json.loads(libelles), "contenu": json.loads(contenu),
+         "duree_generation_ms": duree_ms, "cree_ts": cree_ts}
+        for cle, concepts_json, libelles, contenu, duree_ms, cree_ts in rows
+    ]
+
+
+@metrics.instrumented(metrics.DB)
+def store_remediation(classe, failed_concepts, remediation, duration_s):
+    """Ajoute (ou remplace) la remédiation de ces concepts, puis applique la limite de taille (LRU)."""
+    concepts = canonical_concepts(failed_concepts)
+    if not concepts:
+        return None
+    cle = remediation_key(classe, concepts)
+    now = int(time.time())
+    contenu = {field: remediation[field] for field in ("remediation_markdown", "quiz_5_questions")}
+    try:
+        with database.get_connection() as conn, conn:
+            conn.execute("""
+                INSERT INTO remediation_cache
+                    (cle, classe, concepts, nb_concepts, libelles, contenu, duree_generation_ms, cree_ts, dernier_usage_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cle) DO UPDATE SET
+                    libelles = excluded.libelles, contenu = excluded.contenu,
+                    duree_generation_ms = excluded.duree_generation_ms, cree_ts = excluded.cree_ts
+            """, (cle, classe, json.dumps(concepts, ensure_ascii=False), len(concepts),
+                  json.dumps(model_routing.budget_concepts(failed_concepts), ensure_ascii=False),
+                  json.dumps(contenu, ensure_ascii=False), int(duration_s * 1000), now, now))
+            conn.executemany(
+                "INSERT OR IGNORE INTO remediation_concepts (classe, concept, cle) VALUES (?, ?, ?)",
+                [(classe, concept, cle) for concept in concepts],
+            )
+            evicted = conn.execute("""
+                DELETE FROM remediation_cache WHERE cle IN (
+                    SELECT cle FROM remediation_cache ORDER BY dernier_usage_ts DESC LIMIT -1 OFFSET ?
+                )
+            """, (MAX_ENTRIES,)).rowcount
+            if evicted:
+                conn.execute("DELETE FROM remediation_concepts WHERE cle NOT IN (SELECT cle FROM remediation_cache)")
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de l'écriture du cache de remédiations : {e}")
+        return None
+    if evicted:
+        database.increment_counter(EVICTIONS_COUNTER, evicted)
+    return cle
+
+
+@metrics.instrumented(metrics.DB)
+def mark_used(cles):
+    """Note que ces entrées viennent d'être servies (elles passent en tête de la LRU)."""
+    try:
+        with database.get_connection() as conn, conn:
+            conn.execute("""
+                UPDATE remediation_cache SET nb_utilisations = nb_utilisations + 1, dernier_usage_ts = ?
+                WHERE cle IN (SELECT value FROM json_each(?))
+            """, (int(time.time()), json.dumps(cles)))
+    except sqlite3.Error as e:
+        st.error(f"Erreur de base de données lors de la mise à jour du cache de remédiations : {e}")
+
+
+def refresh_entry(classe, libelles, generate=gemini_handler.request_remediation_and_quiz):
+    """Régénère l'entrée de ces concepts ; pensé pour tourner en arrière-plan."""
+    cle = remediation_key(classe, canonical_concepts(libelles))
+    with _refreshing_lock:
+        if cle in _refreshing:
+            return False
+        _refreshing.add(cle)
+    try:
+        start = time.perf_counter()
+        remediation = generate(classe, libelles)
+        return store_remediation(classe, libelles, remediation, time.perf_counter() - start) is not None
+    except Exception:
+        # L'ancienne entrée reste servie ; elle sera de nouveau régénérée à sa prochaine utilisation.
+        return False
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(cle)
+
+
+def get_or_generate(classe, failed_concepts, generate):
+    """Sert la remédiation depuis le cache (entrée exacte ou composée), sinon la génère avec `generate` et la garde."""
+    concepts = canonical_concepts(failed_concepts)
+    if not concepts:
+        return generate(classe, failed_concepts)
+    start = time.perf_counter()
+    parts = cover(concepts, find_entries(classe, concepts))
+    if parts is not None:
+        mark_used([part["cle"] for part in parts])
+        # Latence économisée : la génération la plus longue des entrées servies, moins la recherche.
+        saved_ms = max(part["duree_generation_ms"] for part in parts) - (time.perf_counter() - start) * 1000
+        database.increment_counter(HITS_COUNTER)
+        database.increment_counter(SAVED_MS_COUNTER, max(0, int(saved_ms)))
+        if len(parts) > 1:
+            database.increment_counter(COMPOSED_COUNTER)
+        stale_ts = int(time.time()) - REFRESH_AFTER_DAYS * 86400
+        for part in parts:
+            if part["cree_ts"] < stale_ts:
+                task_runner.submit(refresh_entry, classe, part["libelles"])
+        return merge_remediations([part["contenu"] for part in parts])
+
+    database.increment_counter(MISSES_COUNTER)
+    start = time.perf_counter()
+    remediation = generate(classe, failed_concepts)
+    store_remediation(classe, failed_concepts, remediation, time.perf_counter() - start)
+    return remediation
+
+
+def request(classe, failed_concepts):
+    """Comme remediation_batcher.request, mais servie depuis le cache quand c'est possible."""
+    return get_or_generate(classe, failed_concepts, remediation_batcher.request)
+
+
+def cache_stats():
+    """Hits (dont composés), misses, taux de réussite, latence économisée et taille du cache."""
+    hits = database.get_counter(HITS_COUNTER) or 0
+    misses = database.get_counter(MISSES_COUNTER) or 0
+    saved_ms = database.get_counter(SAVED_MS_COUNTER) or 0
+    try:
+        with database.get_connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM remediation_cache").fetchone()[0]
+    except sqlite3.Error:
+        entries = None
+    total = hits + misses
+    return {
+        "hits": hits, "composees": database.get_counter(COMPOSED_COUNTER) or 0, "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+        "economie_s": saved_ms / 1000, "economie_moyenne_s": saved_ms / hits / 1000 if hits else None,
+        "entrees": entries, "evictions": database.get_counter(EVICTIONS_COUNTER) or 0,
+    }
+
+
+# --- Banc d'essai ---
+
+BENCH_CONCEPTS = (
+    "Les fractions", "Le périmètre", "L'aire du rectangle", "Les nombres décimaux", "La division posée",
+    "La proportionnalité", "Les angles", "La symétrie axiale", "Le passé composé", "L'imparfait",
+    "Les accords dans le groupe nominal", "Les homophones a/à", "Le complément d'objet", "Les adjectifs",
+    "La ponctuation du dialogue", "Les verbes du 1er groupe", "Le présent de l'indicatif", "Les pourcentages",
+)
+
+
+def _variant(rng, concept):
+    """Le même concept écrit autrement, comme le renvoie parfois le modèle (casse, accents, espaces)."""
+    return rng.choice([
+        concept, concept.lower(), concept.upper(), f" {concept} ",
+        "".join(c for c in unicodedata.normalize("NFKD", concept) if not unicodedata.combining(c)),
+    ])
+
+
+def run_bench(requests, latency, classes=3, seed=0):
+    """`requests` demandes d'élèves (1 à 3 concepts ratés, concepts fréquents plus souvent ratés)."""
+    from modules import gemini_client, lesson_bank
+    from modules.constants import ALL_CLASSES
+    gemini_client.set_model_factory(lambda name: lesson_bank.FakeModel(latency=latency))
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(BENCH_CONCEPTS))]
+    raw_seen = set()
+    raw_hits = 0
+    durations = {"hit": [], "miss": []}
+    for _ in range(requests):
+        classe = ALL_CLASSES[rng.randrange(classes)]
+        count = rng.choices([1, 2, 3], weights=[0.5, 0.35, 0.15])[0]
+        failed = [_variant(rng, c) for c in set(rng.choices(BENCH_CONCEPTS, weights=weights, k=count))]
+        # Référence : clé brute (concepts tels quels), sans normalisation ni composition.
+        raw_key = (classe, tuple(model_routing.budget_concepts(failed)))
+        raw_hits += raw_key in raw_seen
+        raw_seen.add(raw_key)
+        misses = database.get_counter(MISSES_COUNTER)
+        start = time.perf_counter()
+        get_or_generate(classe, failed, gemini_handler.request_remediation_and_quiz)
+        elapsed = time.perf_counter() - start
+        durations["miss" if database.get_counter(MISSES_COUNTER) > misses else "hit"].append(elapsed)
+    stats = cache_stats()
+    return {
+        "demandes": requests, "latence_api_s": latency, "entrees": stats["entrees"],
+        "taux_cle_brute": round(raw_hits / requests, 3),
+        "taux_exact": round((stats["hits"] - stats["composees"]) / requests, 3),
+        "taux_avec_composition": round(stats["hit_ratio"], 3),
+        "hits": stats["hits"], "composees": stats["composees"], "misses": stats["misses"],
+        "economie_s": round(stats["economie_s"], 1),
+        **{f"{kind}_p50_ms": round(statistics.median(values) * 1000, 1) for kind, values in durations.items() if values},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.remediation_store", description="Cache des remédiations.")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    commands.add_parser("etat", help="Taux de réussite, latence économisée et taille du cache.")
+    bench = commands.add_parser("banc", help="Simule des demandes d'élèves avec un faux modèle.")
+    bench.add_argument("--demandes", type=int, default=400)
+    bench.add_argument("--latence", type=float, default=0.2, help="Latence simulée de chaque génération (s).")
+    bench.add_argument("--classes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.commande == "etat":
+        database.init_db()
+        print(json.dumps(cache_stats(), ensure_ascii=False, indent=2))
+        return 0
+    # Établissement jetable : sa base SQLite (cache et compteurs) est supprimée à la fin.
+    os.environ["TENANT_ID"] = f"banc-remediation-{uuid.uuid4().hex[:8]}"
+    from modules import sqlite_backend, storage
+    try:
+        database.init_db()
+        print(json.dumps(run_bench(args.demandes, args.latence, args.classes), ensure_ascii=False, indent=2))
+    finally:
+        shutil.rmtree(sqlite_backend.tenant_folder(storage.tenant_id()), ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
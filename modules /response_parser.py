@@ -0,0 +1,555 @@
+# modules/response_parser.py
+"""Analyse des réponses JSON de l'IA : en streaming, ou tolérante sur une réponse complète.
+
+Corpus de réponses mal formées, fuzz et banc d'essai (durée selon la taille de la réponse) :
+    python -m modules.response_parser corpus
+    python -m modules.response_parser fuzz --iterations 5000
+    python -m modules.response_parser banc
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+_SIMPLE_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class StreamingJsonParser:
+    """Analyse incrémentale d'un objet JSON reçu par morceaux (réponse en streaming).
+
+    Chaque caractère n'est examiné qu'une fois. Les champs texte de premier niveau
+    listés dans `text_fields` sont disponibles (partiellement) dès qu'ils arrivent
+    dans `fields` ; les tableaux de `array_fields` sont décodés dès qu'ils se ferment.
+    Le texte avant le premier '{' (balise ```json, phrase d'introduction...) est ignoré.
+    """
+
+    def __init__(self, text_fields=(), array_fields=()):
+        self.text_fields = set(text_fields)
+        self.array_fields = set(array_fields)
+        self.fields = {}
+        self.complete = set()
+        self._parts = {}        # morceaux des champs texte, assemblés une fois par appel à feed()
+        self.done = False
+        self._raw = []          # texte brut depuis le premier '{'
+        self._depth = 0
+        self._in_string = False
+        self._escape = None     # séquence d'échappement en cours (sans le '\')
+        self._high_surrogate = None
+        self._expect_key = False
+        self._key = None        # clé de premier niveau en cours
+        self._string_is_key = False
+        self._capture = None    # champ texte en cours de capture
+        self._chars = []        # caractères de la clé en cours
+        self._array_start = None
+
+    def feed(self, chunk):
+        """Ajoute un morceau de texte ; retourne l'ensemble des champs mis à jour."""
+        updated = set()
+        for ch in chunk:
+            if self.done:
+                break
+            if self._depth == 0:
+                if ch == '{':
+                    self._raw.append(ch)
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+            self._raw.append(ch)
+            if self._in_string:
+                self._string_char(ch, updated)
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._capture = self._key if (self._depth == 1 and not self._expect_key and self._key in self.text_fields) else None
+                self._chars = []
+            elif ch in '{[':
+                if self._depth == 1 and ch == '[' and self._key in self.array_fields:
+                    self._array_start = len(self._raw) - 1
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 1 and ch == ']' and self._array_start is not None:
+                    array_text = ''.join(self._raw[self._array_start:])
+                    self._array_start = None
+                    try:
+                        self.fields[self._key] = json.loads(array_text)
+                    except json.JSONDecodeError:
+                        continue
+                    self.complete.add(self._key)
+                    updated.add(self._key)
+                elif self._depth == 0:
+                    self.done = True
+            elif self._depth == 1 and ch == ',':
+                self._expect_key = True
+            elif self._depth == 1 and ch == ':':
+                self._expect_key = False
+        for field in updated & self.text_fields:
+            self.fields[field] = ''.join(self._parts[field])
+        return updated
+
+    def _string_char(self, ch, updated):
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape[0] == 'u':
+                if len(self._escape) < 5:
+                    return
+                self._append_code_point(int(self._escape[1:], 16), updated)
+            else:
+                self._append(_SIMPLE_ESCAPES.get(self._escape, self._escape), updated)
+            self._escape = None
+        elif ch == '\\':
+            self._escape = ''
+        elif ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._key = ''.join(self._chars)
+            elif self._capture is not None:
+                self._parts.setdefault(self._capture, [])
+                self.complete.add(self._capture)
+                updated.add(self._capture)
+            self._capture = None
+        else:
+            self._append(ch, updated)
+
+    def _append_code_point(self, code, updated):
+        # Les caractères hors BMP arrivent en deux échappements \\uD8xx\\uDCxx.
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._append(chr(code), updated)
+
+    def _append(self, text, updated):
+        if self._string_is_key:
+            self._chars.append(text)
+        elif self._capture is not None:
+            self._parts.setdefault(self._capture, []).append(text)
+            updated.add(self._capture)
+
+    def raw_object(self):
+        """Texte brut de l'objet JSON (complet si `done`)."""
+        return ''.join(self._raw)
+
+    def result(self):
+        """Décode l'objet complet ; lève json.JSONDecodeError s'il est incomplet ou invalide."""
+        return json.loads(self.raw_object())
+
+
+# --- Analyse tolérante d'une réponse complète ---
+
+class ResponseParseError(ValueError):
+    """Aucun objet JSON exploitable n'a pu être extrait de la réponse."""
+
+
+_SMART_QUOTES = ('“', '”', '„')
+_FENCE = '```'
+
+
+def strip_code_fences(text):
+    """Retire une éventuelle balise ```json ... ``` autour de la réponse."""
+    start = text.find(_FENCE)
+    if start == -1:
+        return text
+    body_start = text.find('\n', start)
+    end = text.rfind(_FENCE)
+    if body_start == -1 or end <= body_start:
+        return text[start + len(_FENCE):]
+    return text[body_start + 1:end]
+
+
+def find_json_object(text):
+    """Retourne le premier objet JSON équilibré de `text` (comptage des accolades hors chaînes).
+
+    Les chaînes sont délimitées comme dans repair_json (guillemets typographiques, guillemets
+    non échappés au milieu du texte) : leurs accolades ne comptent pas.
+    Si l'objet n'est jamais refermé (réponse tronquée), retourne tout le texte depuis '{'.
+    Retourne None s'il n'y a aucune accolade ouvrante.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    closing_quote = None
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif (ch == '"' or (closing_quote == '”' and ch in _SMART_QUOTES)) and _ends_string(text, i):
+                in_string = False
+        elif ch == '"' or ch in _SMART_QUOTES:
+            in_string = True
+            closing_quote = '"' if ch == '"' else '”'
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_json(text):
+    """Corrige en un seul passage les défauts fréquents des réponses de l'IA.
+
+    - guillemets typographiques utilisés comme délimiteurs de chaînes ;
+    - guillemets droits non échappés au milieu d'une chaîne ;
+    - retours à la ligne et tabulations bruts dans les chaînes ;
+    - virgules en trop avant '}' ou ']' ;
+    - accolades ou crochets non refermés en fin de réponse tronquée.
+    """
+    out = []
+    closers = []
+    in_string = False
+    closing_quote = None
+    escape = False
+    n = len(text)
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == '\\':
+                escape = True
+                out.append(ch)
+            elif (ch == '"' or (closing_quote == '”' and ch in _SMART_QUOTES)) and _ends_string(text, i):
+                # On ne ferme la chaîne que devant un séparateur JSON : les guillemets
+                # au milieu du texte (“citations”, "mots") sont conservés.
+                in_string = False
+                out.append('"')
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            elif ch == '\r':
+                out.append('\\r')
+            elif ch == '\t':
+                out.append('\\t')
+            else:
+                out.append(ch)
+        elif ch == '"' or ch in _SMART_QUOTES:
+            in_string = True
+            closing_quote = '"' if ch == '"' else '”'
+            out.append('"')
+        elif ch == ',':
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j < n and text[j] in '}]':
+                continue
+            out.append(ch)
+        elif ch in '{[':
+            closers.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            if closers:
+                closers.pop()
+            out.append(ch)
+        else:
+            out.append(ch)
+    if in_string:
+        out.append('"')
+    while closers:
+        out.append(closers.pop())
+    return ''.join(out)
+
+
+def _ends_string(text, i):
+    """Vrai si le guillemet en position i est suivi (hors espaces) d'un séparateur JSON."""
+    j = i + 1
+    while j < len(text) and text[j] in ' \t\r\n':
+        j += 1
+    return j == len(text) or text[j] in ',:}]'
+
+
+def parse_json_response(text):
+    """Extrait et décode l'objet JSON d'une réponse de l'IA, en le réparant si nécessaire."""
+    if not text:
+        raise ResponseParseError("La réponse de l'IA est vide.")
+    candidate = find_json_object(strip_code_fences(text))
+    if candidate is None:
+        candidate = find_json_object(text)
+    if candidate is None:
+        raise ResponseParseError("Aucun bloc JSON n'a été trouvé dans la réponse de l'IA.")
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(candidate))
+    except json.JSONDecodeError as e:
+        raise ResponseParseError(f"JSON invalide même après réparation : {e}") from e
+
+
+# --- Schémas des réponses attendues ---
+# Chaque schéma associe un champ à une fonction qui retourne une description
+# du problème, ou None si la valeur est valide.
+
+def _text(value):
+    if not isinstance(value, str) or not value.strip():
+        return "texte manquant ou vide"
+    return None
+
+
+def _quiz(require_concept):
+    def check(value):
+        if not isinstance(value, list) or not value:
+            return "liste de questions manquante ou vide"
+        for i, q in enumerate(value, start=1):
+            if not isinstance(q, dict) or not isinstance(q.get('question'), str) or not q['question'].strip():
+                return f"question {i} : texte manquant"
+            options = q.get('options')
+            if not isinstance(options, list) or len(options) < 2:
+                return f"question {i} : au moins deux options sont nécessaires"
+            if str(q.get('correct_answer')) not in [str(opt) for opt in options]:
+                return f"question {i} : la bonne réponse ne fait pas partie des options"
+            if require_concept and not q.get('concept'):
+                return f"question {i} : concept manquant"
+        return None
+    return check
+
+
+LESSON_SCHEMA = {
+    "sujet": _text,
+    "lecon_markdown": _text,
+    "quiz_10_questions": _quiz(require_concept=True),
+}
+
+REMEDIATION_SCHEMA = {
+    "remediation_markdown": _text,
+    "quiz_5_questions": _quiz(require_concept=False),
+}
+
+
+def validate(payload, schema):
+    """Retourne {champ: problème} pour chaque champ invalide du schéma (vide si tout est valide)."""
+    if not isinstance(payload, dict):
+        return {field: "la réponse n'est pas un objet JSON" for field in schema}
+    problems = {}
+    for field, check in schema.items():
+        problem = check(payload.get(field))
+        if problem:
+            problems[field] = problem
+    return problems
+
+
+# --- Corpus de réponses mal formées ---
+# Défauts relevés dans de vraies réponses, avec l'objet attendu (None : ResponseParseError).
+
+MALFORMED_CORPUS = (
+    ("balise_json", '```json\n{"sujet": "Les fractions"}\n```', {"sujet": "Les fractions"}),
+    ("balise_sans_langage", '```\n{"sujet": "Les fractions"}\n```', {"sujet": "Les fractions"}),
+    ("introduction_et_conclusion", 'Voici la leçon demandée :\n{"sujet": "Le passé composé"}\nBonne révision !',
+     {"sujet": "Le passé composé"}),
+    ("deux_objets", '{"sujet": "A"}\nEt une variante : {"sujet": "B"}', {"sujet": "A"}),
+    ("accolades_dans_une_chaine", '{"lecon_markdown": "Un ensemble s\'écrit { 1 ; 2 } en maths."}',
+     {"lecon_markdown": "Un ensemble s'écrit { 1 ; 2 } en maths."}),
+    ("guillemet_echappe", '{"lecon_markdown": "Le mot \\"chat\\" est un nom}"}',
+     {"lecon_markdown": 'Le mot "chat" est un nom}'}),
+    ("virgule_finale_objet", '{"sujet": "Les angles", "lecon_markdown": "Texte",}',
+     {"sujet": "Les angles", "lecon_markdown": "Texte"}),
+    ("virgule_finale_tableau", '{"options": ["A", "B", "C",\n]}', {"options": ["A", "B", "C"]}),
+    ("guillemets_typographiques", '{“sujet”: “La symétrie”, “options”: [“A”, “B”]}',
+     {"sujet": "La symétrie", "options": ["A", "B"]}),
+    ("guillemets_non_echappes", '{"question": "Dans "le chat dort" et {le lit}, quel est le verbe ?"}',
+     {"question": 'Dans "le chat dort" et {le lit}, quel est le verbe ?'}),
+    ("retour_ligne_brut", '{"lecon_markdown": "## Titre\n\nParagraphe\tavec tabulation"}',
+     {"lecon_markdown": "## Titre\n\nParagraphe\tavec tabulation"}),
+    ("echappements_unicode", '{"sujet": "L\\u00e9l\\u00e8ve \\ud83d\\ude00"}', {"sujet": "Lélève 😀"}),
+    ("reponse_tronquee", '```json\n{"sujet": "Les décimaux", "options": ["0,5", "0,25"',
+     {"sujet": "Les décimaux", "options": ["0,5", "0,25"]}),
+    ("tronquee_dans_une_chaine", '{"sujet": "Les décimaux", "lecon_markdown": "Un nombre déc',
+     {"sujet": "Les décimaux", "lecon_markdown": "Un nombre déc"}),
+    ("defauts_cumules", 'Bien sûr !\n```json\n{“remediation_markdown”: “## On reprend\nLe mot "si" ne s\'élide pas.”,\n'
+     ' "quiz_5_questions": [{"question": "Q ?", "options": ["a", "b",], "correct_answer": "a",},],}\n```',
+     {"remediation_markdown": '## On reprend\nLe mot "si" ne s\'élide pas.',
+      "quiz_5_questions": [{"question": "Q ?", "options": ["a", "b"], "correct_answer": "a"}]}),
+    ("vide", "", None),
+    ("sans_json", "Je ne peux pas générer cette leçon pour le moment.", None),
+    ("json_irreparable", '{"sujet": "A" "lecon_markdown": "B"}', None),
+)
+
+
+def _greedy_extract(text):
+    """Ancienne extraction (regex gloutonne puis json.loads), pour comparaison."""
+    match = re.search(r'\{.*\}', text or "", re.DOTALL)
+    return json.loads(match.group(0)) if match else None
+
+
+def _try(parse, text):
+    try:
+        return parse(text)
+    except (ResponseParseError, json.JSONDecodeError):
+        return None
+
+
+def run_corpus():
+    """Résultat de chaque entrée du corpus, avec l'analyseur actuel et l'ancienne extraction."""
+    report = {"entrees": {}, "reussites": 0, "reussites_ancienne_extraction": 0}
+    for name, text, expected in MALFORMED_CORPUS:
+        ok = _try(parse_json_response, text) == expected
+        ok_old = _try(_greedy_extract, text) == expected
+        report["entrees"][name] = "ok" if ok else "ÉCHEC"
+        report["reussites"] += ok
+        report["reussites_ancienne_extraction"] += ok_old
+    report["total"] = len(MALFORMED_CORPUS)
+    return report
+
+
+# --- Fuzz ---
+# Des objets aléatoires sont écrits avec des défauts réparables (la réponse doit redonner
+# exactement l'objet) ou destructeurs (seule ResponseParseError est acceptée).
+
+# Un guillemet interne suivi d'un séparateur JSON (",", ":", "}", "]") est indiscernable de la
+# fin de la chaîne : le mot cité est toujours suivi d'un autre mot.
+_WORDS = ("leçon", "élève", "fraction", "l'angle", "{", "}", "[", "]", ":", '"mot" cité', "«", "»", "😀", "\\", "1/2", "puis,")
+
+
+def _random_text(rng):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(1, 12))]
+    return " ".join(words) + rng.choice(("", ".", " ?", "\n\nSuite."))
+
+
+def _random_value(rng, depth=0):
+    kind = rng.random()
+    if depth >= 3 or kind < 0.5:
+        return _random_text(rng)
+    if kind < 0.6:
+        return rng.choice((rng.randint(-5, 100), True, None))
+    if kind < 0.8:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(1, 4))]
+    return {f"champ_{i}": _random_value(rng, depth + 1) for i in range(rng.randint(1, 4))}
+
+
+def _write(value, defects):
+    """Sérialise `value` en injectant les défauts demandés."""
+    if isinstance(value, dict):
+        items = [f"{_write(key, defects)}: {_write(item, defects)}" for key, item in value.items()]
+        return "{" + ", ".join(items) + ("," if "virgules" in defects else "") + "}"
+    if isinstance(value, list):
+        items = [_write(item, defects) for item in value]
+        return "[" + ", ".join(items) + ("," if "virgules" in defects else "") + "]"
+    if not isinstance(value, str):
+        return json.dumps(value)
+    body = json.dumps(value, ensure_ascii=False)[1:-1]
+    if "retours_ligne" in defects:
+        body = body.replace("\\n", "\n")
+    if "guillemets_internes" in defects:
+        body = body.replace('\\"', '"')
+    if "typographiques" in defects:
+        return f"“{body}”"
+    return f'"{body}"'
+
+
+REPAIRABLE_DEFECTS = ("balise", "introduction", "virgules", "retours_ligne", "guillemets_internes", "typographiques")
+
+
+def _mutate(text, rng):
+    """Abîme la réponse : troncature, caractère supprimé, inséré ou remplacé."""
+    position = rng.randrange(len(text) + 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return text[:position]
+    if kind == 1:
+        return text[:position] + text[position + 1:]
+    character = rng.choice('{}[]",:\\“”\n ')
+    if kind == 2:
+        return text[:position] + character + text[position:]
+    return text[:position] + character + text[position + 1:]
+
+
+def run_fuzz(iterations, seed=0):
+    """Réponses réparables qui ne redonnent pas l'objet, et exceptions autres que ResponseParseError."""
+    rng = random.Random(seed)
+    report = {"iterations": iterations, "reparables_ok": 0, "reparables_echecs": [], "exceptions": []}
+    for n in range(iterations):
+        payload = {f"champ_{i}": _random_value(rng) for i in range(rng.randint(1, 5))}
+        defects = {defect for defect in REPAIRABLE_DEFECTS if rng.random() < 0.3}
+        text = _write(payload, defects)
+        if "balise" in defects:
+            text = f"```json\n{text}\n```"
+        if "introduction" in defects:
+            text = f"Voici la réponse :\n{text}\nBonne journée !"
+        if _try(parse_json_response, text) == payload:
+            report["reparables_ok"] += 1
+        elif len(report["reparables_echecs"]) < 5:
+            report["reparables_echecs"].append({"defauts": sorted(defects), "texte": text})
+        for _ in range(3):
+            text = _mutate(text, rng)
+        try:
+            parse_json_response(text)
+        except ResponseParseError:
+            pass
+        except Exception as e:
+            if len(report["exceptions"]) < 5:
+                report["exceptions"].append({"iteration": n, "erreur": repr(e), "texte": text})
+    return report
+
+
+# --- Banc d'essai ---
+
+def _bench_response(size_kb, rng):
+    """Réponse d'environ `size_kb` Ko avec tous les défauts réparables : le chemin le plus lent."""
+    paragraph = "Une explication détaillée avec un exemple concret et un \"mot\" cité. " * 12
+    payload = {"sujet": "Banc", "lecon_markdown": "", "quiz_10_questions": []}
+    while len(payload["lecon_markdown"]) < size_kb * 1024 // 2:
+        payload["lecon_markdown"] += paragraph + "\n\n"
+    quiz_size = 0
+    while quiz_size < size_kb * 1024 // 2:
+        question = {"question": _random_text(rng), "options": ["A", "B", "C"], "correct_answer": "A"}
+        payload["quiz_10_questions"].append(question)
+        quiz_size += len(json.dumps(question, ensure_ascii=False))
+    return "Voici :\n```json\n" + _write(payload, set(REPAIRABLE_DEFECTS)) + "\n```"
+
+
+def run_bench(sizes_kb, repetitions):
+    """Durée d'analyse d'une réponse réparée selon sa taille : elle doit croître linéairement."""
+    rng = random.Random(0)
+    report = []
+    for size_kb in sizes_kb:
+        text = _bench_response(size_kb, rng)
+        durations = []
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            parse_json_response(text)
+            durations.append(time.perf_counter() - start)
+        best_ms = min(durations) * 1000
+        report.append({"taille_ko": round(len(text.encode()) / 1024), "duree_ms": round(best_ms, 2),
+                       "ms_par_100_ko": round(best_ms / len(text.encode()) * 100 * 1024, 2)})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.response_parser", description="Corpus, fuzz et banc d'essai de l'analyseur.")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    commands.add_parser("corpus", help="Rejoue le corpus de réponses mal formées.")
+    fuzz = commands.add_parser("fuzz", help="Réponses aléatoires, réparables puis abîmées.")
+    fuzz.add_argument("--iterations", type=int, default=5000)
+    fuzz.add_argument("--graine", type=int, default=0)
+    bench = commands.add_parser("banc", help="Durée d'analyse selon la taille de la réponse.")
+    bench.add_argument("--tailles", type=int, nargs="+", default=[3, 30, 300, 3000], help="Tailles en Ko.")
+    bench.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.commande == "corpus":
+        report = run_corpus()
+        failed = report["reussites"] < report["total"]
+    elif args.commande == "fuzz":
+        report = run_fuzz(args.iterations, args.graine)
+        failed = bool(report["reparables_echecs"] or report["exceptions"])
+    else:
+        report = run_bench(args.tailles, args.repetitions)
+        failed = False
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
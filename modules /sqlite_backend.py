@@ -0,0 +1,924 @@
+# modules/sqlite_backend.py
+"""Stockage SQLite : un fichier par établissement.
+
+data/progress.db pour l'établissement par défaut, data/etablissements/<TENANT_ID>/progress.db
+pour les autres : un prénom n'est unique que dans la base de son établissement.
+Cette base locale contient aussi les caches de leçons (lesson_store) et de remédiations
+(remediation_store), et son dossier l'archive (archive), quel que soit le moteur qui
+stocke la progression des élèves.
+
+Banc d'essai du pool (requêtes par seconde, pool contre une connexion par appel) et
+vérification des plans d'exécution du tableau de bord sur une base remplie :
+    python -m modules.sqlite_backend pool --requetes 20000 --threads 4
+    python -m modules.sqlite_backend plans --lecons 100000
+"""
+import argparse
+import json
+import queue
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import streamlit as st
+from modules import storage
+from modules.storage import StorageError
+
+# --- Configuration du chemin de la base de données ---
+DATA_FOLDER = Path(__file__).parent.parent / "data"
+
+
+def tenant_folder(tenant):
+    """Dossier des données SQLite d'un établissement."""
+    if tenant == storage.DEFAULT_TENANT:
+        return DATA_FOLDER
+    return DATA_FOLDER / "etablissements" / tenant
+
+
+DB_FOLDER = tenant_folder(storage.tenant_id())
+DB_FILE = DB_FOLDER / "progress.db"
+
+# Nombre maximum de connexions ouvertes en même temps par le processus.
+POOL_MAX_CONNECTIONS = 8
+
+# Réglages appliqués une seule fois à chaque nouvelle connexion.
+# WAL permet aux lecteurs de ne plus être bloqués par l'écriture d'une leçon.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",     # ~16 Mo de cache de pages par connexion
+    "PRAGMA mmap_size=268435456",   # 256 Mo de lecture via mmap
+    "PRAGMA temp_store=MEMORY",
+)
+
+# --- Pool de connexions ---
+
+class ConnectionPool:
+    """Pool de connexions SQLite réutilisables, partagé entre toutes les sessions."""
+
+    def __init__(self, db_file, max_connections=POOL_MAX_CONNECTIONS):
+        self.db_file = db_file
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        # Contention : emprunts qui ont attendu une connexion libre, erreurs « database is locked ».
+        self._stats_lock = threading.Lock()
+        self.counters = {"emprunts": 0, "attentes": 0, "attente_totale_ms": 0.0, "attente_max_ms": 0.0, "verrouillee": 0}
+
+    def _connect(self):
+        # check_same_thread=False : une connexion peut être rendue au pool par
+        # un thread et reprise par un autre, mais jamais utilisée par deux à la fois.
+        conn = sqlite3.connect(self.db_file, timeout=10, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion au pool et la rend automatiquement."""
+        waited_ms = 0.0
+        if not self._slots.acquire(blocking=False):
+            start = time.perf_counter()
+            self._slots.acquire()
+            waited_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.counters["emprunts"] += 1
+            if waited_ms:
+                self.counters["attentes"] += 1
+                self.counters["attente_totale_ms"] += waited_ms
+                self.counters["attente_max_ms"] = max(self.counters["attente_max_ms"], waited_ms)
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e):
+                    with self._stats_lock:
+                        self.counters["verrouillee"] += 1
+                raise
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self.counters)
+
+    def close(self):
+        """Ferme les connexions inactives."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# --- Migrations du schéma ---
+# Chaque migration fait passer la base de la version N-1 à la version N
+# (stockée dans PRAGMA user_version). On n'ajoute QUE de nouvelles migrations
+# à la fin de la liste : une base existante est ainsi mise à jour sur place.
+
+def _migration_schema_initial(conn):
+    """v1 : tables eleves et lecons, élèves par défaut."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS eleves (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prenom TEXT NOT NULL UNIQUE,
+            classe TEXT
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lecons (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            eleve_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            classe TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            sujet TEXT NOT NULL,
+            score_quiz_1 INTEGER,
+            score_quiz_2 INTEGER,
+            appreciation_ia TEXT,
+            points_a_revoir TEXT,
+            FOREIGN KEY (eleve_id) REFERENCES eleves (id)
+        )
+    """)
+
+    # Pré-remplir la table avec les élèves par défaut s'ils n'existent pas.
+    # INSERT OR IGNORE ne fait rien si le prénom existe déjà.
+    eleves_par_defaut = [
+        ('Tessnim', 'CM1'),
+        ('Rayan', '4ème')
+    ]
+    conn.executemany("INSERT OR IGNORE INTO eleves (prenom, classe) VALUES (?, ?)", eleves_par_defaut)
+
+def _migration_index_lecons(conn):
+    """v2 : date numérique triable (date_ts) et index pour les requêtes du tableau de bord."""
+    conn.execute("ALTER TABLE lecons ADD COLUMN date_ts INTEGER")
+    conn.execute("UPDATE lecons SET date_ts = CAST(strftime('%s', date) AS INTEGER)")
+    # Historique d'un élève dans l'ordre chronologique, sans tri supplémentaire.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lecons_eleve_date ON lecons (eleve_id, date_ts)")
+    # Agrégats par matière (nombre, moyenne) lus uniquement depuis l'index.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lecons_eleve_matiere ON lecons (eleve_id, matiere, score_quiz_1)")
+
+def _migration_student_stats(conn):
+    """v3 : résumé par élève et par matière, tenu à jour à chaque leçon enregistrée."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS student_stats (
+            eleve_id INTEGER NOT NULL,
+            matiere TEXT NOT NULL,
+            nombre_lecons INTEGER NOT NULL,
+            somme_scores INTEGER NOT NULL,
+            meilleur_score INTEGER,
+            dernier_score INTEGER,
+            dernier_date_ts INTEGER,
+            PRIMARY KEY (eleve_id, matiere),
+            FOREIGN KEY (eleve_id) REFERENCES eleves (id)
+        ) WITHOUT ROWID
+    """)
+    # Reconstitue le résumé à partir de l'historique déjà présent.
+    conn.execute("""
+        INSERT INTO student_stats (eleve_id, matiere, nombre_lecons, somme_scores, meilleur_score, dernier_score, dernier_date_ts)
+        SELECT l.eleve_id, l.matiere, COUNT(*), COALESCE(SUM(l.score_quiz_1), 0), MAX(l.score_quiz_1),
+               (SELECT d.score_quiz_1 FROM lecons d
+                WHERE d.eleve_id = l.eleve_id AND d.matiere = l.matiere
+                ORDER BY d.date_ts DESC LIMIT 1),
+               MAX(l.date_ts)
+        FROM lecons l
+        GROUP BY l.eleve_id, l.matiere
+    """)
+
+def _migration_compteurs(conn):
+    """v4 : compteurs nommés (générations utilisées pour invalider les caches)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compteurs (
+            cle TEXT PRIMARY KEY,
+            valeur INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+def _migration_lesson_uuid(conn):
+    """v5 : identifiant unique de leçon pour que chaque leçon ne soit enregistrée qu'une fois."""
+    conn.execute("ALTER TABLE lecons ADD COLUMN lesson_uuid TEXT")
+    # Les anciennes leçons gardent NULL : SQLite considère les NULL comme distincts.
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_lecons_uuid ON lecons (lesson_uuid)")
+
+def _migration_lesson_cache(conn):
+    """v6 : leçons générées réutilisables, et leçons déjà servies à chaque élève."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lesson_cache (
+            cle TEXT PRIMARY KEY,
+            classe TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            sujet TEXT NOT NULL,
+            contenu TEXT NOT NULL,
+            cree_ts INTEGER NOT NULL,
+            dernier_usage_ts INTEGER NOT NULL,
+            nb_utilisations INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lesson_cache_cellule ON lesson_cache (classe, matiere, dernier_usage_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lesson_cache_usage ON lesson_cache (dernier_usage_ts)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lecons_servies (
+            eleve_id INTEGER NOT NULL,
+            cle TEXT NOT NULL,
+            servi_ts INTEGER NOT NULL,
+            PRIMARY KEY (eleve_id, cle),
+            FOREIGN KEY (eleve_id) REFERENCES eleves (id)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_concepts(conn):
+    """v7 : concepts par matière et maîtrise de chaque concept par élève, repris de points_a_revoir."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS concepts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            matiere TEXT NOT NULL,
+            libelle TEXT NOT NULL,
+            UNIQUE (matiere, libelle)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS eleve_concept_mastery (
+            eleve_id INTEGER NOT NULL,
+            concept_id INTEGER NOT NULL,
+            nb_reussites INTEGER NOT NULL,
+            nb_echecs INTEGER NOT NULL,
+            a_revoir INTEGER NOT NULL,
+            dernier_ts INTEGER NOT NULL,
+            dernier_echec_ts INTEGER,
+            PRIMARY KEY (eleve_id, concept_id),
+            FOREIGN KEY (eleve_id) REFERENCES eleves (id),
+            FOREIGN KEY (concept_id) REFERENCES concepts (id)
+        ) WITHOUT ROWID
+    """)
+    # « Prochains défis » : concepts encore à revoir d'un élève, du plus récent au plus ancien.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mastery_a_revoir
+        ON eleve_concept_mastery (eleve_id, dernier_echec_ts) WHERE a_revoir = 1
+    """)
+    backfill_concept_mastery(conn)
+
+def _migration_reponses(conn):
+    """v8 : journal des réponses à chaque question (ajout seul) et questions posées."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            cle INTEGER PRIMARY KEY,
+            texte TEXT NOT NULL,
+            options TEXT NOT NULL,
+            bonne_option INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reponses (
+            id INTEGER PRIMARY KEY,
+            eleve_id INTEGER NOT NULL,
+            lesson_uuid TEXT NOT NULL,
+            quiz INTEGER NOT NULL,
+            numero INTEGER NOT NULL,
+            tentative INTEGER NOT NULL,
+            classe TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            question_cle INTEGER NOT NULL,
+            concept TEXT,
+            option_choisie INTEGER NOT NULL,
+            correcte INTEGER NOT NULL,
+            duree_quiz_ms INTEGER,
+            repondu_ts INTEGER NOT NULL,
+            UNIQUE (lesson_uuid, quiz, numero),
+            FOREIGN KEY (eleve_id) REFERENCES eleves (id),
+            FOREIGN KEY (question_cle) REFERENCES questions (cle)
+        )
+    """)
+    # Analyse des questions : lecture de toutes les réponses d'une classe et d'une matière.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reponses_classe_matiere ON reponses (classe, matiere)")
+
+def _migration_index_classes(conn):
+    """v9 : index de la page Classe (élèves d'une classe par prénom, scores d'une classe)."""
+    # Pagination par clé : les élèves d'une classe sont lus dans l'ordre des prénoms.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_eleves_classe_prenom ON eleves (classe, prenom)")
+    # Distribution des scores d'une classe lue uniquement depuis l'index.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lecons_classe_matiere_score ON lecons (classe, matiere, score_quiz_1)")
+
+def _migration_remediation_cache(conn):
+    """v10 : remédiations générées réutilisables, indexées par concept (modules/remediation_store.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS remediation_cache (
+            cle TEXT PRIMARY KEY,
+            classe TEXT NOT NULL,
+            concepts TEXT NOT NULL,
+            nb_concepts INTEGER NOT NULL,
+            libelles TEXT NOT NULL,
+            contenu TEXT NOT NULL,
+            duree_generation_ms INTEGER NOT NULL,
+            cree_ts INTEGER NOT NULL,
+            dernier_usage_ts INTEGER NOT NULL,
+            nb_utilisations INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_remediation_cache_usage ON remediation_cache (dernier_usage_ts)")
+    # Recherche des entrées dont tous les concepts font partie d'une demande.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS remediation_concepts (
+            classe TEXT NOT NULL,
+            concept TEXT NOT NULL,
+            cle TEXT NOT NULL,
+            PRIMARY KEY (classe, concept, cle)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_scores_archives(conn):
+    """v11 : nombre de leçons archivées par classe, matière et score (modules/archive.py)."""
+    # Les leçons archivées quittent `lecons` : la page Classe continue de les compter ici.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scores_archives (
+            classe TEXT NOT NULL,
+            matiere TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            nombre INTEGER NOT NULL,
+            PRIMARY KEY (classe, matiere, score)
+        ) WITHOUT ROWID
+    """)
+
+MIGRATIONS = [
+    _migration_schema_initial,
+    _migration_index_lecons,
+    _migration_student_stats,
+    _migration_compteurs,
+    _migration_lesson_uuid,
+    _migration_lesson_cache,
+    _migration_concepts,
+    _migration_reponses,
+    _migration_index_classes,
+    _migration_remediation_cache,
+    _migration_scores_archives,
+]
+
+def _migrate(conn):
+    """Applique les migrations manquantes, chacune dans sa propre transaction."""
+    for numero in range(1, len(MIGRATIONS) + 1):
+        # BEGIN IMMEDIATE prend le verrou d'écriture : si un autre processus
+        # migre en même temps, on relit la version une fois le verrou obtenu.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < numero:
+                MIGRATIONS[numero - 1](conn)
+                conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def open_pool(db_file, max_connections=POOL_MAX_CONNECTIONS):
+    """Crée un pool sur `db_file` et met son schéma à jour."""
+    Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+    pool = ConnectionPool(db_file, max_connections)
+    with pool.connection() as conn:
+        _migrate(conn)
+    return pool
+
+
+@st.cache_resource
+def get_pool(tenant):
+    """Pool de la base de l'établissement, créé une seule fois par processus."""
+    return open_pool(tenant_folder(tenant) / "progress.db")
+
+
+def get_connection():
+    """Context manager qui fournit une connexion du pool : `with get_connection() as conn:`."""
+    return get_pool(storage.tenant_id()).connection()
+
+
+def pool_stats():
+    """Emprunts, attentes d'une connexion libre et erreurs de verrou du pool de l'établissement."""
+    return get_pool(storage.tenant_id()).stats()
+
+
+def increment_counter(conn, cle, pas=1):
+    """Incrémente le compteur nommé `cle` dans la transaction de `conn`."""
+    conn.execute("""
+        INSERT INTO compteurs (cle, valeur) VALUES (?, ?)
+        ON CONFLICT (cle) DO UPDATE SET valeur = valeur + excluded.valeur
+    """, (cle, pas))
+
+
+# --- Maîtrise des concepts ---
+
+_MASTERY_UPSERT = """
+    INSERT INTO eleve_concept_mastery (eleve_id, concept_id, nb_reussites, nb_echecs, a_revoir, dernier_ts, dernier_echec_ts)
+    SELECT ?, id, ?, ?, ?, ?, ? FROM concepts WHERE matiere = ? AND libelle = ?
+    ON CONFLICT (eleve_id, concept_id) DO UPDATE SET
+        nb_reussites = nb_reussites + excluded.nb_reussites,
+        nb_echecs = nb_echecs + excluded.nb_echecs,
+        a_revoir = CASE WHEN excluded.dernier_ts >= dernier_ts THEN excluded.a_revoir ELSE a_revoir END,
+        dernier_ts = MAX(dernier_ts, excluded.dernier_ts),
+        dernier_echec_ts = COALESCE(MAX(dernier_echec_ts, excluded.dernier_echec_ts), dernier_echec_ts, excluded.dernier_echec_ts)
+"""
+
+
+def update_concept_mastery(conn, rows):
+    """Ajoute en lot les résultats `rows` : (eleve_id, matiere, concept, réussi, à revoir, date_ts).
+
+    Les lignes doivent être dans l'ordre chronologique : la dernière fixe « à revoir ».
+    """
+    conn.executemany(
+        "INSERT INTO concepts (matiere, libelle) VALUES (?, ?) ON CONFLICT (matiere, libelle) DO NOTHING",
+        {(matiere, concept) for _, matiere, concept, _, _, _ in rows},
+    )
+    conn.executemany(_MASTERY_UPSERT, [
+        (eleve_id, int(reussi), int(not reussi), int(a_revoir), date_ts, None if reussi else date_ts, matiere, concept)
+        for eleve_id, matiere, concept, reussi, a_revoir, date_ts in rows
+    ])
+
+
+def backfill_concept_mastery(conn, min_lecon_id=0):
+    """Reprend les points_a_revoir des leçons d'id > `min_lecon_id` (migration v7, import d'archive)."""
+    lessons = conn.execute("""
+        SELECT eleve_id, matiere, points_a_revoir, date_ts FROM lecons
+        WHERE id > ? AND points_a_revoir IS NOT NULL AND points_a_revoir != ''
+        ORDER BY date_ts
+    """, (min_lecon_id,)).fetchall()
+    rows = [
+        (eleve_id, matiere, concept, reussi, a_revoir, date_ts or 0)
+        for eleve_id, matiere, points, date_ts in lessons
+        for concept, reussi, a_revoir in storage.concept_outcomes({'points_a_revoir': points})
+    ]
+    update_concept_mastery(conn, rows)
+    return len(rows)
+
+
+# --- Écritures d'une leçon terminée ---
+# Exécutées dans la transaction de l'appelant : une leçon seule (save_lesson_result)
+# ou tout un lot de la file d'écriture (save_batch).
+
+_LESSON_INSERT = """
+    INSERT INTO lecons (eleve_id, lesson_uuid, date, date_ts, classe, matiere, sujet, score_quiz_1, score_quiz_2, appreciation_ia, points_a_revoir)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (lesson_uuid) DO NOTHING
+"""
+
+_STATS_UPSERT = """
+    INSERT INTO student_stats (eleve_id, matiere, nombre_lecons, somme_scores, meilleur_score, dernier_score, dernier_date_ts)
+    VALUES (?, ?, 1, ?, ?, ?, ?)
+    ON CONFLICT (eleve_id, matiere) DO UPDATE SET
+        nombre_lecons = nombre_lecons + 1,
+        somme_scores = somme_scores + excluded.somme_scores,
+        meilleur_score = MAX(COALESCE(meilleur_score, excluded.meilleur_score), excluded.meilleur_score),
+        dernier_score = CASE WHEN excluded.dernier_date_ts >= COALESCE(dernier_date_ts, 0)
+                             THEN excluded.dernier_score ELSE dernier_score END,
+        dernier_date_ts = MAX(COALESCE(dernier_date_ts, 0), excluded.dernier_date_ts)
+"""
+
+
+def _save_lesson(conn, eleve_id, data, generation_key):
+    """Insère la leçon ; le résumé par matière, la maîtrise des concepts et la génération suivent."""
+    lesson_data_tuple = (
+        eleve_id, data.get('lesson_uuid'), data['date'], data['date_ts'], data['classe'], data['matiere'],
+        data['sujet'], data['score_quiz_1'], data.get('score_quiz_2'),
+        data['appreciation_ia'], data['points_a_revoir']
+    )
+    inserted = conn.execute(_LESSON_INSERT, lesson_data_tuple).rowcount
+    if inserted:
+        score = data['score_quiz_1']
+        conn.execute(_STATS_UPSERT, (eleve_id, data['matiere'], score, score, score, data['date_ts']))
+        update_concept_mastery(conn, [
+            (eleve_id, data['matiere'], concept, reussi, a_revoir, data['date_ts'])
+            for concept, reussi, a_revoir in storage.concept_outcomes(data)
+        ])
+        increment_counter(conn, generation_key)
+    return bool(inserted)
+
+
+def _save_answers(conn, eleve_ids, answers):
+    """Ajoute les réponses des élèves connus (`eleve_ids`) ; retourne le nombre inséré."""
+    answers = [answer for answer in answers if answer['eleve'] in eleve_ids]
+    conn.executemany(
+        "INSERT INTO questions (cle, texte, options, bonne_option) VALUES (?, ?, ?, ?) ON CONFLICT (cle) DO NOTHING",
+        {(a['question_cle'], a['question'], json.dumps(list(a['options']), ensure_ascii=False), a['bonne_option'])
+         for a in answers},
+    )
+    before = conn.total_changes
+    conn.executemany("""
+        INSERT INTO reponses (eleve_id, lesson_uuid, quiz, numero, tentative, classe, matiere, question_cle,
+                              concept, option_choisie, correcte, duree_quiz_ms, repondu_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (lesson_uuid, quiz, numero) DO NOTHING
+    """, [
+        (eleve_ids[a['eleve']], a['lesson_uuid'], a['quiz'], a['numero'],
+         storage.attempt_key(a['lesson_uuid'], a['quiz']), a['classe'], a['matiere'],
+         a['question_cle'], a.get('concept'), a['option_choisie'], int(a['correcte']),
+         a.get('duree_quiz_ms'), a['repondu_ts'])
+        for a in answers
+    ])
+    return conn.total_changes - before
+
+
+# --- Lectures du tableau de bord ---
+
+_STUDENT_DATA_QUERY = """
+    SELECT date, matiere, sujet, score_quiz_1, points_a_revoir
+    FROM lecons
+    WHERE eleve_id = (SELECT id FROM eleves WHERE prenom = ?)
+    ORDER BY date_ts ASC
+"""
+
+_STUDENT_STATS_QUERY = """
+    SELECT matiere, nombre_lecons, somme_scores,
+           CAST(somme_scores AS REAL) / nombre_lecons AS score_moyen,
+           meilleur_score, dernier_score
+    FROM student_stats
+    WHERE eleve_id = (SELECT id FROM eleves WHERE prenom = ?)
+    ORDER BY matiere
+"""
+
+_TOP_SUCCESSES_QUERY = """
+    SELECT date, matiere, sujet, score_quiz_1
+    FROM lecons
+    WHERE eleve_id = (SELECT id FROM eleves WHERE prenom = ?) AND score_quiz_1 >= ?
+    ORDER BY date_ts DESC
+    LIMIT ?
+"""
+
+# Parcourt l'index partiel idx_mastery_a_revoir : seuls les concepts à revoir sont lus.
+_RECENT_CHALLENGES_QUERY = """
+    SELECT c.matiere, c.libelle AS concept, m.nb_echecs, m.dernier_echec_ts
+    FROM eleve_concept_mastery m JOIN concepts c ON c.id = m.concept_id
+    WHERE m.eleve_id = (SELECT id FROM eleves WHERE prenom = ?) AND m.a_revoir = 1
+    ORDER BY m.dernier_echec_ts DESC
+    LIMIT ?
+"""
+
+# Index que chaque requête du tableau de bord doit utiliser, avec des paramètres d'exemple.
+DASHBOARD_QUERY_INDEXES = {
+    "historique": (_STUDENT_DATA_QUERY, ("Élève",), "idx_lecons_eleve_date"),
+    "resume_matieres": (_STUDENT_STATS_QUERY, ("Élève",), "PRIMARY KEY"),
+    "pantheon": (_TOP_SUCCESSES_QUERY, ("Élève", 8, 5), "idx_lecons_eleve_date"),
+    "defis": (_RECENT_CHALLENGES_QUERY, ("Élève", 5), "idx_mastery_a_revoir"),
+}
+
+
+def query_plan(conn, query, params):
+    """Étapes de EXPLAIN QUERY PLAN pour `query`."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def check_query_plans(conn):
+    """Requêtes du tableau de bord qui ne passent plus par leur index, ou qui trient : {nom: plan}."""
+    regressions = {}
+    for name, (query, params, index) in DASHBOARD_QUERY_INDEXES.items():
+        plan = query_plan(conn, query, params)
+        # La recherche du prénom passe par l'index unique de eleves ; aucune table n'est parcourue en entier.
+        uses_index = any(step.startswith("SEARCH") and index in step for step in plan)
+        if not uses_index or any(step.startswith("SCAN") or "TEMP B-TREE" in step for step in plan):
+            regressions[name] = plan
+    return regressions
+
+
+def _dataframe(conn, query, params):
+    # pandas n'est importé qu'à la première lecture d'un tableau (démarrage plus rapide).
+    import pandas as pd
+    return pd.read_sql_query(query, conn, params=params)
+
+
+# --- Moteur ---
+
+class SQLiteBackend(storage.StorageBackend):
+    """Implémentation de StorageBackend sur un pool de connexions SQLite."""
+
+    name = "sqlite"
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.student_ids = storage.StudentIdCache()
+
+    @contextmanager
+    def _connection(self):
+        try:
+            with self.pool.connection() as conn:
+                yield conn
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def add_student(self, prenom, classe, generation_key):
+        with self._connection() as conn, conn:
+            inserted = conn.execute("""
+                INSERT INTO eleves (prenom, classe) VALUES (?, ?)
+                ON CONFLICT (prenom) DO NOTHING
+            """, (prenom, classe)).rowcount
+            if inserted:
+                increment_counter(conn, generation_key)
+        return bool(inserted)
+
+    def get_student_list(self):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT prenom FROM eleves ORDER BY prenom").fetchall()
+        return [row[0] for row in rows]
+
+    def get_student_class(self, prenom):
+        with self._connection() as conn:
+            result = conn.execute("SELECT classe FROM eleves WHERE prenom = ?", (prenom,)).fetchone()
+        return result[0] if result else None
+
+    def get_student_id(self, prenom):
+        with self._connection() as conn:
+            result = conn.execute("SELECT id FROM eleves WHERE prenom = ?", (prenom,)).fetchone()
+        return result[0] if result else None
+
+    def get_student_topics(self, prenom, matiere):
+        with self._connection() as conn:
+            rows = conn.execute("""
+                SELECT DISTINCT sujet FROM lecons
+                WHERE eleve_id = (SELECT id FROM eleves WHERE prenom = ?) AND matiere = ?
+            """, (prenom, matiere)).fetchall()
+        return [row[0] for row in rows]
+
+    def _student_ids(self, conn, prenoms):
+        def lookup(missing):
+            rows = conn.execute(
+                f"SELECT prenom, id FROM eleves WHERE prenom IN ({', '.join('?' * len(missing))})", missing
+            ).fetchall()
+            return dict(rows)
+        return self.student_ids.get(list(set(prenoms)), lookup)
+
+    def save_lesson_result(self, data, generation_key):
+        with self._connection() as conn:
+            eleve_id = self._student_ids(conn, [data['eleve']]).get(data['eleve'])
+            if eleve_id is None:
+                return None
+            with conn:
+                return _save_lesson(conn, eleve_id, data, generation_key)
+
+    def get_class_list(self):
+        query = "SELECT classe, COUNT(*) AS nombre_eleves FROM eleves WHERE classe IS NOT NULL GROUP BY classe"
+        with self._connection() as conn:
+            return _dataframe(conn, query, ())
+
+    def get_class_students(self, classe, after, search, limit):
+        filters, params = ["classe = ?"], [classe]
+        if after is not None:
+            filters.append("prenom > ?")
+            params.append(after)
+        if search:
+            filters.append("prenom LIKE ? ESCAPE '\\'")
+            params.append(storage.like_pattern(search))
+        # La page d'élèves est choisie sur idx_eleves_classe_prenom, puis complétée par leurs résumés.
+        query = f"""
+            SELECT e.prenom, s.matiere, s.nombre_lecons, s.somme_scores, s.dernier_date_ts
+            FROM (SELECT id, prenom FROM eleves WHERE {' AND '.join(filters)} ORDER BY prenom LIMIT ?) e
+            LEFT JOIN student_stats s ON s.eleve_id = e.id
+            ORDER BY e.prenom, s.matiere
+        """
+        with self._connection() as conn:
+            return _dataframe(conn, query, (*params, limit))
+
+    def get_class_score_distribution(self, classe):
+        query = """
+            SELECT matiere, score, SUM(nombre) AS nombre
+            FROM (
+                SELECT matiere, score_quiz_1 AS score, COUNT(*) AS nombre
+                FROM lecons
+                WHERE classe = ? AND score_quiz_1 IS NOT NULL
+                GROUP BY matiere, score_quiz_1
+                UNION ALL
+                SELECT matiere, score, nombre FROM scores_archives WHERE classe = ?
+            )
+            GROUP BY matiere, score
+        """
+        with self._connection() as conn:
+            return _dataframe(conn, query, (classe, classe))
+
+    def save_answers(self, answers):
+        if not answers:
+            return 0
+        with self._connection() as conn:
+            eleve_ids = self._student_ids(conn, [answer['eleve'] for answer in answers])
+            with conn:
+                return _save_answers(conn, eleve_ids, answers)
+
+    def save_batch(self, lessons, answer_lists):
+        prenoms = [data['eleve'] for data, _ in lessons] + [a['eleve'] for answers in answer_lists for a in answers]
+        with self._connection() as conn:
+            eleve_ids = self._student_ids(conn, prenoms)
+            with conn:
+                results = [
+                    _save_lesson(conn, eleve_ids[data['eleve']], data, generation_key) if data['eleve'] in eleve_ids else None
+                    for data, generation_key in lessons
+                ]
+                inserted = [_save_answers(conn, eleve_ids, answers) if answers else 0 for answers in answer_lists]
+        return results, inserted
+
+    def get_student_data(self, prenom):
+        with self._connection() as conn:
+            return _dataframe(conn, _STUDENT_DATA_QUERY, (prenom,))
+
+    def get_student_stats(self, prenom):
+        with self._connection() as conn:
+            return _dataframe(conn, _STUDENT_STATS_QUERY, (prenom,))
+
+    def get_top_successes(self, prenom, limit, seuil):
+        with self._connection() as conn:
+            return _dataframe(conn, _TOP_SUCCESSES_QUERY, (prenom, seuil, limit))
+
+    def get_recent_challenges(self, prenom, limit):
+        with self._connection() as conn:
+            return _dataframe(conn, _RECENT_CHALLENGES_QUERY, (prenom, limit))
+
+    def get_concept_mastery(self, prenom):
+        query = """
+            SELECT c.matiere, c.libelle AS concept, m.nb_reussites, m.nb_echecs, m.a_revoir, m.dernier_ts
+            FROM eleve_concept_mastery m JOIN concepts c ON c.id = m.concept_id
+            WHERE m.eleve_id = (SELECT id FROM eleves WHERE prenom = ?)
+            ORDER BY c.matiere, c.libelle
+        """
+        with self._connection() as conn:
+            return _dataframe(conn, query, (prenom,))
+
+    def get_answers(self, classe=None, matiere=None):
+        # Filtres ajoutés seulement s'ils sont donnés : idx_reponses_classe_matiere reste utilisable.
+        filters = [(column, value) for column, value in (("classe", classe), ("matiere", matiere)) if value is not None]
+        where = f"WHERE {' AND '.join(f'{column} = ?' for column, _ in filters)}" if filters else ""
+        query = f"SELECT classe, matiere, tentative, question_cle, option_choisie, correcte FROM reponses {where}"
+        with self._connection() as conn:
+            return _dataframe(conn, query, tuple(value for _, value in filters))
+
+    def get_questions(self, cles):
+        cles = list(cles)
+        with self._connection() as conn:
+            return _dataframe(
+                conn,
+                f"SELECT cle, texte, options, bonne_option FROM questions WHERE cle IN ({', '.join('?' * len(cles))})",
+                cles,
+            )
+
+    def increment_counter(self, cle, pas=1):
+        with self._connection() as conn, conn:
+            increment_counter(conn, cle, pas)
+
+    def get_counter(self, cle):
+        with self._connection() as conn:
+            result = conn.execute("SELECT valeur FROM compteurs WHERE cle = ?", (cle,)).fetchone()
+        return result[0] if result else 0
+
+    def close(self):
+        self.pool.close()
+
+    def delete_tenant_data(self):
+        # Le fichier entier appartient à l'établissement.
+        self.student_ids.clear()
+        with self._connection() as conn, conn:
+            for table in ("lecons_servies", "reponses", "questions", "eleve_concept_mastery", "concepts", "student_stats", "lecons", "eleves",
+                          "compteurs", "lesson_cache", "remediation_concepts", "remediation_cache", "scores_archives"):
+                conn.execute(f"DELETE FROM {table}")
+
+
+# --- Banc d'essai ---
+
+BENCH_STUDENTS = 1000
+BENCH_QUERY = "SELECT classe FROM eleves WHERE prenom = ?"
+
+
+def _per_call_query(db_file, prenom):
+    """Ancien chemin : une connexion ouverte et fermée à chaque requête."""
+    conn = sqlite3.connect(db_file, timeout=10)
+    try:
+        return conn.execute(BENCH_QUERY, (prenom,)).fetchone()
+    finally:
+        conn.close()
+
+
+def _pooled_query(pool, prenom):
+    with pool.connection() as conn:
+        return conn.execute(BENCH_QUERY, (prenom,)).fetchone()
+
+
+def _queries_per_second(query, requests, threads):
+    """Débit de `requests` appels à `query(prenom)` répartis sur `threads` threads."""
+    per_thread = requests // threads
+
+    def worker(offset):
+        for n in range(per_thread):
+            query(f"Élève {(offset + n) % BENCH_STUDENTS:04d}")
+
+    workers = [threading.Thread(target=worker, args=(i * per_thread,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return round(per_thread * threads / (time.perf_counter() - start))
+
+
+def run_pool_bench(db_file, requests, threads):
+    """Requêtes par seconde du pool et du chemin « une connexion par appel », sur 1 et `threads` threads."""
+    pool = open_pool(db_file)
+    with pool.connection() as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO eleves (prenom, classe) VALUES (?, ?)",
+            ((f"Élève {n:04d}", "CM1") for n in range(BENCH_STUDENTS)),
+        )
+    report = {"requetes": requests}
+    for count in sorted({1, threads}):
+        pooled = _queries_per_second(lambda prenom: _pooled_query(pool, prenom), requests, count)
+        per_call = _queries_per_second(lambda prenom: _per_call_query(db_file, prenom), requests, count)
+        report[f"{count}_thread(s)"] = {
+            "pool_par_seconde": pooled, "par_appel_par_seconde": per_call, "gain": round(pooled / per_call, 1),
+        }
+    report["pool"] = pool.stats()
+    pool.close()
+    return report
+
+
+def fill_bench_db(pool, students, lessons, seed=0):
+    """Base fictive : `students` élèves, `lessons` leçons, leur résumé et quelques concepts à revoir."""
+    rng = random.Random(seed)
+    matieres = ("Mathématiques", "Français", "Histoire", "Sciences")
+    now = int(time.time())
+    with pool.connection() as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO eleves (prenom, classe) VALUES (?, ?)",
+            ((f"Élève {n:05d}", "CM1") for n in range(students)),
+        )
+        eleve_ids = [row[0] for row in conn.execute("SELECT id FROM eleves")]
+
+        def rows():
+            for n in range(lessons):
+                date_ts = now - rng.randrange(365 * 86400)
+                yield (rng.choice(eleve_ids), f"banc-{n}", time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(date_ts)),
+                       date_ts, "CM1", rng.choice(matieres), f"Sujet {n % 500}", rng.randint(0, 10))
+        conn.executemany("""
+            INSERT INTO lecons (eleve_id, lesson_uuid, date, date_ts, classe, matiere, sujet, score_quiz_1)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows())
+        conn.execute("""
+            INSERT OR REPLACE INTO student_stats (eleve_id, matiere, nombre_lecons, somme_scores, meilleur_score, dernier_score, dernier_date_ts)
+            SELECT eleve_id, matiere, COUNT(*), SUM(score_quiz_1), MAX(score_quiz_1), MAX(score_quiz_1), MAX(date_ts)
+            FROM lecons GROUP BY eleve_id, matiere
+        """)
+        conn.executemany(
+            "INSERT OR IGNORE INTO concepts (matiere, libelle) VALUES (?, ?)",
+            ((matiere, f"Concept {n}") for matiere in matieres for n in range(20)),
+        )
+        concept_ids = [row[0] for row in conn.execute("SELECT id FROM concepts")]
+        conn.executemany("""
+            INSERT OR IGNORE INTO eleve_concept_mastery (eleve_id, concept_id, nb_reussites, nb_echecs, a_revoir, dernier_ts, dernier_echec_ts)
+            VALUES (?, ?, 0, 1, ?, ?, ?)
+        """, ((eleve_id, concept_id, rng.randint(0, 1), now, now - rng.randrange(86400 * 30))
+              for eleve_id in eleve_ids for concept_id in rng.sample(concept_ids, 10)))
+        conn.execute("ANALYZE")
+
+
+def run_plan_check(db_file, students, lessons):
+    """Plans des requêtes du tableau de bord, sur une base vide puis remplie et analysée."""
+    pool = open_pool(db_file)
+    with pool.connection() as conn:
+        report = {"base_vide": check_query_plans(conn)}
+    fill_bench_db(pool, students, lessons)
+    with pool.connection() as conn:
+        report[f"{lessons}_lecons"] = check_query_plans(conn)
+        report["plans"] = {
+            name: query_plan(conn, query, params) for name, (query, params, _) in DASHBOARD_QUERY_INDEXES.items()
+        }
+    pool.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.sqlite_backend", description="Bancs d'essai de la base SQLite.")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    bench = commands.add_parser("pool", help="Requêtes par seconde : pool contre une connexion par appel.")
+    bench.add_argument("--requetes", type=int, default=20_000)
+    bench.add_argument("--threads", type=int, default=4)
+    plans = commands.add_parser("plans", help="Vérifie que les requêtes du tableau de bord utilisent leurs index.")
+    plans.add_argument("--eleves", type=int, default=1000)
+    plans.add_argument("--lecons", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    # Base jetable, supprimée à la fin.
+    folder = tempfile.mkdtemp(prefix="banc-sqlite-")
+    try:
+        if args.commande == "pool":
+            report = run_pool_bench(Path(folder) / "progress.db", args.requetes, args.threads)
+        else:
+            report = run_plan_check(Path(folder) / "progress.db", args.eleves, args.lecons)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    # Code de sortie non nul si une requête a perdu son index (utilisable en CI).
+    if args.commande == "plans" and (report["base_vide"] or report[f"{args.lecons}_lecons"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
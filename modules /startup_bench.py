@@ -0,0 +1,122 @@
+# modules/startup_bench.py
+"""Banc d'essai du démarrage : temps d'import des modules et premier rerun de chaque page.
+
+Utilisation :
+    python -m modules.startup_bench
+    python -m modules.startup_bench --repetitions 10 --sortie demarrage.json
+
+Chaque mesure est prise dans un nouveau processus Python (démarrage à froid) :
+- import : durée de `import modules.<nom>` après celui de streamlit, et bibliothèques
+  lourdes (pandas, altair, google.generativeai) chargées au passage ;
+- pages : premier rerun de chaque page (streamlit.testing) puis le rerun suivant, et
+  bibliothèques lourdes chargées à la fin du premier rerun.
+
+Les pages tournent sur un établissement jetable (TENANT_ID « banc-demarrage-… »), supprimé
+à la fin ; aucune API n'est appelée (la page Leçon reste à l'étape de configuration).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+PAGES = {
+    "tableau_de_bord": ROOT / "🏠_Tableau_de_Bord.py",
+    "lecon": ROOT / "pages" / "1_🎓_Leçon_du_Jour.py",
+    "metriques": ROOT / "pages" / "2_📈_Métriques.py",
+    "classe": ROOT / "pages" / "3_🏫_Classe.py",
+}
+MODULES = ("class_overview", "database", "gemini_client", "gemini_handler", "lesson_store", "lesson_bank", "metrics",
+           "object_store", "remediation_batcher", "remediation_store", "style_handler")
+HEAVY_LIBRARIES = ("pandas", "altair", "google.generativeai", "pyarrow")
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+import streamlit
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({"duree_s": time.perf_counter() - start,
+                  "lourdes": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+_PAGE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import_s = time.perf_counter() - start
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.secrets["GEMINI_API_KEY"] = "banc-demarrage"
+start = time.perf_counter()
+at.run()
+first_s = time.perf_counter() - start
+heavy = [m for m in sys.argv[2:] if m in sys.modules]
+start = time.perf_counter()
+at.run()
+print(json.dumps({"import_streamlit_s": import_s, "premier_rerun_s": first_s,
+                  "rerun_suivant_s": time.perf_counter() - start, "lourdes": heavy,
+                  "erreurs": [str(e.value) for e in at.exception]}))
+"""
+
+
+def _child(script, args, env):
+    """Lance `script` dans un nouveau processus et retourne la ligne JSON qu'il affiche."""
+    result = subprocess.run(
+        [sys.executable, "-c", script, *args], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "échec sans message")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _median_ms(runs, key):
+    return round(statistics.median(run[key] for run in runs) * 1000, 1)
+
+
+def run_bench(repetitions):
+    env = dict(os.environ, PYTHONPATH=str(ROOT), TENANT_ID=f"banc-demarrage-{uuid.uuid4().hex[:8]}")
+    metrics_folder = tempfile.mkdtemp(prefix="banc-demarrage-")
+    env["METRICS_FILE"] = str(Path(metrics_folder) / "metrics.jsonl")
+    report = {"repetitions": repetitions, "imports": {}, "pages": {}}
+    try:
+        for name in MODULES:
+            runs = [_child(_IMPORT_SCRIPT, [f"modules.{name}", *HEAVY_LIBRARIES], env) for _ in range(repetitions)]
+            report["imports"][name] = {"mediane_ms": _median_ms(runs, "duree_s"), "lourdes": runs[-1]["lourdes"]}
+        for name, page in PAGES.items():
+            runs = [_child(_PAGE_SCRIPT, [str(page), *HEAVY_LIBRARIES], env) for _ in range(repetitions)]
+            report["pages"][name] = {
+                "import_streamlit_ms": _median_ms(runs, "import_streamlit_s"),
+                "premier_rerun_ms": _median_ms(runs, "premier_rerun_s"),
+                "rerun_suivant_ms": _median_ms(runs, "rerun_suivant_s"),
+                "lourdes": runs[-1]["lourdes"],
+                "erreurs": runs[-1]["erreurs"],
+            }
+    finally:
+        from modules import sqlite_backend
+        shutil.rmtree(sqlite_backend.tenant_folder(env["TENANT_ID"]), ignore_errors=True)
+        shutil.rmtree(metrics_folder, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.startup_bench", description="Banc d'essai du démarrage à froid.")
+    parser.add_argument("--repetitions", type=int, default=5, help="Processus lancés par mesure (la médiane est retenue).")
+    parser.add_argument("--sortie", type=Path, default=None, help="Fichier du rapport JSON (sinon : sortie standard).")
+    args = parser.parse_args(argv)
+
+    text = json.dumps(run_bench(args.repetitions), ensure_ascii=False, indent=2)
+    if args.sortie:
+        args.sortie.write_text(text, encoding="utf-8")
+        print(f"Rapport écrit dans {args.sortie}.")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
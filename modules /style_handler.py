@@ -9,66 +9,193 @@ Created on Sat Jun 14 18:51:43 2025
 import streamlit as st
 import os
 import base64
+import shutil
 from pathlib import Path
 
 # On définit le chemin racine du projet pour trouver les assets de manière fiable
 PROJECT_ROOT = Path(__file__).parent.parent
-THEMES = {
-    "Tessnim": PROJECT_ROOT / "assets/themes/tessnim_theme.jpg",
-    "Rayan": PROJECT_ROOT / "assets/themes/rayan_theme.jpg",
+THEMES_DIR = PROJECT_ROOT / "assets/themes"
+
+# Les variantes des thèmes sont servies par Streamlit (server.enableStaticServing,
+# voir .streamlit/config.toml) : le navigateur télécharge l'image une fois et la
+# garde en cache, au lieu de recevoir une data URI base64 à chaque rerun.
+STATIC_THEMES_DIR = PROJECT_ROOT / "static/themes"
+STATIC_THEMES_URL = "app/static/themes"
+
+# Largeurs générées pour chaque thème (écran standard, grand écran).
+DISPLAY_WIDTHS = (1280, 1920)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Signatures des formats d'image acceptés pour les thèmes.
+_MAGIC_NUMBERS = {
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
 }
+THEME_EXTENSIONS = (".png", ".jpg", ".jpeg", ".jfif", ".webp")
+DEFAULT_THEME = "default"
+
+
+def _detect_mime_type(path):
+    """Retourne le type MIME d'après le contenu du fichier (None s'il n'est pas reconnu)."""
+    with open(path, "rb") as f:
+        header = f.read(12)
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, mime_type in _MAGIC_NUMBERS.items():
+        if header.startswith(magic):
+            return mime_type
+    return None
+
+
+def discover_themes():
+    """Trouve les fichiers '<nom>_theme.<ext>' valides dans assets/themes.
+
+    Retourne {nom en minuscules: chemin}. Les fichiers dont le contenu n'est pas
+    une image reconnue (PNG, JPEG/JFIF, WebP) sont ignorés.
+    """
+    themes = {}
+    if not THEMES_DIR.is_dir():
+        return themes
+    for path in sorted(THEMES_DIR.iterdir()):
+        if path.suffix.lower() not in THEME_EXTENSIONS or not path.stem.endswith("_theme"):
+            continue
+        if _detect_mime_type(path) is None:
+            continue
+        themes[path.stem[:-len("_theme")].lower()] = path
+    return themes
+
+
+def _build_variants(name, source):
+    """Génère les variantes WebP et JPEG d'un thème aux largeurs d'affichage.
+
+    Les fichiers déjà à jour ne sont pas regénérés. Sans Pillow, l'original est
+    simplement copié et servi tel quel.
+    """
+    variants = []
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    if Image is None:
+        mime_type = _detect_mime_type(source)
+        ext = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}[mime_type]
+        target = STATIC_THEMES_DIR / f"{name}{ext}"
+        if not target.exists() or target.stat().st_mtime < source.stat().st_mtime:
+            shutil.copyfile(source, target)
+        return [(None, {mime_type: target.name})]
+
+    with Image.open(source) as img:
+        img = img.convert("RGB")
+        for width in DISPLAY_WIDTHS:
+            files = {"image/webp": f"{name}_{width}.webp", "image/jpeg": f"{name}_{width}.jpg"}
+            targets = [STATIC_THEMES_DIR / filename for filename in files.values()]
+            if not all(t.exists() and t.stat().st_mtime >= source.stat().st_mtime for t in targets):
+                resized = img
+                if img.width > width:
+                    resized = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+                resized.save(targets[0], "WEBP", quality=WEBP_QUALITY, method=6)
+                resized.save(targets[1], "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            variants.append((width, files))
+    return variants
+
+
+@st.cache_resource
+def build_theme_assets():
+    """Prépare une seule fois par processus les variantes servies de chaque thème.
+
+    Retourne {nom: [(largeur ou None, {type MIME: nom de fichier})]}.
+    """
+    STATIC_THEMES_DIR.mkdir(parents=True, exist_ok=True)
+    assets = {}
+    for name, source in discover_themes().items():
+        try:
+            assets[name] = _build_variants(name, source)
+        except OSError:
+            continue
+    return assets
+
 
 @st.cache_data
 def get_image_as_base64(path):
     """Charge un fichier image, détecte son type, et le convertit en chaîne Base64."""
     if not os.path.exists(path):
         return None
-    ext = Path(path).suffix.lower()
-    if ext == ".png":
-        mime_type = "image/png"
-    elif ext in [".jpg", ".jpeg"]:
-        mime_type = "image/jpeg"
-    else:
+    mime_type = _detect_mime_type(path)
+    if mime_type is None:
         return None
     with open(path, "rb") as f:
         data = f.read()
     base64_data = base64.b64encode(data).decode()
     return f"data:{mime_type};base64,{base64_data}"
 
-def apply_custom_css(student_name):
-    """Injecte le CSS complet et final pour le fond d'écran et la police."""
-    default_path = PROJECT_ROOT / "assets/themes/default_theme.png" 
-    theme_path = THEMES.get(student_name, default_path)
-    
-    img_base64_uri = get_image_as_base64(theme_path)
-    
-    # On ajoute une couleur de fond au cas où l'image ne se charge pas
-    fallback_background = "background-color: #0e1117;"
-    background_style = f'background-image: url("{img_base64_uri}");' if img_base64_uri else fallback_background
-
-    st.markdown(f"""
+
+def _image_set(files):
+    """Valeur CSS image-set() : WebP en priorité, JPEG/PNG en secours."""
+    order = ("image/webp", "image/jpeg", "image/png")
+    candidates = [f'url("{STATIC_THEMES_URL}/{files[t]}") type("{t}")' for t in order if t in files]
+    return f"image-set({', '.join(candidates)})"
+
+
+def _background_css(student_name):
+    """Règles CSS du fond d'écran pour un élève (URL statiques, sinon data URI en secours)."""
+    name = student_name.lower() if student_name else DEFAULT_THEME
+    try:
+        assets = build_theme_assets()
+    except OSError:
+        assets = {}
+    variants = assets.get(name) or assets.get(DEFAULT_THEME)
+    if variants:
+        # Première image : repli pour les navigateurs sans image-set().
+        first_files = variants[0][1]
+        fallback = first_files.get("image/jpeg") or first_files.get("image/png") or next(iter(first_files.values()))
+        rules = [
+            f'[data-testid="stAppViewContainer"] {{ background-image: url("{STATIC_THEMES_URL}/{fallback}"); '
+            f'background-image: {_image_set(first_files)}; }}'
+        ]
+        for previous, (width, files) in zip(variants, variants[1:]):
+            rules.append(
+                f'@media (min-width: {previous[0] + 1}px) {{ [data-testid="stAppViewContainer"] '
+                f'{{ background-image: {_image_set(files)}; }} }}'
+            )
+        return "\n".join(rules)
+
+    # Secours si les fichiers statiques n'ont pas pu être préparés.
+    source = discover_themes().get(name)
+    img_base64_uri = get_image_as_base64(source) if source else None
+    if img_base64_uri:
+        return f'[data-testid="stAppViewContainer"] {{ background-image: url("{img_base64_uri}"); }}'
+    return ""
+
+
+@st.cache_data
+def get_custom_css(student_name):
+    """Construit (une fois par élève) le bloc <style> complet : fond d'écran et police."""
+    return f"""
         <style>
         /* 1. Fond d'écran et surcouche sombre (avec sélecteur puissant) */
         [data-testid="stAppViewContainer"] {{
-            {background_style}
+            background-color: #0e1117; /* au cas où l'image ne se charge pas */
             background-size: cover;
             background-position: center;
             background-repeat: no-repeat;
             background-attachment: fixed;
         }}
+        {_background_css(student_name)}
         .main::before {{
             content: '';
             position: absolute;
             top: 0; left: 0; right: 0; bottom: 0;
             background-color: rgba(14, 17, 23, 0.6); /* Noir Streamlit avec 60% d'opacité */
-            z-index: 0; 
+            z-index: 0;
         }}
         /* S'assurer que le contenu est devant la surcouche */
         [data-testid="stVerticalBlock"] {{
             position: relative;
             z-index: 1;
         }}
-        
+
         /* 2. Règles complètes et robustes pour la police */
         html, body, [class*="st-"] {{ font-size: 18px !important; }}
         h1 {{ font-size: 2.8rem !important; }}
@@ -81,4 +208,23 @@ def apply_custom_css(student_name):
         [data-testid="stMetricValue"] {{ font-size: 3rem !important; }}
         [data-testid="stMetricLabel"] {{ font-size: 1.2rem !important; }}
         </style>
-    """, unsafe_allow_html=True)
+    """
+
+
+def apply_custom_css(student_name):
+    """Injecte le CSS complet et final pour le fond d'écran et la police.
+
+    Streamlit retire à chaque rerun les éléments qui ne sont pas ré-émis : le bloc
+    <style> doit donc être envoyé à chaque fois, mais il ne contient plus que des
+    URL (quelques Ko) au lieu de l'image encodée en base64.
+    """
+    st.markdown(get_custom_css(student_name), unsafe_allow_html=True)
+
+
+def css_payload_report(student_name):
+    """Taille en octets du CSS envoyé à chaque rerun : avec URL statiques et avec data URI base64."""
+    name = student_name.lower() if student_name else DEFAULT_THEME
+    source = discover_themes().get(name)
+    inline_bytes = len(get_image_as_base64(source) or "") if source else 0
+    static_bytes = len(get_custom_css(student_name).encode("utf-8"))
+    return {"static": static_bytes, "inline_base64": static_bytes + inline_bytes}
@@ -0,0 +1,27 @@
+# modules/task_runner.py
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+# Nombre d'appels lancés en arrière-plan en même temps, toutes sessions confondues.
+MAX_WORKERS = 4
+
+
+@st.cache_resource
+def _get_executor():
+    """Pool de threads unique pour tout le processus."""
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="lecon-du-jour")
+
+
+def submit(fn, *args, **kwargs):
+    """Lance `fn(*args, **kwargs)` en arrière-plan et retourne le Future correspondant."""
+    return _get_executor().submit(fn, *args, **kwargs)
+
+
+def result_or_none(future, timeout=None):
+    """Attend le résultat d'un Future ; retourne None s'il a échoué ou n'est pas prêt à temps."""
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=timeout)
+    except Exception:
+        return None
@@ -0,0 +1,317 @@
+# modules/write_queue.py
+"""File d'écriture différée des résultats de leçon et des réponses aux quiz.
+
+Sans elle, chaque page Résumé fait son propre INSERT + COMMIT, et SQLite n'accepte
+qu'un écrivain à la fois : sous charge, les sessions font la queue derrière le verrou
+d'écriture. Ici, la page dépose son écriture dans une file bornée ; un seul thread
+écrivain vide la file et enregistre tout ce qui attend dans une seule transaction
+(« group commit »). Pendant qu'un lot est validé, le suivant s'accumule.
+
+Durabilité (.streamlit/secrets.toml ou variable d'environnement) :
+    WRITE_DURABILITY = "sync"     # défaut : chaque écriture dans sa propre transaction
+    WRITE_DURABILITY = "groupe"   # écritures simultanées validées ensemble
+
+Dans les deux modes, la page n'annonce une sauvegarde qu'une fois la transaction
+validée. En mode « groupe », elle attend au plus ACK_TIMEOUT_SECONDS : au-delà, la
+sauvegarde est signalée comme non confirmée et refaite au rerun suivant (sans doublon,
+grâce à lesson_uuid). File pleine : la page attend qu'une place se libère.
+
+Banc d'essai (N écrivains simultanés, débit de transactions et latence d'enregistrement) :
+    python -m modules.write_queue --ecrivains 50 --lecons 20
+"""
+import argparse
+import atexit
+import json
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from modules import storage
+from modules.storage import StorageError
+
+DURABILITY_SYNC = "sync"
+DURABILITY_GROUP = "groupe"
+
+# Écritures en attente au maximum, et écritures au maximum par transaction.
+MAX_PENDING = 2000
+MAX_BATCH = 200
+# Attente maximale, par la page, de la validation de son écriture.
+ACK_TIMEOUT_SECONDS = 5.0
+# Latences gardées pour les percentiles (les plus récentes).
+LATENCY_SAMPLES = 5000
+
+_STOP = object()
+
+
+def durability():
+    """Mode de durabilité configuré (WRITE_DURABILITY), « sync » par défaut."""
+    mode = storage.setting("WRITE_DURABILITY") or DURABILITY_SYNC
+    if mode not in (DURABILITY_SYNC, DURABILITY_GROUP):
+        raise StorageError(f"WRITE_DURABILITY invalide : {mode!r} ('{DURABILITY_SYNC}' ou '{DURABILITY_GROUP}').")
+    return mode
+
+
+class WriteQueue:
+    """File bornée vidée par un thread écrivain, une transaction par lot."""
+
+    def __init__(self, backend, max_pending=MAX_PENDING, max_batch=MAX_BATCH):
+        self.backend = backend
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {"ecritures": 0, "transactions": 0, "file_pleine": 0, "echecs": 0, "eleves_inconnus": 0}
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit_lesson(self, data, generation_key):
+        """Dépose une leçon terminée ; le Future reçoit le résultat de save_lesson_result."""
+        return self._submit("lecon", (data, generation_key))
+
+    def submit_answers(self, answers):
+        """Dépose les réponses d'un quiz ; le Future reçoit le nombre de ces réponses insérées."""
+        return self._submit("reponses", answers)
+
+    def _submit(self, kind, payload):
+        if self._closed:
+            raise StorageError("La file d'écriture est fermée.")
+        future = Future()
+        item = (kind, payload, future, time.perf_counter())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count(file_pleine=1)
+            self._queue.put(item)
+        return future
+
+    def _run(self):
+        stopping = False
+        while True:
+            try:
+                # Arrêt demandé : on ne fait plus que vider ce qui reste dans la file.
+                item = self._queue.get(block=not stopping)
+            except queue.Empty:
+                return
+            # Tout ce qui est arrivé pendant la transaction précédente part dans celle-ci.
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                else:
+                    batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        lessons = [(payload, future) for kind, payload, future, _ in batch if kind == "lecon"]
+        answers = [(payload, future) for kind, payload, future, _ in batch if kind == "reponses"]
+        try:
+            results, inserted = self.backend.save_batch([payload for payload, _ in lessons], [payload for payload, _ in answers])
+        except Exception:
+            # Une écriture invalide (ou une erreur inattendue du moteur) ne doit ni faire perdre
+            # les autres ni arrêter le thread écrivain : chacune est rejouée seule.
+            self._write_one_by_one(lessons, answers)
+        else:
+            self._count(transactions=1)
+            for (_, future), result in zip(lessons, results):
+                future.set_result(result)
+            for (_, future), count in zip(answers, inserted):
+                future.set_result(count)
+            self._count(eleves_inconnus=sum(result is None for result in results))
+        done = time.perf_counter()
+        with self._lock:
+            self.counters["ecritures"] += len(batch)
+            self._latencies.extend(done - submitted_at for _, _, _, submitted_at in batch)
+
+    def _write_one_by_one(self, lessons, answers):
+        writes = [(self.backend.save_lesson_result, payload, future) for payload, future in lessons]
+        writes += [(self.backend.save_answers, (payload,), future) for payload, future in answers]
+        for save, args, future in writes:
+            try:
+                future.set_result(save(*args))
+                self._count(transactions=1)
+            except Exception as e:
+                if not isinstance(e, StorageError):
+                    # Les appelants ne rattrapent que StorageError (voir database.save_lesson_result).
+                    cause, e = e, StorageError(f"écriture refusée : {e!r}")
+                    e.__cause__ = cause
+                future.set_exception(e)
+                self._count(echecs=1)
+                with self._lock:
+                    self.last_error = str(e)
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def flush(self):
+        """Attend que toutes les écritures déjà déposées soient enregistrées."""
+        self._queue.join()
+
+    def close(self):
+        """Enregistre ce qui reste dans la file puis arrête le thread écrivain."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """Écritures, transactions, écritures par transaction, file et latence d'enregistrement."""
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+            last_error = self.last_error
+        transactions = counters["transactions"]
+        return dict(
+            counters,
+            en_attente=self._queue.qsize(),
+            par_transaction=counters["ecritures"] / transactions if transactions else 0.0,
+            p50_ms=storage._percentile(latencies, 0.5) * 1000 if latencies else None,
+            p99_ms=storage._percentile(latencies, 0.99) * 1000 if latencies else None,
+            derniere_erreur=last_error,
+        )
+
+
+def wait(future, timeout=ACK_TIMEOUT_SECONDS):
+    """Résultat d'une écriture déposée ; StorageError si elle a échoué ou n'est pas validée à temps."""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError as e:
+        raise StorageError(f"écriture non confirmée après {timeout:.0f} s") from e
+
+
+def start(backend):
+    """File d'écriture de `backend`, vidée automatiquement à l'arrêt du processus."""
+    write_queue = WriteQueue(backend)
+    atexit.register(write_queue.close)
+    return write_queue
+
+
+# --- Banc d'essai ---
+
+def _writer(save, numero, lessons, latencies, errors, lock):
+    """Un écrivain : enregistre `lessons` leçons (et leurs réponses) d'un élève."""
+    prenom = f"Eleve-{numero:03d}"
+    local = []
+    for i in range(lessons):
+        lesson_uuid = str(uuid.uuid4())
+        data = {
+            "eleve": prenom, "lesson_uuid": lesson_uuid,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), "date_ts": int(time.time()),
+            "classe": "CM1", "matiere": ("Mathématiques", "Français", "Histoire")[i % 3],
+            "sujet": f"Sujet {i}", "score_quiz_1": i % 11, "score_quiz_2": None,
+            "appreciation_ia": "Bravo !", "points_a_revoir": "" if i % 2 else "Les fractions",
+        }
+        answers = [{
+            "eleve": prenom, "lesson_uuid": lesson_uuid, "quiz": 1, "numero": q, "classe": "CM1",
+            "matiere": data["matiere"], "question_cle": storage.question_key(f"Question {q}", ("A", "B"), "A"),
+            "question": f"Question {q}", "options": ("A", "B"), "bonne_option": 0, "option_choisie": q % 2,
+            "correcte": q % 2 == 0, "concept": None, "duree_quiz_ms": 30000, "repondu_ts": data["date_ts"],
+        } for q in range(10)]
+        start_time = time.perf_counter()
+        try:
+            save(data, answers)
+        except StorageError as e:
+            with lock:
+                errors.append(str(e))
+        local.append(time.perf_counter() - start_time)
+    with lock:
+        latencies.extend(local)
+
+
+def run_bench(backend, mode, writers, lessons):
+    """`writers` écrivains simultanés ; latence vue par la page et transactions validées par seconde."""
+    generation_key = "generation:banc"
+    write_queue = WriteQueue(backend) if mode == DURABILITY_GROUP else None
+    if write_queue is None:
+        def save(data, answers):
+            backend.save_answers(answers)
+            backend.save_lesson_result(data, generation_key)
+    else:
+        # Comme la page : les deux écritures partent dans la file, puis on attend leur validation.
+        def save(data, answers):
+            futures = [write_queue.submit_answers(answers), write_queue.submit_lesson(data, generation_key)]
+            for future in futures:
+                wait(future)
+
+    for n in range(writers):
+        backend.add_student(f"Eleve-{n:03d}", "CM1", "generation:liste_eleves")
+    commits_before = backend.get_counter(generation_key)
+    latencies, errors, lock = [], [], threading.Lock()
+    threads = [threading.Thread(target=_writer, args=(save, n, lessons, latencies, errors, lock)) for n in range(writers)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if write_queue is not None:
+        write_queue.flush()
+    elapsed = time.perf_counter() - start_time
+    saved = backend.get_counter(generation_key) - commits_before
+    result = {
+        "mode": mode, "moteur": backend.name, "ecrivains": writers, "duree_s": round(elapsed, 2),
+        "lecons_enregistrees": saved, "lecons_par_seconde": round(saved / elapsed, 1) if elapsed else 0.0,
+        "sauvegarde_p50_ms": round(storage._percentile(latencies, 0.5) * 1000, 2),
+        "sauvegarde_p99_ms": round(storage._percentile(latencies, 0.99) * 1000, 2),
+        "erreurs": len(errors),
+    }
+    if write_queue is None:
+        # Deux transactions par leçon : les réponses, puis la leçon.
+        result["transactions_par_seconde"] = round(2 * saved / elapsed, 1) if elapsed else 0.0
+    else:
+        write_queue.close()
+        stats = write_queue.stats()
+        result["transactions_par_seconde"] = round(stats["transactions"] / elapsed, 1) if elapsed else 0.0
+        result["ecritures_par_transaction"] = round(stats["par_transaction"], 1)
+        result["enregistrement_p99_ms"] = round(stats["p99_ms"], 1)
+    if errors:
+        result["premiere_erreur"] = errors[0]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.write_queue", description="Banc d'essai de la file d'écriture.")
+    parser.add_argument("--ecrivains", type=int, default=50, help="Écrivains simultanés.")
+    parser.add_argument("--lecons", type=int, default=20, help="Leçons enregistrées par écrivain.")
+    parser.add_argument("--mode", choices=(DURABILITY_SYNC, DURABILITY_GROUP), default=None,
+                        help="Un seul mode (par défaut : les deux, pour comparer).")
+    args = parser.parse_args(argv)
+
+    from modules import sqlite_backend
+    # Chaque mode travaille sur une base SQLite jetable, supprimée à la fin.
+    folder = tempfile.mkdtemp(prefix="banc-ecriture-")
+    try:
+        for mode in [args.mode] if args.mode else [DURABILITY_SYNC, DURABILITY_GROUP]:
+            backend = sqlite_backend.SQLiteBackend(sqlite_backend.open_pool(Path(folder) / f"{mode}.db"))
+            try:
+                print(json.dumps(run_bench(backend, mode, args.ecrivains, args.lecons), ensure_ascii=False, indent=2))
+            finally:
+                backend.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
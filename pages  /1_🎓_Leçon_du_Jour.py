@@ -6,23 +6,32 @@
 import streamlit as st
 import time
 from datetime import datetime
-from modules import gemini_handler, database
-from modules import style_handler
+from modules import gemini_handler, gemini_client, database
+from modules import style_handler, task_runner, lesson_store, lesson_bank, metrics, model_routing, remediation_store, object_store
+from modules import storage
+from modules import appreciation as appreciation_templates
+from modules.constants import ALL_CLASSES, MATIERES
 from pathlib import Path
 import random
+import uuid
 # --- Configuration de la Page et de l'API ---
 st.set_page_config(page_title="Leçon du Jour", page_icon="🎓", layout="centered")
 
 if 'GEMINI_API_KEY' not in st.secrets:
     st.error("❌ Clé API Gemini non trouvée !")
     st.stop()
-gemini_handler.configure_gemini()
+# L'API Gemini est configurée au premier appel (gemini_client) : l'étape de configuration
+# s'affiche sans charger google.generativeai.
 
-ALL_CLASSES = ("CP", "CE1", "CE2", "CM1", "CM2", "6ème", "5ème", "4ème", "3ème", "Seconde")
+# Pendant la lecture d'une leçon, on prépare déjà la suivante (même classe, même matière).
+PREFETCH_NEXT_LESSON = True
+# Attente maximale de l'appréciation préparée en arrière-plan avant de se rabattre
+# sur le texte des modèles de phrases, instantané.
+APPRECIATION_WAIT_SECONDS = 3
 
 # --- Fonctions Utilitaires ---
 def reset_lesson_state():
-    keys_to_delete = ['lesson_stage', 'sujet', 'lesson_content', 'quiz_1_data', 'quiz_2_data', 'remediation_content', 'answers', 'score_quiz_1', 'score_quiz_2', 'failed_concepts']
+    keys_to_delete = ['lesson_stage', 'lesson_uuid', 'sujet', 'lesson_content_id', 'quiz_1_id', 'quiz_1_order', 'quiz_2_id', 'quiz_2_order', 'remediation_content_id', 'answers', 'quiz_1_form_debut', 'quiz_2_form_debut', 'quiz_duration_ms', 'score_quiz_1', 'score_quiz_2', 'failed_concepts', 'concept_results', 'appreciation', 'appreciation_future', 'saved_lesson_uuid']
     for key in keys_to_delete:
         if key in st.session_state:
             del st.session_state[key]
@@ -36,6 +45,66 @@ def display_session_header():
             with col2: st.markdown(f"🏫 **Classe :** {st.session_state.classe}")
             with col3: st.markdown(f"📚 **Matière :** {st.session_state.matiere}")
 
+def stored_quiz(name):
+    """Questions du quiz `name` (magasin partagé) et ordre des options tiré pour cette session."""
+    return object_store.get(st.session_state.get(f'{name}_id')), st.session_state.get(f'{name}_order')
+
+def store_quiz(name, quiz_data):
+    """Range le quiz dans le magasin partagé ; la session ne garde que sa référence et son ordre."""
+    quiz = object_store.compact_quiz(quiz_data)
+    st.session_state[f'{name}_id'] = object_store.put(quiz)
+    st.session_state[f'{name}_order'] = object_store.shuffled_order(quiz)
+
+def answer_log(quiz_number, quiz, answers, correct):
+    """Réponses du quiz pour le journal `reponses` (indices des options dans l'ordre d'origine)."""
+    now = int(time.time())
+    rows = []
+    for i, q in enumerate(quiz):
+        rows.append({
+            "eleve": st.session_state.eleve, "lesson_uuid": st.session_state.lesson_uuid,
+            "quiz": quiz_number, "numero": i, "classe": st.session_state.classe, "matiere": st.session_state.matiere,
+            "question_cle": storage.question_key(q.question, q.options, q.correct_answer),
+            "question": q.question, "options": q.options,
+            "bonne_option": q.options.index(q.correct_answer) if q.correct_answer in q.options else None,
+            "option_choisie": q.options.index(str(answers[i])), "correcte": correct[i], "concept": q.concept,
+            "duree_quiz_ms": st.session_state.get('quiz_duration_ms'), "repondu_ts": now,
+        })
+    return rows
+
+def display_expired():
+    """Le contenu de la leçon n'est plus disponible (session abandonnée trop longtemps)."""
+    st.warning("Cette leçon a expiré. On en prépare une nouvelle ?")
+    if st.button("Retourner à la configuration"):
+        reset_lesson_state()
+        st.rerun()
+
+def appreciation_args():
+    """Arguments de generate_appreciation pour la leçon en cours."""
+    if 'score_quiz_2' in st.session_state:
+        return (st.session_state.score_quiz_2, 5, st.session_state.sujet), {'a_ete_remedie': True}
+    return (st.session_state.score_quiz_1, 10, st.session_state.sujet), {}
+
+def prefetch_appreciation():
+    """Lance l'appréciation en arrière-plan dès que le score final est connu."""
+    if 'appreciation_future' not in st.session_state:
+        args, kwargs = appreciation_args()
+        st.session_state.appreciation_future = task_runner.submit(gemini_handler.generate_appreciation, *args, **kwargs)
+
+def prefetch_next_lesson():
+    """Prépare en arrière-plan la prochaine leçon probable pendant que l'élève lit."""
+    if PREFETCH_NEXT_LESSON and 'next_lesson_future' not in st.session_state:
+        classe, matiere = st.session_state.classe, st.session_state.matiere
+        st.session_state.next_lesson_key = (classe, matiere)
+        st.session_state.next_lesson_future = task_runner.submit(lesson_store.get_or_generate_lesson, st.session_state.eleve, classe, matiere)
+
+def take_prefetched_lesson(classe, matiere):
+    """Retourne la leçon préparée en arrière-plan si elle correspond à la demande, sinon None."""
+    future = st.session_state.pop('next_lesson_future', None)
+    key = st.session_state.pop('next_lesson_key', None)
+    if future is None or key != (classe, matiere):
+        return None
+    return task_runner.result_or_none(future)
+
 # --- Machine à États : Fonctions pour chaque étape ---
 def display_config():
     if 'eleve' in st.session_state:
@@ -54,7 +123,7 @@ def display_config():
     default_index = ALL_CLASSES.index(default_class) if default_class in ALL_CLASSES else 3
     st.session_state.classe = st.selectbox("Ta classe :", ALL_CLASSES, index=default_index)
     
-    st.session_state.matiere = st.selectbox("Matière du jour :", ("Mathématiques", "Français", "Histoire", "Sciences", "Anglais", "Allemand", "Surprise !"))
+    st.session_state.matiere = st.selectbox("Matière du jour :", MATIERES)
     if st.button("🚀 C'est parti !", type="primary", use_container_width=True):
         st.session_state.lesson_stage = 'generating_lesson'
         st.rerun()
@@ -63,20 +132,62 @@ def display_config():
 # (display_generating_lesson, display_lesson, display_quiz, etc.)
 # Je le recopie pour que vous ayez la version complète à copier/coller.
 
+def stream_lesson(classe, matiere):
+    """Génère la leçon en streaming : le sujet et le texte s'affichent au fur et à mesure."""
+    status = st.empty()
+    status.info("Ton professeur IA prépare une leçon sur mesure...")
+    title, body = st.empty(), st.empty()
+    start = time.perf_counter()
+    first_content_seen = False
+    try:
+        for field, value in gemini_handler.stream_lesson_and_quiz(classe, matiere):
+            if not first_content_seen and field in ('sujet', 'lecon_markdown'):
+                first_content_seen = True
+                status.empty()
+                lesson_store.record_time_to_first_content(time.perf_counter() - start)
+            if field == 'sujet':
+                title.header(f"Leçon : {value}")
+            elif field == 'lecon_markdown':
+                body.markdown(value)
+            elif field == 'resultat':
+                prompt = gemini_handler.build_lesson_prompt(classe, matiere)
+                value['cle_cache'] = lesson_store.store_lesson(classe, matiere, value, prompt)
+                return value
+    except gemini_client.GeminiUnavailableError:
+        # Pas de message d'erreur : display_generating_lesson se rabat sur la banque de leçons.
+        status.empty()
+    except gemini_handler.InvalidResponseError as e:
+        st.error(str(e))
+        st.code(e.raw_text)
+    except Exception as e:
+        st.error(f"Erreur API lors de la génération de la leçon : {e}")
+    return None
+
 def display_generating_lesson():
     style_handler.apply_custom_css(st.session_state.eleve)
     display_session_header()
     with st.spinner("Ton professeur IA prépare une leçon sur mesure..."):
-        response = gemini_handler.generate_lesson_and_quiz(st.session_state.classe, st.session_state.matiere)
+        response = take_prefetched_lesson(st.session_state.classe, st.session_state.matiere)
+        if response is None:
+            # Servie instantanément depuis le cache de leçons si possible.
+            response = lesson_store.get_cached_lesson(st.session_state.eleve, st.session_state.classe, st.session_state.matiere)
+    if response is None:
+        response = stream_lesson(st.session_state.classe, st.session_state.matiere)
+    if response is None:
+        # API indisponible ou réponse inexploitable : une leçon déjà générée vaut mieux qu'une erreur.
+        response = lesson_store.fallback_lesson(st.session_state.eleve, st.session_state.classe, st.session_state.matiere)
+        if response is not None:
+            st.info("L'IA est très sollicitée en ce moment : voici une leçon de notre banque.")
     if response and 'sujet' in response:
+        lesson_store.mark_served(st.session_state.eleve, response.get('cle_cache'))
+        # La banque de leçons de cette case est complétée en arrière-plan, d'après ce que l'élève n'a pas encore eu.
+        task_runner.submit(lesson_bank.refill_cell, st.session_state.classe, st.session_state.matiere, st.session_state.eleve)
+        # Clé d'idempotence : la leçon n'est enregistrée qu'une fois, même après plusieurs reruns.
+        st.session_state.lesson_uuid = str(uuid.uuid4())
         st.session_state.sujet = response.get('sujet')
-        st.session_state.lesson_content = response.get('lecon_markdown')
-        quiz_data = response.get('quiz_10_questions')
-        if quiz_data:
-            for q in quiz_data:
-                if isinstance(q.get('options'), list):
-                    random.shuffle(q['options'])
-        st.session_state.quiz_1_data = quiz_data
+        # Le texte et le quiz sont partagés entre sessions : la session n'en garde que les références.
+        st.session_state.lesson_content_id = object_store.put(response.get('lecon_markdown'))
+        store_quiz('quiz_1', response.get('quiz_10_questions'))
         st.session_state.lesson_stage = 'display_lesson'
         st.rerun()
     else:
@@ -88,7 +199,12 @@ def display_generating_lesson():
 def display_lesson():
     style_handler.apply_custom_css(st.session_state.eleve)
     display_session_header()
+    lesson_content = object_store.get(st.session_state.get('lesson_content_id'))
+    if lesson_content is None:
+        display_expired()
+        return
     st.header(f"Leçon : {st.session_state.sujet}")
+    prefetch_next_lesson()
     illustration_dir = Path("assets/illustrations")
     if illustration_dir.exists() and any(f.is_file() for f in illustration_dir.iterdir()):
         illustrations = [f for f in illustration_dir.iterdir() if f.is_file() and not f.name.startswith('.')]
@@ -96,46 +212,61 @@ def display_lesson():
             random_image_path = random.choice(illustrations)
             st.image(str(random_image_path), use_column_width=True)
             st.markdown("---")
-    st.markdown(st.session_state.lesson_content)
+    st.markdown(lesson_content)
     st.markdown("---")
     if st.button("J'ai tout lu, je suis prêt pour le quiz !", use_container_width=True):
         st.session_state.lesson_stage = 'quiz_1'
         st.rerun()
 
-def display_quiz(quiz_key, quiz_data, next_stage):
+def display_quiz(quiz_key, quiz, order, next_stage):
     style_handler.apply_custom_css(st.session_state.eleve)
     display_session_header()
+    if quiz is None:
+        display_expired()
+        return
     st.header("📝 Quiz - Testons tes connaissances !")
     st.info("Tu dois répondre à toutes les questions pour valider.")
+    # Le formulaire n'envoie rien avant la validation : on mesure la durée du quiz entier.
+    started = st.session_state.setdefault(f'{quiz_key}_debut', time.time())
     with st.form(key=quiz_key):
         answers = {}
-        for i, q in enumerate(quiz_data):
-            string_options = [str(opt) for opt in q['options']]
-            answers[i] = st.radio(f"**Question {i+1}:** {q['question']}", string_options, key=f"{quiz_key}_{i}", index=None)
+        for i, q in enumerate(quiz):
+            answers[i] = st.radio(f"**Question {i+1}:** {q.question}", q.ordered_options(order[i]), key=f"{quiz_key}_{i}", index=None)
         submitted = st.form_submit_button("J'ai fini, voir ma note !")
         if submitted:
             if None in answers.values():
                 st.error("Attention ! Tu dois répondre à toutes les questions avant de valider.")
             else:
                 st.session_state.answers = answers
+                st.session_state.quiz_duration_ms = round((time.time() - started) * 1000)
                 st.session_state.lesson_stage = next_stage
                 st.rerun()
 
-def evaluate_quiz(quiz_data, score_key, success_stage, fail_stage, threshold):
+def evaluate_quiz(quiz, quiz_number, score_key, success_stage, fail_stage, threshold):
     style_handler.apply_custom_css(st.session_state.eleve)
     display_session_header()
+    if quiz is None:
+        display_expired()
+        return
     score = 0
-    failed_concepts = []
-    for i, q in enumerate(quiz_data):
-        selected_answer_str = str(st.session_state.answers[i])
-        correct_answer_str = str(q['correct_answer'])
-        if selected_answer_str == correct_answer_str:
+    concept_results = {}
+    results = []
+    for i, q in enumerate(quiz):
+        correct = str(st.session_state.answers[i]) == q.correct_answer
+        results.append(correct)
+        if correct:
             score += 1
-        elif 'concept' in q:
-            failed_concepts.append(q['concept'])
+        if q.concept is not None:
+            # Un concept n'est réussi que si toutes ses questions le sont.
+            concept_results[q.concept] = concept_results.get(q.concept, True) and correct
     st.session_state[score_key] = score
-    st.session_state.failed_concepts = list(set(failed_concepts))
-    st.header(f"Résultat : {score}/{len(quiz_data)}")
+    # Chaque réponse rejoint le journal (analyse des questions) ; un rerun ne la duplique pas.
+    database.save_answers(answer_log(quiz_number, quiz, st.session_state.answers, results))
+    if concept_results:
+        # Le quiz de remédiation n'a pas de concepts : ceux du 1er quiz restent les points à revoir.
+        st.session_state.concept_results = concept_results
+        st.session_state.failed_concepts = [concept for concept, ok in concept_results.items() if not ok]
+    st.header(f"Résultat : {score}/{len(quiz)}")
     if score >= threshold:
         st.balloons()
         st.success("Bravo, c'est une excellente note !")
@@ -143,6 +274,8 @@ def evaluate_quiz(quiz_data, score_key, success_stage, fail_stage, threshold):
     else:
         st.warning("Ce n'est pas grave ! On va revoir ensemble les points qui ont posé problème.")
         st.session_state.lesson_stage = fail_stage
+    if st.session_state.lesson_stage == 'summary':
+        prefetch_appreciation()
     if st.button("Continuer"):
         st.rerun()
 
@@ -150,17 +283,20 @@ def display_remediation():
     style_handler.apply_custom_css(st.session_state.eleve)
     display_session_header()
     st.header("🧐 On fait le point")
-    with st.spinner("L'IA prépare une explication juste pour toi..."):
-        response = gemini_handler.generate_remediation_and_quiz(st.session_state.classe, st.session_state.failed_concepts)
-    if response and 'remediation_markdown' in response:
-        st.session_state.remediation_content = response.get('remediation_markdown')
-        quiz_data_2 = response.get('quiz_5_questions')
-        if quiz_data_2:
-            for q in quiz_data_2:
-                if isinstance(q.get('options'), list):
-                    random.shuffle(q['options'])
-        st.session_state.quiz_2_data = quiz_data_2
-        st.markdown(st.session_state.remediation_content)
+    # La remédiation n'est générée qu'une fois : les reruns suivants réutilisent la session.
+    if 'remediation_content_id' not in st.session_state:
+        with st.spinner("L'IA prépare une explication juste pour toi..."):
+            # Servie par le cache de remédiations si possible, sinon regroupée avec les
+            # demandes simultanées des autres élèves de la classe.
+            response = gemini_handler.generate_remediation_and_quiz(
+                st.session_state.classe, st.session_state.failed_concepts, request=remediation_store.request
+            )
+        if response and 'remediation_markdown' in response:
+            store_quiz('quiz_2', response.get('quiz_5_questions'))
+            st.session_state.remediation_content_id = object_store.put(response.get('remediation_markdown'))
+    remediation_content = object_store.get(st.session_state.get('remediation_content_id'))
+    if remediation_content:
+        st.markdown(remediation_content)
         if st.button("OK, j'ai compris, au 2ème quiz !", use_container_width=True):
             st.session_state.lesson_stage = 'quiz_2'
             st.rerun()
@@ -176,31 +312,49 @@ def display_summary():
     st.header("🎉 Leçon terminée !")
     score_1 = st.session_state.score_quiz_1
     a_ete_remedie = 'score_quiz_2' in st.session_state
-    with st.spinner("Ton coach IA rédige son appréciation..."):
-        if a_ete_remedie:
-            score_2 = st.session_state.score_quiz_2
-            st.info(f"Score au 1er quiz : {score_1}/10")
-            st.info(f"Score au 2ème quiz : {score_2}/5")
-            appreciation = gemini_handler.generate_appreciation(score_2, 5, st.session_state.sujet, a_ete_remedie=True)
-        else:
-            st.info(f"Score final : {score_1}/10")
-            appreciation = gemini_handler.generate_appreciation(score_1, 10, st.session_state.sujet)
+    if a_ete_remedie:
+        score_2 = st.session_state.score_quiz_2
+        st.info(f"Score au 1er quiz : {score_1}/10")
+        st.info(f"Score au 2ème quiz : {score_2}/5")
+    else:
+        st.info(f"Score final : {score_1}/10")
+    # L'appréciation n'est demandée qu'une fois par leçon.
+    if 'appreciation' not in st.session_state:
+        with st.spinner("Ton coach IA rédige son appréciation..."):
+            # En général déjà prête : elle a été lancée dès le calcul du score.
+            future = st.session_state.get('appreciation_future')
+            appreciation = task_runner.result_or_none(future, timeout=APPRECIATION_WAIT_SECONDS)
+            if appreciation is None:
+                args, kwargs = appreciation_args()
+                if future is None:
+                    appreciation = gemini_handler.generate_appreciation(*args, **kwargs)
+                else:
+                    # L'IA tarde ou a échoué : on ne relance pas un second appel.
+                    appreciation = appreciation_templates.template_appreciation(*args, **kwargs)
+            st.session_state.appreciation = appreciation
+    appreciation = st.session_state.appreciation
     st.markdown("---")
     st.subheader("L'avis de ton coach IA :")
     st.markdown(f"> *{appreciation}*")
     st.markdown("---")
-    points_a_revoir = ''
+    concepts_a_revoir = []
     if a_ete_remedie and st.session_state.score_quiz_2 < 3:
-        points_a_revoir = ", ".join(st.session_state.failed_concepts)
+        concepts_a_revoir = st.session_state.failed_concepts
     db_data = {
+        "lesson_uuid": st.session_state.lesson_uuid,
         "eleve": st.session_state.eleve, "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "classe": st.session_state.classe, "matiere": st.session_state.matiere,
         "sujet": st.session_state.sujet, "score_quiz_1": score_1,
-        "score_quiz_2": st.session_state.get('score_quiz_2'), "points_a_revoir": points_a_revoir,
-        "appreciation_ia": appreciation
+        "score_quiz_2": st.session_state.get('score_quiz_2'), "points_a_revoir": ", ".join(concepts_a_revoir),
+        "appreciation_ia": appreciation,
+        # Maîtrise par concept (eleve_concept_mastery) : résultat au 1er quiz et concepts à revoir.
+        "concepts": st.session_state.get('concept_results', {}), "concepts_a_revoir": concepts_a_revoir
     }
-    if database.save_lesson_result(db_data):
-        st.cache_data.clear()
+    # Une seule écriture par leçon ; save_lesson_result ignore aussi un lesson_uuid déjà connu.
+    # Il incrémente la génération de l'élève : seul son cache est invalidé.
+    if st.session_state.get('saved_lesson_uuid') != st.session_state.lesson_uuid:
+        if database.save_lesson_result(db_data):
+            st.session_state.saved_lesson_uuid = st.session_state.lesson_uuid
     if st.button("Faire une autre leçon", use_container_width=True):
         reset_lesson_state()
         st.rerun()
@@ -209,21 +363,23 @@ def display_summary():
 if 'lesson_stage' not in st.session_state:
     st.session_state.lesson_stage = 'config'
 stage = st.session_state.lesson_stage
-if stage == 'config':
-    display_config()
-elif stage == 'generating_lesson':
-    display_generating_lesson()
-elif stage == 'display_lesson':
-    display_lesson()
-elif stage == 'quiz_1':
-    display_quiz('quiz_1_form', st.session_state.quiz_1_data, 'eval_1')
-elif stage == 'eval_1':
-    evaluate_quiz(st.session_state.quiz_1_data, 'score_quiz_1', 'summary', 'remediation', 7)
-elif stage == 'remediation':
-    display_remediation()
-elif stage == 'quiz_2':
-    display_quiz('quiz_2_form', st.session_state.quiz_2_data, 'eval_2')
-elif stage == 'eval_2':
-    evaluate_quiz(st.session_state.quiz_2_data, 'score_quiz_2', 'summary', 'summary', 3)
-elif stage == 'summary':
-    display_summary()
+# Chaque passage dans une étape est chronométré (voir la page Métriques).
+with metrics.timed(metrics.STAGE, stage, politique=model_routing.active_policy()):
+    if stage == 'config':
+        display_config()
+    elif stage == 'generating_lesson':
+        display_generating_lesson()
+    elif stage == 'display_lesson':
+        display_lesson()
+    elif stage == 'quiz_1':
+        display_quiz('quiz_1_form', *stored_quiz('quiz_1'), 'eval_1')
+    elif stage == 'eval_1':
+        evaluate_quiz(stored_quiz('quiz_1')[0], 1, 'score_quiz_1', 'summary', 'remediation', 7)
+    elif stage == 'remediation':
+        display_remediation()
+    elif stage == 'quiz_2':
+        display_quiz('quiz_2_form', *stored_quiz('quiz_2'), 'eval_2')
+    elif stage == 'eval_2':
+        evaluate_quiz(stored_quiz('quiz_2')[0], 2, 'score_quiz_2', 'summary', 'summary', 3)
+    elif stage == 'summary':
+        display_summary()
@@ -0,0 +1,99 @@
+# --------------------------------------------------------------------------
+# pages/2_📈_Métriques.py
+# Page d'administration : latence et tokens du parcours de leçon.
+# --------------------------------------------------------------------------
+
+import time
+import streamlit as st
+from modules import database, gemini_client, metrics, model_routing, object_store, remediation_batcher, remediation_store
+
+st.set_page_config(page_title="Métriques | Leçon du Jour", page_icon="📈", layout="wide")
+
+st.title("📈 Métriques")
+st.markdown("Où passe le temps entre les étapes d'une leçon, et combien de tokens consomme chaque appel à Gemini.")
+
+# Lecture seule : la politique de routage est un réglage du déploiement (ROUTING_POLICY).
+politique = model_routing.active_policy()
+st.caption(
+    f"Politique de routage des modèles : **{politique}** (réglage ROUTING_POLICY) — "
+    + " · ".join(f"{tache} : {niveau}" for tache, niveau in model_routing.POLICIES[politique].items())
+)
+
+PERIODES = {"Dernière heure": 3600, "Dernières 24 heures": 86400, "7 derniers jours": 7 * 86400, "Tout": None}
+periode = st.selectbox("Période :", list(PERIODES))
+since_ts = time.time() - PERIODES[periode] if PERIODES[periode] else None
+df = metrics.load_metrics(since_ts)
+
+if df.empty:
+    st.info(f"Aucune mesure pour cette période. Les mesures sont enregistrées dans {metrics.METRICS_FILE}.")
+    st.stop()
+
+etapes = df[df["type"] == metrics.STAGE]
+appels = df[df["type"] == metrics.LLM]
+requetes = df[df["type"] == metrics.DB]
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Étapes affichées", len(etapes))
+col2.metric("Appels à Gemini", len(appels))
+col3.metric("Tokens consommés", f"{int(appels['tokens_prompt'].sum() + appels['tokens_reponse'].sum()):,}".replace(",", " "))
+
+st.header("⏱️ Étapes de la leçon")
+st.dataframe(metrics.latency_summary(etapes, ["nom"]), use_container_width=True, hide_index=True)
+
+st.subheader("Par politique de routage")
+st.caption("Pour comparer les politiques : durée de chaque étape selon la politique active au moment de la mesure.")
+st.dataframe(metrics.latency_summary(etapes.dropna(subset=["politique"]), ["nom", "politique"]), use_container_width=True, hide_index=True)
+
+st.header("🤖 Appels à Gemini par modèle")
+st.caption("Les réessais sont les demandes de correction des champs invalides d'une réponse.")
+st.dataframe(metrics.latency_summary(appels, ["modele"]), use_container_width=True, hide_index=True)
+st.dataframe(metrics.latency_summary(appels, ["nom", "modele"]), use_container_width=True, hide_index=True)
+if not appels.empty:
+    st.metric("Taux de réessai", f"{(appels['reessais'].fillna(0) > 0).mean():.0%}")
+
+client = gemini_client.client_stats()
+st.caption(
+    f"Client Gemini (depuis le démarrage) : disjoncteur {client['disjoncteur']} · {client['appels']} appel(s) · "
+    f"{client['reessais']} réessai(s) · {client['fusionnes']} requête(s) fusionnée(s) · {client['refuses']} refusée(s)"
+)
+
+lots = remediation_batcher.batch_stats()
+if lots["demandes"]:
+    st.caption(
+        f"Remédiations regroupées : {lots['demandes']} demande(s) servie(s) par {lots['appels']} appel(s) "
+        f"({lots['reduction']:.0%} d'appels en moins), attente ajoutée par la file : {lots['attente_moyenne_ms']:.0f} ms en moyenne"
+    )
+
+remediations = remediation_store.cache_stats()
+if remediations["hits"] + remediations["misses"]:
+    st.caption(
+        f"Cache de remédiations : {remediations['hit_ratio']:.0%} servies depuis le cache "
+        f"({remediations['hits']} sur {remediations['hits'] + remediations['misses']}, dont {remediations['composees']} composée(s)) · "
+        f"{remediations['economie_s']:.0f} s de génération économisées · {remediations['entrees']} entrée(s) · "
+        f"{remediations['evictions']} évincée(s)"
+    )
+
+objets = object_store.store_stats()
+st.caption(
+    f"Contenus de leçon partagés : {objets['entrees']} en mémoire ({objets['octets'] / 2**20:.1f} Mo) · "
+    f"{objets['partages']} réutilisé(s) par une autre session · {objets['deversements']} déversé(s) sur disque · "
+    f"{objets['lectures_disque']} relu(s) depuis le disque"
+)
+
+st.header("🗄️ Requêtes à la base de données")
+if database.write_behind():
+    ecritures = database.get_write_queue().stats()
+    if ecritures["ecritures"]:
+        st.caption(
+            f"File d'écriture : {ecritures['ecritures']} écriture(s) en {ecritures['transactions']} transaction(s) "
+            f"({ecritures['par_transaction']:.1f} par transaction) · {ecritures['en_attente']} en attente · "
+            f"enregistrement p99 : {ecritures['p99_ms']:.0f} ms · {ecritures['echecs']} échec(s)"
+        )
+    if ecritures["derniere_erreur"]:
+        st.warning(f"Dernière écriture en échec : {ecritures['derniere_erreur']}")
+else:
+    st.caption("Écritures synchrones (WRITE_DURABILITY = \"sync\") : chaque leçon est validée avant l'affichage du résumé.")
+st.dataframe(metrics.latency_summary(requetes, ["nom"]), use_container_width=True, hide_index=True)
+
+with st.expander("Dernières mesures brutes"):
+    st.dataframe(df.sort_values("ts", ascending=False).head(200), use_container_width=True, hide_index=True)
@@ -0,0 +1,103 @@
+# --------------------------------------------------------------------------
+# pages/3_🏫_Classe.py
+# Vue enseignant : scores d'une classe et progression de chacun de ses élèves.
+# --------------------------------------------------------------------------
+
+import streamlit as st
+from modules import class_overview, database
+
+st.set_page_config(page_title="Classe | Leçon du Jour", page_icon="🏫", layout="wide")
+
+# Une seule fois par processus (st.cache_resource).
+database.init_db()
+
+st.title("🏫 Ma Classe")
+st.markdown("Vue d'ensemble d'une classe : répartition des scores par matière et progression de chaque élève.")
+
+# --- Sélecteur de Classe ---
+classes = class_overview.load_classes()
+if classes.empty:
+    st.info("Aucun élève pour le moment : ajoutez des profils depuis le **🏠 Tableau de Bord**.")
+    st.stop()
+effectifs = dict(zip(classes['classe'], classes['nombre_eleves']))
+classe = st.selectbox("Classe :", list(effectifs), format_func=lambda c: f"{c} ({effectifs[c]} élèves)")
+
+# --- Scores de la Classe ---
+# Agrégés par la base (leçons par matière et par score) et gardés en cache quelques instants.
+distribution = class_overview.load_distribution(classe)
+nombre_lecons = int(distribution['nombre'].sum()) if not distribution.empty else 0
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric(label="Élèves", value=effectifs[classe])
+with col2:
+    st.metric(label="Leçons terminées", value=nombre_lecons)
+with col3:
+    score_moyen = (distribution['score'] * distribution['nombre']).sum() / nombre_lecons if nombre_lecons else None
+    st.metric(label="Score moyen au 1er quiz", value=f"{score_moyen:.1f}/10" if score_moyen is not None else "–")
+
+if nombre_lecons:
+    # Import différé : altair n'est chargé que si des graphiques sont affichés.
+    import altair as alt
+    col_graph1, col_graph2 = st.columns(2)
+    with col_graph1:
+        st.subheader("Répartition des scores")
+        repartition = distribution.groupby('score', as_index=False)['nombre'].sum()
+        st.altair_chart(alt.Chart(repartition).mark_bar().encode(
+            x=alt.X('score:O', title='Score au 1er quiz'),
+            y=alt.Y('nombre:Q', title='Leçons'),
+            tooltip=['score', 'nombre']
+        ).properties(height=300), use_container_width=True)
+    with col_graph2:
+        st.subheader("Scores par matière")
+        st.altair_chart(alt.Chart(distribution).mark_rect().encode(
+            x=alt.X('score:O', title='Score au 1er quiz'),
+            y=alt.Y('matiere:N', title='Matière'),
+            color=alt.Color('nombre:Q', title='Leçons', scale=alt.Scale(scheme='blues')),
+            tooltip=['matiere', 'score', 'nombre']
+        ).properties(height=300), use_container_width=True)
+
+# --- Élèves de la Classe ---
+st.markdown("---")
+st.header("👩‍🎓 Élèves")
+recherche = st.text_input("Rechercher un élève :", placeholder="Prénom ou partie du prénom").strip()
+
+# Chaque page commence après le dernier prénom de la précédente : on garde ces prénoms
+# pour revenir en arrière. Tout repart de la première page si la classe ou la recherche change.
+if st.session_state.get('classe_filtre') != (classe, recherche):
+    st.session_state.classe_filtre = (classe, recherche)
+    st.session_state.classe_pages = [None]
+pages = st.session_state.classe_pages
+eleves, par_matiere, page_suivante = class_overview.load_student_page(classe, pages[-1], recherche or None)
+
+if eleves.empty:
+    st.info("Aucun élève ne correspond à cette recherche.")
+else:
+    st.dataframe(
+        eleves.rename(columns={
+            'prenom': 'Élève', 'nombre_lecons': 'Leçons', 'score_moyen': 'Score moyen', 'derniere_lecon': 'Dernière leçon'
+        }),
+        use_container_width=True, hide_index=True,
+        column_config={'Score moyen': st.column_config.NumberColumn(format="%.1f")}
+    )
+    if not par_matiere.empty:
+        import altair as alt
+        st.subheader("Score moyen par matière")
+        st.altair_chart(alt.Chart(par_matiere).mark_rect().encode(
+            x=alt.X('matiere:N', title='Matière'),
+            y=alt.Y('prenom:N', title=None, sort=list(eleves['prenom'])),
+            color=alt.Color('score_moyen:Q', title='Score moyen',
+                            scale=alt.Scale(domain=[0, 10], scheme='redyellowgreen')),
+            tooltip=['prenom', 'matiere', 'nombre_lecons', alt.Tooltip('score_moyen:Q', format='.1f')]
+        ), use_container_width=True)
+
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+with col_prev:
+    if st.button("◀ Précédents", disabled=len(pages) == 1, use_container_width=True):
+        pages.pop()
+        st.rerun()
+with col_page:
+    st.caption(f"Page {len(pages)} · {class_overview.PAGE_SIZE} élèves par page")
+with col_next:
+    if st.button("Suivants ▶", disabled=page_suivante is None, use_container_width=True):
+        pages.append(page_suivante)
+        st.rerun()
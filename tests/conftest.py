@@ -0,0 +1,29 @@
+# tests/conftest.py
+"""Configuration commune des tests : établissement et fichier de mesures jetables.
+
+Lancement (depuis la racine du dépôt) :
+    python -m pytest -q tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Avant tout import de modules.* : l'établissement et le fichier de mesures sont lus au démarrage.
+os.environ["TENANT_ID"] = f"tests-{uuid.uuid4().hex[:8]}"
+os.environ["METRICS_FILE"] = str(Path(tempfile.mkdtemp(prefix="tests-")) / "metrics.jsonl")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def disposable_tenant():
+    """Supprime la base SQLite de l'établissement de test à la fin de la session."""
+    yield
+    from modules import sqlite_backend, storage
+    shutil.rmtree(sqlite_backend.tenant_folder(storage.tenant_id()), ignore_errors=True)
+    shutil.rmtree(Path(os.environ["METRICS_FILE"]).parent, ignore_errors=True)
@@ -0,0 +1,52 @@
+# tests/test_archive.py
+"""Archivage Parquet : les leçons archivées restent lisibles quel que soit le prénom."""
+import pytest
+from modules import archive, database
+
+pytest.importorskip("pyarrow")
+
+# 2000-01-05 : bien au-delà de l'horizon ci-dessous, qui ne touche pas aux leçons des autres tests.
+OLD_DATE, OLD_TS = "2000-01-05 10:00:00", 947066400
+HORIZON_DAYS = 365 * 20
+
+
+def _old_lesson(prenom):
+    return {
+        "eleve": prenom, "lesson_uuid": f"archive-{prenom}", "date": OLD_DATE, "date_ts": OLD_TS,
+        "classe": "CM1", "matiere": "Histoire", "sujet": "Les châteaux forts", "score_quiz_1": 7,
+        "score_quiz_2": None, "appreciation_ia": "Bien.", "points_a_revoir": "",
+    }
+
+
+@pytest.mark.parametrize("prenom", ["Zoé", "Jean Luc"])
+def test_archived_lessons_are_read_back_for_encoded_names(tmp_path, monkeypatch, prenom):
+    # pyarrow encode la valeur de partition : "Zoé" est rangé sous eleve=Zo%C3%A9.
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    database.add_student(prenom, "CM1")
+    assert database.save_lesson_result(_old_lesson(prenom))
+
+    assert archive.archive_old_lessons(HORIZON_DAYS)["lecons"] == 1
+
+    archived = archive.read_student_lessons(prenom)
+    assert list(archived["eleve"]) == [prenom]
+    assert list(archived["sujet"]) == ["Les châteaux forts"]
+    history = database.get_student_data(prenom)
+    assert list(history["sujet"]) == ["Les châteaux forts"]
+
+
+def test_student_without_archive_reads_empty(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    assert archive.read_student_lessons("Personne").empty
+
+
+def test_class_distribution_still_counts_archived_lessons(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    database.add_student("Maël", "CP")
+    old = dict(_old_lesson("Maël"), classe="CP", score_quiz_1=9)
+    assert database.save_lesson_result(old)
+    assert database.save_lesson_result(dict(old, lesson_uuid="recent-Maël", date="2026-01-05 10:00:00", date_ts=1767607200))
+
+    archive.archive_old_lessons(HORIZON_DAYS)
+
+    distribution = database.get_class_score_distribution("CP")
+    assert distribution.to_dict("records") == [{"matiere": "Histoire", "score": 9, "nombre": 2}]
@@ -0,0 +1,146 @@
+# tests/test_gemini_client.py
+"""Client Gemini avec un modèle factice : disjoncteur, réessais et fusion des requêtes."""
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from modules import gemini_client
+from modules.gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient, GeminiUnavailableError, TokenBucket
+
+RESET_SECONDS = 0.05
+
+
+class ServiceUnavailable(Exception):
+    """Erreur 503 simulée (réessayable)."""
+
+
+class StubModel:
+    """Répond « ok » ; lève ServiceUnavailable tant que `down` est vrai."""
+
+    def __init__(self, latency=0.0):
+        self.down = False
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.down:
+            raise ServiceUnavailable("503 Service Unavailable (stub)")
+        response = SimpleNamespace(text="ok")
+        return [response] if stream else response
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Client sur un modèle factice : un seul essai par appel, disjoncteur ouvert dès le premier échec."""
+    monkeypatch.setattr(gemini_client, "MAX_ATTEMPTS", 1)
+    model = StubModel()
+    client = GeminiClient(model_factory=lambda name: model)
+    client.breaker = CircuitBreaker(threshold=1, reset_seconds=RESET_SECONDS)
+    client.bucket = TokenBucket(rate=1000, capacity=10)
+    return client, model
+
+
+def _open_breaker(client, model):
+    model.down = True
+    with pytest.raises(GeminiUnavailableError):
+        client.generate("stub", "prompt", "test")
+    assert client.breaker.state == "ouvert"
+    with pytest.raises(CircuitOpenError):
+        client.generate("stub", "prompt", "test")
+    model.down = False
+    time.sleep(RESET_SECONDS * 1.5)
+
+
+def _empty_bucket():
+    """Seau sans jeton disponible avant longtemps : l'appel échoue avant d'être envoyé."""
+    bucket = TokenBucket(rate=0.001, capacity=1)
+    bucket.acquire()
+    return bucket
+
+
+def test_half_open_trial_failing_before_the_call_reopens_the_breaker(stub):
+    client, model = stub
+    _open_breaker(client, model)
+    client.bucket = _empty_bucket()
+    with pytest.raises(GeminiUnavailableError) as error:
+        client.generate("stub", "prompt", "test", timeout=0.01)
+    assert not isinstance(error.value, CircuitOpenError)
+    assert client.breaker.state == "ouvert"
+
+    # L'API répond de nouveau : l'essai suivant passe et referme le disjoncteur.
+    client.bucket = TokenBucket(rate=1000, capacity=10)
+    time.sleep(RESET_SECONDS * 1.5)
+    assert client.generate("stub", "prompt", "test").text == "ok"
+    assert client.breaker.state == "ferme"
+    assert client.generate("stub", "prompt", "test").text == "ok"
+
+
+def test_half_open_stream_trial_failing_before_the_call_reopens_the_breaker(stub):
+    client, model = stub
+    _open_breaker(client, model)
+    client.bucket = _empty_bucket()
+    with pytest.raises(GeminiUnavailableError) as error:
+        list(client.stream("stub", "prompt", timeout=0.01))
+    assert not isinstance(error.value, CircuitOpenError)
+
+    client.bucket = TokenBucket(rate=1000, capacity=10)
+    time.sleep(RESET_SECONDS * 1.5)
+    assert [chunk.text for chunk in client.stream("stub", "prompt")] == ["ok"]
+    assert client.breaker.state == "ferme"
+
+
+def test_non_retryable_error_during_trial_closes_the_breaker(stub):
+    client, model = stub
+    _open_breaker(client, model)
+    model.generate_content = lambda *args, **kwargs: (_ for _ in ()).throw(ValueError("400 requête invalide"))
+    with pytest.raises(ValueError):
+        client.generate("stub", "prompt", "test")
+    # L'API a répondu : ce n'est pas une panne, les appels suivants sont tentés.
+    assert client.breaker.state == "ferme"
+
+
+def test_retries_temporary_errors(monkeypatch, stub):
+    client, model = stub
+    monkeypatch.setattr(gemini_client, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(gemini_client, "backoff_delay", lambda attempt: 0.0)
+    client.breaker = CircuitBreaker(threshold=5)
+    failures = iter([True, True, False])
+    real_call = model.generate_content
+
+    def flaky(*args, **kwargs):
+        model.down = next(failures)
+        return real_call(*args, **kwargs)
+    model.generate_content = flaky
+    assert client.generate("stub", "prompt", "test").text == "ok"
+    assert model.calls == 3
+    assert client.stats()["reessais"] == 2
+
+
+def test_identical_inflight_requests_are_coalesced(stub):
+    client, model = stub
+    model.latency = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.generate("stub", "même prompt", "test")))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [response.text for response in results] == ["ok"] * 5
+    assert model.calls == 1
+    assert client.stats()["fusionnes"] == 4
+
+
+def test_non_coalesced_requests_each_reach_the_model(stub):
+    client, model = stub
+    model.latency = 0.2
+    threads = [threading.Thread(target=client.generate, args=("stub", "même prompt", "test"), kwargs={"coalesce": False})
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert model.calls == 2
+    assert client.stats()["fusionnes"] == 0
@@ -0,0 +1,29 @@
+# tests/test_lesson_bank.py
+"""Complément de la banque de leçons : d'après les leçons que l'élève n'a pas encore eues."""
+from modules import database, lesson_bank, lesson_store
+
+CLASSE, MATIERE = "CE2", "Histoire"
+PER_CELL = 2
+
+
+def test_refill_cell_counts_lessons_unseen_by_student():
+    database.init_db()
+    prenom = "Banque"
+    database.add_student(prenom, CLASSE)
+    # Un peu de latence : les appels simultanés pour la case se chevauchent.
+    model = lesson_bank.FakeModel(latency=0.05)
+    # Les leçons d'une même case sont générées en parallèle : aucune n'est fusionnée avec une autre.
+    report = lesson_bank.build([CLASSE], [MATIERE], per_cell=PER_CELL, model=model, log=lambda message: None)
+    assert report == {"generated": PER_CELL, "failed": 0}
+    assert model.calls == PER_CELL
+    assert lesson_bank.bank_counts()[(CLASSE, MATIERE)] == PER_CELL
+
+    # L'élève a eu toutes les leçons de la case : la case est pleine, mais plus pour lui.
+    while (lesson := lesson_store.find_lesson(prenom, CLASSE, MATIERE)) is not None:
+        lesson_store.mark_served(prenom, lesson["cle_cache"])
+    assert lesson_store.count_unseen(prenom, CLASSE, MATIERE) == 0
+    assert not lesson_bank.refill_cell(CLASSE, MATIERE, per_cell=PER_CELL, model=model)
+
+    assert lesson_bank.refill_cell(CLASSE, MATIERE, prenom, per_cell=PER_CELL, model=model)
+    assert lesson_store.count_unseen(prenom, CLASSE, MATIERE) == 1
+    assert lesson_store.find_lesson(prenom, CLASSE, MATIERE) is not None
@@ -0,0 +1,140 @@
+# tests/test_lesson_flow.py
+"""Parcours de la page Leçon du Jour (AppTest) : chaque étape n'appelle Gemini et n'écrit qu'une fois.
+
+Gemini est remplacé par un faux modèle qui compte ses appels par type de prompt ; la page
+est relancée plusieurs fois à chaque étape, comme le ferait un clic ou un rafraîchissement.
+"""
+import threading
+from collections import Counter
+from pathlib import Path
+import pytest
+from streamlit.testing.v1 import AppTest
+from modules import database, gemini_client, lesson_bank, object_store, remediation_store, sqlite_backend
+
+LESSON_PAGE = Path(__file__).parent.parent / "pages" / "1_🎓_Leçon_du_Jour.py"
+RERUNS = 3
+TIMEOUT_SECONDS = 60
+
+
+class CountingModel(lesson_bank.FakeModel):
+    """Faux modèle qui compte ses appels : leçon, remédiation ou appréciation."""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = Counter()
+        self._count_lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        if '"remediation_markdown"' in prompt:
+            kind = "remediation"
+        elif '"quiz_10_questions"' in prompt:
+            kind = "lecon"
+        else:
+            kind = "appreciation"
+        with self._count_lock:
+            self.prompts[kind] += 1
+        return super().generate_content(prompt, **kwargs)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    # Le complément de la banque (tests/test_lesson_bank.py) appellerait Gemini en parallèle du préchargement.
+    monkeypatch.setattr(lesson_bank, "refill_cell", lambda *args, **kwargs: False)
+    model = CountingModel()
+    gemini_client.set_model_factory(lambda name: model)
+    yield model
+    gemini_client.set_model_factory(gemini_client._default_model_factory)
+
+
+@pytest.fixture
+def student():
+    database.init_db()
+    prenom = "Parcours"
+    database.add_student(prenom, "CM1")
+    return prenom
+
+
+def _rows(table, prenom):
+    with sqlite_backend.get_connection() as conn:
+        return conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE eleve_id = (SELECT id FROM eleves WHERE prenom = ?)", (prenom,)
+        ).fetchone()[0]
+
+
+def _remediation_requests():
+    """Demandes de remédiation faites par la page, servies par le cache ou par Gemini."""
+    stats = remediation_store.cache_stats()
+    return stats["hits"] + stats["misses"]
+
+
+def _click(at, prefix):
+    button = next((b for b in at.button if b.label.startswith(prefix)), None)
+    assert button is not None, f"bouton « {prefix} » absent (étape {at.session_state['lesson_stage']})"
+    button.click().run()
+    assert not at.exception, at.exception[0].value
+
+
+def _answer_quiz(at, quiz_key, wrong):
+    for i, question in enumerate(object_store.get(at.session_state[f"{quiz_key}_id"])):
+        radio = at.radio(key=f"{quiz_key}_form_{i}")
+        correct = question.correct_answer
+        radio.set_value(correct if i >= wrong else next(o for o in radio.options if o != correct))
+
+
+def _rerun(at, times=RERUNS):
+    for _ in range(times):
+        at.run()
+        assert not at.exception, at.exception[0].value
+
+
+def _wait(at, key):
+    """Attend la fin d'un calcul lancé en arrière-plan par la page (Future rangé en session)."""
+    if key in at.session_state:
+        at.session_state[key].result(timeout=TIMEOUT_SECONDS)
+
+
+def test_each_stage_calls_gemini_and_saves_once(model, student):
+    at = AppTest.from_file(str(LESSON_PAGE), default_timeout=TIMEOUT_SECONDS)
+    at.secrets["GEMINI_API_KEY"] = "test"
+    at.session_state["select_eleve"] = student
+    at.run()
+    _rerun(at)
+    assert sum(model.prompts.values()) == 0
+
+    _click(at, "🚀")
+    _click(at, "J'ai tout lu")
+    # La leçon affichée, et la suivante préparée en arrière-plan pendant la lecture.
+    _wait(at, "next_lesson_future")
+    _rerun(at)
+    assert model.prompts["lecon"] == 2
+
+    _answer_quiz(at, "quiz_1", wrong=5)
+    _click(at, "J'ai fini")
+    assert _rows("reponses", student) == 10
+    # La page de résultat fait avancer l'étape dès son affichage : les reruns se font après.
+    _click(at, "Continuer")
+    assert at.session_state["lesson_stage"] == "remediation"
+    _rerun(at)
+    assert model.prompts["remediation"] == 1
+    assert _remediation_requests() == 1
+    assert _rows("reponses", student) == 10
+
+    # Le clic qui quitte la remédiation ne la régénère pas.
+    _click(at, "OK, j'ai compris")
+    assert model.prompts["remediation"] == 1
+    assert _remediation_requests() == 1
+    _answer_quiz(at, "quiz_2", wrong=0)
+    _click(at, "J'ai fini")
+    _click(at, "Continuer")
+    assert at.session_state["lesson_stage"] == "summary"
+    _wait(at, "appreciation_future")
+    _rerun(at)
+    assert _rows("lecons", student) == 1
+    assert _rows("reponses", student) == 15
+    assert model.prompts == Counter(lecon=2, remediation=1, appreciation=1)
+
+    # « Faire une autre leçon » ne réenregistre pas la leçon terminée.
+    _click(at, "Faire une autre leçon")
+    _rerun(at)
+    assert _rows("lecons", student) == 1
+    assert model.prompts == Counter(lecon=2, remediation=1, appreciation=1)
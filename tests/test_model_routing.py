@@ -0,0 +1,43 @@
+# tests/test_model_routing.py
+"""Politique de routage : un réglage du déploiement, que la page Métriques ne fait qu'afficher."""
+from pathlib import Path
+import pytest
+from streamlit.testing.v1 import AppTest
+from modules import model_routing
+
+METRICS_PAGE = Path(__file__).parent.parent / "pages" / "2_📈_Métriques.py"
+
+
+@pytest.fixture(autouse=True)
+def no_forced_policy():
+    model_routing.set_policy(None)
+    yield
+    model_routing.set_policy(None)
+
+
+def test_policy_comes_from_setting(monkeypatch):
+    monkeypatch.delenv("ROUTING_POLICY", raising=False)
+    assert model_routing.active_policy() == model_routing.DEFAULT_POLICY
+    monkeypatch.setenv("ROUTING_POLICY", "economique")
+    assert model_routing.tier_for("appreciation") == "modele"
+    monkeypatch.setenv("ROUTING_POLICY", "inconnue")
+    with pytest.raises(ValueError):
+        model_routing.active_policy()
+
+
+def test_set_policy_overrides_setting(monkeypatch):
+    monkeypatch.setenv("ROUTING_POLICY", "economique")
+    model_routing.set_policy("qualite")
+    assert model_routing.active_policy() == "qualite"
+    model_routing.set_policy(None)
+    assert model_routing.active_policy() == "economique"
+
+
+def test_metrics_page_cannot_change_policy(monkeypatch):
+    monkeypatch.setenv("ROUTING_POLICY", "economique")
+    at = AppTest.from_file(str(METRICS_PAGE), default_timeout=30)
+    at.run()
+    assert not at.exception
+    assert not [box for box in at.selectbox if "routage" in box.label]
+    assert any("economique" in caption.value for caption in at.caption)
+    assert model_routing.active_policy() == "economique"
@@ -0,0 +1,54 @@
+# tests/test_object_store.py
+"""Magasin de contenus : déversement sur disque, sans bloquer les autres sessions."""
+import threading
+from modules import object_store
+
+
+class SlowDiskStore(object_store.ObjectStore):
+    """Le premier déversement attend `release` : les fichiers sont écrits sans le verrou."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.spilling = threading.Event()
+        self.release = threading.Event()
+
+    def _spill(self, victims, purge_due=False):
+        if victims and not self.spilling.is_set():
+            self.spilling.set()
+            self.release.wait(5)
+        super()._spill(victims, purge_due)
+
+
+def test_spilled_objects_are_reloaded(tmp_path):
+    store = object_store.ObjectStore(max_bytes=1000, folder=tmp_path)
+    ids = {store.put("x" * 400 + str(n)): "x" * 400 + str(n) for n in range(5)}
+    assert store.stats()["deversements"] == 3
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".pkl"] * 3
+    for object_id, obj in ids.items():
+        assert store.get(object_id) == obj
+    assert store.stats()["perdus"] == 0
+
+
+def test_spill_does_not_hold_the_lock(tmp_path):
+    store = SlowDiskStore(max_bytes=1000, folder=tmp_path)
+    first = store.put("a" * 600)
+    writer = threading.Thread(target=store.put, args=("b" * 600,))
+    writer.start()
+    assert store.spilling.wait(5)
+
+    # Pendant l'écriture du fichier : l'entrée déversée reste lisible, les autres sessions avancent.
+    done = threading.Event()
+
+    def other_session():
+        assert store.get(first) == "a" * 600
+        store.put("c" * 10)
+        store.stats()
+        done.set()
+    threading.Thread(target=other_session).start()
+    assert done.wait(2), "une session a attendu la fin d'une écriture sur disque"
+
+    store.release.set()
+    writer.join(5)
+    assert (tmp_path / f"{first}.pkl").exists()
+    assert store.get(first) == "a" * 600
+    assert store.stats()["perdus"] == 0
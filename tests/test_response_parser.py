@@ -0,0 +1,20 @@
+# tests/test_response_parser.py
+"""Corpus de réponses mal formées et fuzz de l'analyseur tolérant."""
+import pytest
+from modules import response_parser
+
+
+@pytest.mark.parametrize("text, expected", [entry[1:] for entry in response_parser.MALFORMED_CORPUS],
+                         ids=[entry[0] for entry in response_parser.MALFORMED_CORPUS])
+def test_malformed_corpus(text, expected):
+    if expected is None:
+        with pytest.raises(response_parser.ResponseParseError):
+            response_parser.parse_json_response(text)
+    else:
+        assert response_parser.parse_json_response(text) == expected
+
+
+def test_fuzz():
+    report = response_parser.run_fuzz(iterations=500)
+    assert report["reparables_ok"] == 500
+    assert report["exceptions"] == []
@@ -0,0 +1,29 @@
+# tests/test_sqlite_backend.py
+"""Plans d'exécution du tableau de bord : chaque requête passe par son index, sans tri ni parcours complet."""
+import pytest
+from modules import sqlite_backend
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = sqlite_backend.open_pool(tmp_path / "progress.db")
+    yield pool
+    pool.close()
+
+
+def test_dashboard_queries_use_indexes_on_empty_db(pool):
+    with pool.connection() as conn:
+        assert sqlite_backend.check_query_plans(conn) == {}
+
+
+def test_dashboard_queries_use_indexes_after_analyze(pool):
+    sqlite_backend.fill_bench_db(pool, students=200, lessons=20_000)
+    with pool.connection() as conn:
+        assert sqlite_backend.check_query_plans(conn) == {}
+
+
+def test_missing_index_is_reported(pool):
+    with pool.connection() as conn:
+        conn.execute("DROP INDEX idx_lecons_eleve_date")
+        regressions = sqlite_backend.check_query_plans(conn)
+    assert set(regressions) == {"historique", "pantheon"}
@@ -0,0 +1,77 @@
+# tests/test_write_queue.py
+"""File d'écriture groupée : une écriture n'est annoncée qu'une fois validée."""
+import time
+import pytest
+from modules import database, sqlite_backend, write_queue
+from modules.storage import StorageError
+
+
+def _lesson(prenom, lesson_uuid):
+    return {
+        "eleve": prenom, "lesson_uuid": lesson_uuid, "date": "2026-01-05 10:00:00", "date_ts": 1767607200,
+        "classe": "CM1", "matiere": "Mathématiques", "sujet": "Les fractions", "score_quiz_1": 8,
+        "score_quiz_2": None, "appreciation_ia": "Bravo !", "points_a_revoir": "",
+    }
+
+
+def _answers(prenom, lesson_uuid, count=3):
+    return [{
+        "eleve": prenom, "lesson_uuid": lesson_uuid, "quiz": 1, "numero": n, "classe": "CM1",
+        "matiere": "Mathématiques", "question_cle": n + 1, "question": f"Question {n}", "options": ("A", "B"),
+        "bonne_option": 0, "option_choisie": 0, "correcte": True, "concept": None, "duree_quiz_ms": 1000,
+        "repondu_ts": 1767607200,
+    } for n in range(count)]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    backend = sqlite_backend.SQLiteBackend(sqlite_backend.open_pool(tmp_path / "file.db"))
+    backend.add_student("Lina", "CM1", "generation:liste_eleves")
+    write_queue_ = write_queue.WriteQueue(backend)
+    yield write_queue_
+    write_queue_.close()
+    backend.close()
+
+
+def test_each_future_gets_its_own_result(queue):
+    futures = [
+        queue.submit_answers(_answers("Lina", "u1", 3)),
+        queue.submit_answers(_answers("Inconnu", "u2", 2)),
+        queue.submit_answers(_answers("Lina", "u3", 4)),
+        queue.submit_lesson(_lesson("Lina", "u1"), "generation:eleve:Lina"),
+        queue.submit_lesson(_lesson("Inconnu", "u2"), "generation:eleve:Inconnu"),
+    ]
+    assert [write_queue.wait(future) for future in futures] == [3, 0, 4, True, None]
+    # Déjà enregistrée : rien n'est inséré une seconde fois.
+    assert write_queue.wait(queue.submit_answers(_answers("Lina", "u1", 3))) == 0
+
+
+def test_wait_raises_storage_error_when_not_confirmed_in_time(queue):
+    queue.backend.save_batch = lambda lessons, answer_lists: time.sleep(0.5) or ([], [])
+    with pytest.raises(StorageError):
+        write_queue.wait(queue.submit_answers(_answers("Lina", "u4")), timeout=0.05)
+
+
+def test_unexpected_error_fails_only_its_write_and_keeps_the_writer_alive(queue):
+    broken = _lesson("Lina", "u5")
+    del broken["date_ts"]
+    with pytest.raises(StorageError):
+        write_queue.wait(queue.submit_lesson(broken, "generation:eleve:Lina"))
+    assert queue._thread.is_alive()
+    assert write_queue.wait(queue.submit_lesson(_lesson("Lina", "u6"), "generation:eleve:Lina")) is True
+    assert queue.stats()["echecs"] == 1
+
+
+def test_sync_is_the_default(monkeypatch):
+    monkeypatch.delenv("WRITE_DURABILITY", raising=False)
+    assert write_queue.durability() == write_queue.DURABILITY_SYNC
+
+
+def test_group_mode_reports_unknown_student(monkeypatch):
+    monkeypatch.setenv("WRITE_DURABILITY", write_queue.DURABILITY_GROUP)
+    database.init_db()
+    database.add_student("Rayan", "CE2")
+    assert database.save_lesson_result(_lesson("Rayan", "g1")) is True
+    assert database.save_answers(_answers("Rayan", "g1")) == 3
+    # Élève inconnu : la page doit pouvoir réessayer, la sauvegarde n'est pas annoncée.
+    assert database.save_lesson_result(_lesson("Personne", "g2")) is False
@@ -4,9 +4,8 @@
 # --------------------------------------------------------------------------
 
 import streamlit as st
-import pandas as pd
-import altair as alt
-from modules import database, style_handler
+from modules import database, style_handler, cache_handler, lesson_store
+from modules.constants import ALL_CLASSES
 import time
 # --- Configuration de la Page ---
 st.set_page_config(
@@ -16,16 +15,25 @@ st.set_page_config(
 )
 
 # --- Initialisation de la Base de Données ---
+# Une seule fois par processus (st.cache_resource) : les reruns suivants ne refont rien.
 database.init_db()
 
 # --- Fonctions Utilitaires avec Cache ---
-@st.cache_data
+# Les entrées sont liées à la génération stockée en BDD : une leçon enregistrée
+# n'invalide que les données de l'élève concerné.
 def load_student_data(student_name):
-    return database.get_student_data(student_name)
+    generation = database.get_generation(database.student_generation_key(student_name))
+    # Uniquement des requêtes bornées : le résumé par matière et les 5 dernières lignes utiles.
+    return cache_handler.get_cache().get_or_load("student_data", student_name, generation, lambda: {
+        "stats": database.get_student_stats(student_name),
+        "reussites": database.get_top_successes(student_name, limit=5),
+        "defis": database.get_recent_challenges(student_name, limit=5),
+        "concepts": database.get_concept_mastery(student_name),
+    })
 
-@st.cache_data
 def load_student_list():
-    base_list = database.get_student_list()
+    generation = database.get_generation(database.STUDENT_LIST_GENERATION)
+    base_list = cache_handler.get_cache().get_or_load("student_list", None, generation, database.get_student_list)
     return ["➕ Ajouter un nouvel élève..."] + base_list
 
 # --- Interface Principale du Tableau de Bord ---
@@ -44,7 +52,6 @@ if eleve_selectionne == "➕ Ajouter un nouvel élève...":
     st.header("Création d'un nouveau profil")
     with st.form("new_student_form"):
         new_name = st.text_input("Prénom du nouvel élève :")
-        ALL_CLASSES = ("CP", "CE1", "CE2", "CM1", "CM2", "6ème", "5ème", "4ème", "3ème", "Seconde")
         new_class = st.selectbox("Classe :", ALL_CLASSES)
         
         submitted = st.form_submit_button("Enregistrer le profil")
@@ -53,8 +60,7 @@ if eleve_selectionne == "➕ Ajouter un nouvel élève...":
                 success, message = database.add_student(new_name, new_class)
                 if success:
                     st.success(f"Profil pour {new_name} créé avec succès ! Vous pouvez maintenant le sélectionner dans la liste ci-dessus.")
-                    # Vider le cache pour recharger la nouvelle liste d'élèves
-                    st.cache_data.clear()
+                    # add_student a changé la génération de la liste : elle sera rechargée seule.
                     # On ne modifie PAS st.session_state, on laisse l'utilisateur choisir.
                     # On peut même forcer un rechargement pour rafraîchir le selectbox.
                     time.sleep(2) # Laisse le temps de lire le message de succès
@@ -70,18 +76,18 @@ else:
     style_handler.apply_custom_css(eleve_selectionne)
     st.markdown(f"### Bienvenue {eleve_selectionne} ! Voici tes super progrès.")
     progress_data = load_student_data(eleve_selectionne)
+    stats = progress_data["stats"]
 
-    if progress_data.empty:
+    if stats.empty:
         st.info(f"👋 Il semble que tu n'aies pas encore terminé de leçon. Va dans la section **'🎓 Leçon du Jour'** pour commencer ton aventure !")
     else:
-        # Affichage du bilan et des graphiques (code identique à avant)
-        # ... (le reste du fichier est identique)
+        # Bilan et graphiques calculés à partir du résumé par matière (student_stats)
         st.markdown("---")
         st.header("Bilan Global 🌍")
         col1, col2, col3 = st.columns(3)
-        total_lecons = len(progress_data)
-        score_moyen_global = progress_data['score_quiz_1'].mean()
-        matiere_preferee = progress_data.groupby('matiere')['score_quiz_1'].mean().idxmax()
+        total_lecons = int(stats['nombre_lecons'].sum())
+        score_moyen_global = stats['somme_scores'].sum() / total_lecons
+        matiere_preferee = stats.set_index('matiere')['score_moyen'].idxmax()
         with col1:
             st.metric(label="Leçons terminées", value=f"{total_lecons} 🚀")
         with col2:
@@ -90,21 +96,21 @@ else:
             st.metric(label="Ta matière favorite", value=f"{matiere_preferee} 🥇")
         st.markdown("---")
         st.header("Progression par Matière 📊")
-        score_par_matiere = progress_data.groupby('matiere')['score_quiz_1'].mean().reset_index()
-        lecons_par_matiere = progress_data.groupby('matiere').size().reset_index(name='nombre_lecons')
+        # Import différé : altair n'est chargé que si des graphiques sont affichés.
+        import altair as alt
         col_graph1, col_graph2 = st.columns(2)
         with col_graph1:
             st.subheader("Score Moyen")
-            bar_chart = alt.Chart(score_par_matiere).mark_bar().encode(
+            bar_chart = alt.Chart(stats).mark_bar().encode(
                 x=alt.X('matiere:N', title='Matière', sort='-y'),
-                y=alt.Y('score_quiz_1:Q', title='Score Moyen', scale=alt.Scale(domain=[0, 10])),
+                y=alt.Y('score_moyen:Q', title='Score Moyen', scale=alt.Scale(domain=[0, 10])),
                 color=alt.Color('matiere:N', legend=None),
-                tooltip=['matiere', alt.Tooltip('score_quiz_1:Q', format='.1f')]
+                tooltip=['matiere', alt.Tooltip('score_moyen:Q', format='.1f')]
             ).properties(height=300)
             st.altair_chart(bar_chart, use_container_width=True)
         with col_graph2:
             st.subheader("Nombre de Leçons")
-            bar_chart_count = alt.Chart(lecons_par_matiere).mark_bar().encode(
+            bar_chart_count = alt.Chart(stats).mark_bar().encode(
                 x=alt.X('matiere:N', title='Matière', sort='-y'),
                 y=alt.Y('nombre_lecons:Q', title='Nombre de leçons terminées'),
                 color=alt.Color('matiere:N', legend=None),
@@ -115,21 +121,49 @@ else:
         col1_details, col2_details = st.columns(2)
         with col1_details:
             st.subheader("🏆 Ton Panthéon des Réussites")
-            reussites = progress_data[progress_data['score_quiz_1'] >= 8].sort_values(by='date', ascending=False)
+            reussites = progress_data["reussites"]
             if reussites.empty:
                 st.info("Continue tes efforts pour remplir ton panthéon !")
             else:
-                for _, row in reussites.head(5).iterrows():
+                for _, row in reussites.iterrows():
                     st.success(f"**{row['matiere']}** : Super score de **{row['score_quiz_1']}/10** sur '{row['sujet']}' !")
         with col2_details:
             st.subheader("💪 Tes Prochains Défis")
-            defis = progress_data[progress_data['points_a_revoir'].notna() & (progress_data['points_a_revoir'] != '')].sort_values(by='date', ascending=False)
+            defis = progress_data["defis"]
             if defis.empty:
                 st.info("Aucun défi spécifique pour le moment, bravo !")
             else:
-                for _, row in defis.head(5).iterrows():
-                    st.warning(f"En **{row['matiere']}**, on pourra revoir : **{row['points_a_revoir']}**.")
-
+                for _, row in defis.iterrows():
+                    st.warning(f"En **{row['matiere']}**, on pourra revoir : **{row['concept']}**.")
+            concepts = progress_data["concepts"]
+            if not concepts.empty:
+                with st.expander("🧩 Tous mes concepts"):
+                    st.dataframe(
+                        concepts[['matiere', 'concept', 'nb_reussites', 'nb_echecs']].rename(columns={
+                            'matiere': 'Matière', 'concept': 'Concept', 'nb_reussites': 'Réussites', 'nb_echecs': 'Ratés'
+                        }),
+                        use_container_width=True, hide_index=True
+                    )
 
 st.sidebar.header("Prêt(e) pour aujourd'hui ?")
-st.sidebar.info("Clique sur **'🎓 Leçon du Jour'** pour commencer une nouvelle leçon !")
\ No newline at end of file
+st.sidebar.info("Clique sur **'🎓 Leçon du Jour'** pour commencer une nouvelle leçon !")
+with st.sidebar.expander("⚙️ Statistiques du cache"):
+    cache_stats = cache_handler.get_cache().stats()
+    st.caption(
+        f"Hits : {cache_stats['hits']} · Misses : {cache_stats['misses']} · "
+        f"Invalidations : {cache_stats['invalidations']} · Évictions : {cache_stats['evictions']} · "
+        f"Entrées : {cache_stats['entries']}"
+    )
+    lesson_cache_stats = lesson_store.cache_stats()
+    st.caption(
+        f"Leçons servies depuis le cache : {lesson_cache_stats['hit_ratio']:.0%} "
+        f"({lesson_cache_stats['hits']} sur {lesson_cache_stats['hits'] + lesson_cache_stats['misses']})"
+    )
+    if eleve_selectionne != "➕ Ajouter un nouvel élève...":
+        css_sizes = style_handler.css_payload_report(eleve_selectionne)
+        st.caption(
+            f"CSS du thème envoyé à chaque rerun : {css_sizes['static'] / 1024:.1f} Ko "
+            f"(contre {css_sizes['inline_base64'] / 1024:.1f} Ko avec l'image en base64)"
+        )
+    if lesson_cache_stats['avg_ttfc_s'] is not None:
+        st.caption(f"Premier contenu d'une leçon générée affiché après {lesson_cache_stats['avg_ttfc_s']:.1f} s en moyenne")
\ No newline at end of file